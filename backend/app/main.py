@@ -4,6 +4,7 @@ from fastapi.responses import JSONResponse
 from fastapi.exceptions import RequestValidationError
 import traceback
 import logging
+import os
 
 from .routers import (
     auth,
@@ -21,27 +22,43 @@ from .routers import (
     suppliers,
     users,
     hardware_import,
-    dashboard_stats
+    dashboard_stats,
+    imports
 )
+from .dhl_pdf_calculator import get_dhl_calculator
+from .utils.import_jobs import import_jobs
+from .utils import pdf_text
+from .utils.pdf_tables import pdf_table_pool
+from .utils.uploads import UploadTooLarge, body_excerpt, exceeds_upload_limit
 
 app = FastAPI(title="ODD API", version="1.0.0")
 
-# Configuration CORS
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],  
-    allow_headers=["*"],  
+# Taille maximale du corps de requête recopiée dans les logs de validation
+VALIDATION_LOG_BODY_BYTES = int(os.getenv("VALIDATION_LOG_BODY_BYTES", "2048"))
 
-)
+# Construire les grilles DHL une seule fois, avant la première requête
+@app.on_event("startup")
+def load_dhl_tariffs():
+    get_dhl_calculator()
+
+# Arrêter les processus d'analyse (imports, tableaux PDF) avec le serveur
+@app.on_event("shutdown")
+def stop_import_workers():
+    import_jobs.shutdown()
+    pdf_table_pool.shutdown()
+    pdf_text.shutdown()
 
 # Gestionnaire d'erreurs personnalisé pour les erreurs de validation
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
 
     error_detail = exc.errors()
-    error_body = await request.body()
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("multipart/"):
+        # Fichier envoyé: ni relu ni recopié, seules sa taille et son type sont journalisés
+        error_body = f"<{content_type.split(';')[0]}, {request.headers.get('content-length', '?')} octets>"
+    else:
+        error_body = body_excerpt(await request.body(), VALIDATION_LOG_BODY_BYTES)
     
     logging.error(f"Erreur de validation pour {request.method} {request.url}")
     logging.error(f"Corps de la requête: {error_body}")
@@ -50,7 +67,7 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
     # Retourner une réponse plus détaillée
     return JSONResponse(
         status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-        content={"detail": exc.errors(), "body": error_body.decode()},
+        content={"detail": exc.errors(), "body": error_body},
     )
 
 # Gestionnaire d'erreurs global
@@ -68,6 +85,35 @@ async def catch_exceptions_middleware(request: Request, call_next):
             content={"detail": "Une erreur interne s'est produite."},
         )
 
+# Fichiers trop gros pour l'endpoint d'import: refus (413) d'après le
+# Content-Length, avant la lecture du corps (voir utils/uploads)
+@app.middleware("http")
+async def upload_limit_middleware(request: Request, call_next):
+    max_bytes = exceeds_upload_limit(request.url.path, request.headers.get("content-length"))
+    if max_bytes is not None:
+        logging.warning(
+            f"Fichier refusé pour {request.method} {request.url.path}: "
+            f"{request.headers.get('content-length')} octets (maximum {max_bytes})"
+        )
+        return JSONResponse(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            content={"detail": str(UploadTooLarge(max_bytes))},
+        )
+    return await call_next(request)
+
+# Configuration CORS, ajoutée en dernier: elle enveloppe les middlewares
+# ci-dessus, et leurs réponses (413, 500) portent aussi les en-têtes CORS
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=True,
+    allow_methods=["*"],  
+    allow_headers=["*"],  
+    # En-têtes de pagination et de cache lisibles par le frontend
+    expose_headers=["ETag", "X-Next-Cursor", "X-Total-Count"],
+
+)
+
 # Inclusion des routeurs
 app.include_router(auth.router)
 app.include_router(clients.router)
@@ -85,6 +131,7 @@ app.include_router(suppliers.router)
 app.include_router(users.router)
 app.include_router(hardware_import.router)
 app.include_router(dashboard_stats.router)
+app.include_router(imports.router)
 
 @app.get("/")
 def read_root():
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Date, DateTime, Float, Text, ForeignKey, func, Boolean
+from sqlalchemy import Column, Integer, String, Date, DateTime, Float, Text, ForeignKey, func, Boolean, Index
 from sqlalchemy.orm import relationship
 from .database import Base
 from datetime import datetime
@@ -140,6 +140,11 @@ class Product(Base):
 
     shipping_info = relationship("ProductShippingInfo", back_populates="product", uselist=False)
 
+    # Recherche par part number lors des imports (IN sur pn puis marque)
+    __table_args__ = (
+        Index("ix_products_pn_brand", "pn", "brand"),
+    )
+
 
 class ProductShippingInfo(Base):
     __tablename__ = "product_shipping_info"
@@ -154,6 +159,7 @@ class ProductShippingInfo(Base):
     shipping_cost = Column(Float)
     shipping_zone = Column(Integer)
     calculated_at = Column(DateTime, default=func.now())
+    tariff_version = Column(String(64), nullable=True)  # Version de la grille DHL utilisée
     is_multi_leg = Column(Boolean, default=False)
     legs_data = Column(String(255), nullable=True)
 
@@ -278,11 +284,19 @@ class HardwareIT(Base):
     poids_kg = Column(Float, nullable=True, default=0.0)
     dimensions = Column(String(100), nullable=True)
 
+    # Clé "marque + PN" normalisée, renseignée uniquement pour les fiches créées par
+    # l'auto-association des imports (NULL ailleurs): rend leur création idempotente
+    catalog_key = Column(String(255), nullable=True, unique=True)
+
     # Relations
     supplier = relationship("Supplier", back_populates="hardware_items")
     customer = relationship("Client", back_populates="hardware_items")
     devis_items = relationship("DevisItem", back_populates="hardware_item")
 
+    __table_args__ = (
+        Index("ix_hardware_it_pn_brand", "pn", "brand"),
+    )
+
 # MODÈLE MODIFIÉ : Shipping au niveau du devis avec support de conversion de devise
 class DevisShipping(Base):
     __tablename__ = "devis_shipping"
@@ -308,6 +322,7 @@ class DevisShipping(Base):
     shipping_zone = Column(Integer, nullable=True)
     effective_weight_kg = Column(Float, nullable=True)  # Poids effectif (max entre réel et volumétrique)
     calculated_at = Column(DateTime, default=func.now())
+    tariff_version = Column(String(64), nullable=True)  # Version de la grille DHL utilisée
     
     # Relation
     devis = relationship("DevisOddnet", back_populates="shipping_info", uselist=False)
@@ -339,9 +354,17 @@ class DevisOddnet(Base):
     comment = Column(Text, nullable=True, default="")
 
     # Relations
-    items = relationship("DevisItem", back_populates="devis", cascade="all, delete-orphan")
+    items = relationship("DevisItem", back_populates="devis", cascade="all, delete-orphan", order_by="DevisItem.id")
     shipping_info = relationship("DevisShipping", back_populates="devis", uselist=False, cascade="all, delete-orphan")
 
+    # Index de la liste des devis (filtres + pagination par date, comptage sur l'index)
+    __table_args__ = (
+        Index("ix_devis_oddnet_date_id", "date_creation", "id"),
+        Index("ix_devis_oddnet_status_date", "status", "date_creation"),
+        Index("ix_devis_oddnet_client_date", "client_id", "date_creation"),
+        Index("ix_devis_oddnet_currency_date", "currency", "date_creation"),
+    )
+
 # MODÈLE COMPLET : DevisItem avec hardware_id et source_type
 class DevisItem(Base):
     __tablename__ = "devis_items"
@@ -384,6 +407,7 @@ class ShippingInfo(Base):
     shipping_cost = Column(Float, nullable=True)
     shipping_zone = Column(Integer, nullable=True)
     calculated_at = Column(DateTime(), server_default=func.now(), nullable=False)
+    tariff_version = Column(String(64), nullable=True)  # Version de la grille DHL utilisée
 
     # Relation avec HardwareIT
     hardware = relationship("HardwareIT")
@@ -1,6 +1,8 @@
-from fastapi import APIRouter, Depends, HTTPException, Response, UploadFile, File, Form
-from fastapi.responses import FileResponse
-from sqlalchemy.orm import Session, selectinload
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, UploadFile, File, Form
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import FileResponse, JSONResponse
+from sqlalchemy import and_, delete, func, insert, or_, update
+from sqlalchemy.orm import Session, joinedload, selectinload
 from typing import List, Optional
 from .. import models
 from ..database import get_db
@@ -8,12 +10,25 @@ from pydantic import BaseModel, field_validator
 from datetime import datetime, date
 import tempfile
 import os
-import pandas as pd
 import json
-import io
-import re
 import logging
-from ..dhl_pdf_calculator import DHLPdfCalculator
+from ..dhl_pdf_calculator import DHLPdfCalculator, get_dhl_calculator
+from ..utils.catalog_snapshot import ITEM_TYPES, catalog_snapshot
+from ..utils.catalog_search import catalog_search_index
+from ..utils.import_jobs import ImportQueueFull, import_jobs
+from ..utils.quote_extraction import GENERIC_VENDOR, QuoteDocument, extract_quote as read_quote, quote_identity
+from ..utils.upload_cache import parsed_upload_cache
+from ..utils.uploads import UploadTooLarge, register_upload_limit, spool_upload
+from ..utils.excel_extraction import (
+    COLUMN_PATTERNS,
+    ExcelSheet,
+    direct_column_mapping,
+    extract_item_frame,
+    find_header_row,
+    find_workbook_quote_info,
+    frame_sheet,
+    read_excel_sheets,
+)
 from functools import lru_cache
 
 # Configurer le logging
@@ -26,6 +41,11 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
+# Taille maximale des fichiers importés (UPLOAD_MAX_BYTES_DEVIS), 413 au-delà
+DEVIS_UPLOAD_MAX_BYTES = register_upload_limit(
+    "devis", "/devis/preview-file/", "/devis/import-file/", "/devis/import-to-client/"
+)
+
 # TAUX DE CHANGE CORRIGÉS - Mise à jour avec des taux réalistes
 EXCHANGE_RATES = {
     "MAD": 1.0,
@@ -58,6 +78,8 @@ def convert_to_mad(amount: float, source_currency: str) -> float:
     return round(amount * rate, 2)
 
 class DevisItemCreate(BaseModel):
+    # Identifiant de la ligne existante (absent ou inconnu = nouvelle ligne)
+    id: Optional[int] = None
     product_id: Optional[int] = None
     hardware_id: Optional[int] = None
     source_type: Optional[str] = None  
@@ -68,6 +90,17 @@ class DevisItemCreate(BaseModel):
     unit: str = "Unit"
     unit_price: float
 
+class DevisItemUpdate(BaseModel):
+    product_id: Optional[int] = None
+    hardware_id: Optional[int] = None
+    source_type: Optional[str] = None
+    brand: Optional[str] = None
+    pn: Optional[str] = None
+    eq_reference: Optional[str] = None
+    qty: Optional[int] = None
+    unit: Optional[str] = None
+    unit_price: Optional[float] = None
+
 class ShippingLeg(BaseModel):
     origin_country: str
     destination_country: str
@@ -137,6 +170,7 @@ class DevisShippingResponse(BaseModel):
     shipping_zone: Optional[int] = None
     effective_weight_kg: Optional[float] = None
     calculated_at: Optional[datetime] = None
+    tariff_version: Optional[str] = None
 
     @field_validator('shipping_cost', 'shipping_cost_mad', mode='before')
     @classmethod
@@ -176,333 +210,218 @@ class DevisResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class DevisListItem(BaseModel):
+    id: int
+    reference: Optional[str] = None
+    devis_number: Optional[str] = None
+    date_creation: Optional[date] = None
+    client_id: Optional[int] = None
+    company_name: Optional[str] = None
+    contact_name: Optional[str] = None
+    country: Optional[str] = None
+    project: Optional[str] = None
+    currency: Optional[str] = None
+    total_amount: Optional[float] = None
+    tva: Optional[float] = None
+    discount: Optional[float] = None
+    status: Optional[str] = None
+    eta: Optional[str] = None
+    # Présents seulement avec include=items / include=shipping
+    items: Optional[List[DevisItemResponse]] = None
+    shipping_info: Optional[DevisShippingResponse] = None
+
 # ===== FONCTIONS D'IMPORTATION RÉUTILISÉES DEPUIS HARDWARE =====
 
-def extract_devis_info(df) -> dict:
-    """Extraire les informations du devis à partir du fichier Excel."""
-    devis_info = {
-        "devis_number": None,
-        "client": None,
-        "date_creation": datetime.now().date(),
-        "total_amount": 0.0,
-    }
-    
-    # Essayer de trouver l'ID du devis et le client
-    for i in range(min(30, len(df))):
-        row = df.iloc[i]
-        for col in df.columns:
-            cell_value = str(row.get(col, ""))
-            
-            # Recherche plus flexible pour l'ID du devis
-            if any(keyword in cell_value.lower() for keyword in ["quote", "devis", "quotation", "id", "ref"]):
-                # Essayer d'extraire un numéro
-                numbers = re.findall(r'\d+', cell_value)
-                if numbers:
-                    devis_info["devis_number"] = numbers[0]
-                    logger.info(f"ID de devis trouvé: {devis_info['devis_number']}")
-            
-            # Recherche plus flexible pour le client
-            if any(keyword in cell_value.lower() for keyword in ["customer", "client", "end user", "end-user"]):
-                # Chercher le nom du client dans les prochaines lignes
-                for j in range(i+1, min(i+5, len(df))):
-                    next_row = df.iloc[j]
-                    client_cell = next_row.get(col, "")
-                    if client_cell and not pd.isna(client_cell) and len(str(client_cell).strip()) > 2:
-                        devis_info["client"] = str(client_cell).strip()
-                        logger.info(f"Client trouvé: {devis_info['client']}")
-                        break
-    
-    # Si aucun numéro de devis n'est trouvé, générer un numéro automatique
-    if not devis_info["devis_number"]:
-        devis_info["devis_number"] = f"DEV-{datetime.now().strftime('%Y%m%d%H%M%S')}"
-        logger.info(f"Aucun ID de devis trouvé, génération automatique: {devis_info['devis_number']}")
+def extract_devis_info(heads) -> dict:
+    """Extraire les informations du devis à partir des premières lignes des feuilles Excel."""
+    devis_number, client = find_workbook_quote_info(heads)
+    if devis_number:
+        logger.info(f"ID de devis trouvé: {devis_number}")
+    else:
+        # Numéro automatique généré à la création du devis (devis_number_for)
+        logger.info("Aucun ID de devis trouvé, un numéro sera généré à l'import")
     
-    # Si aucun client n'est trouvé, utiliser un nom par défaut
-    if not devis_info["client"]:
-        devis_info["client"] = "Client non spécifié"
+    if client:
+        logger.info(f"Client trouvé: {client}")
+    else:
+        # Si aucun client n'est trouvé, utiliser un nom par défaut
+        client = "Client non spécifié"
         logger.info("Aucun client trouvé, utilisation du nom par défaut")
     
-    return devis_info
-
-def parse_excel_generic(df) -> dict:
-    """Analyser un fichier Excel générique et extraire les éléments matériels."""
-    items = []
-    devis_info = extract_devis_info(df)
-    
-    # Afficher les premières lignes pour le débogage
-    logger.info(f"Premières lignes du DataFrame:\n{df.head(10)}")
-    logger.info(f"Colonnes du DataFrame: {df.columns.tolist()}")
-    
-    # Recherche plus flexible des données d'équipement
-    # Essayer de trouver les colonnes pertinentes
-    column_mapping = {}
-    potential_headers = {
-        "item_number": ["item", "line", "no", "number", "#"],
-        "pn": ["part number", "pn", "reference", "ref", "product code", "code"],
-        "description": ["description", "desc", "product", "item", "designation"],
-        "qty": ["quantity", "qty", "qté", "quantité", "amount"],
-        "unit_cost": ["price", "cost", "unit price", "unit cost", "prix"]
+    return {
+        "devis_number": devis_number,
+        "devis_number_prefix": "DEV",
+        "client": client,
+        "date_creation": datetime.now().date(),
+        "total_amount": 0.0,
     }
+
+def iter_sheet_items(sheet: ExcelSheet):
+    """Éléments matériels d'une feuille Excel, bloc par bloc."""
+    head = sheet.head
+    logger.info(f"Colonnes de la feuille {sheet.name or '-'}: {head.columns.tolist()}")
     
-    # Chercher les en-têtes de colonnes
-    header_row_idx = None
-    for i in range(min(20, len(df))):
-        row = df.iloc[i]
-        matches = 0
-        for key, keywords in potential_headers.items():
-            for col_idx, col_name in enumerate(df.columns):
-                cell_value = str(row.get(col_name, "")).lower()
-                if any(keyword in cell_value for keyword in keywords):
-                    column_mapping[key] = col_name
-                    matches += 1
-                    break
-        
-        if matches >= 3:  # Si on trouve au moins 3 colonnes pertinentes
-            header_row_idx = i
-            logger.info(f"En-tête trouvé à la ligne {i+1} avec {matches} colonnes correspondantes")
-            break
-    
-    # Si on n'a pas trouvé d'en-tête, essayer d'utiliser les noms de colonnes directement
-    if not header_row_idx and len(df.columns) >= 3:
-        for key, keywords in potential_headers.items():
-            for col_name in df.columns:
-                col_str = str(col_name).lower()
-                if any(keyword in col_str for keyword in keywords):
-                    column_mapping[key] = col_name
-                    break
-        
+    # Chercher la ligne d'en-tête (score vectorisé sur les 20 premières lignes)
+    header_row_idx, column_mapping = find_header_row(head, COLUMN_PATTERNS)
+    if header_row_idx is not None:
+        logger.info(f"En-tête trouvé à la ligne {header_row_idx + 1} avec {len(column_mapping)} colonnes correspondantes")
+    elif len(head.columns) >= 3:
+        # Si on n'a pas trouvé d'en-tête, utiliser les noms de colonnes directement
+        column_mapping = direct_column_mapping(head, COLUMN_PATTERNS)
         logger.info(f"Utilisation des noms de colonnes directement: {column_mapping}")
     
-    # Si on a trouvé des colonnes pertinentes, extraire les données
-    if column_mapping:
-        logger.info(f"Colonnes identifiées: {column_mapping}")
-        
-        # Déterminer la ligne de début des données
-        start_row = header_row_idx + 1 if header_row_idx is not None else 0
-        
-        # Parcourir les lignes pour extraire les données
-        for i in range(start_row, len(df)):
-            row = df.iloc[i]
-            
-            # Vérifier si la ligne contient des données valides
-            has_data = False
-            for key, col in column_mapping.items():
-                if not pd.isna(row.get(col, "")):
-                    has_data = True
-                    break
-            
-            if not has_data:
-                continue
-            
-            # Extraire les données
-            pn = ""
-            description = ""
-            qty = 0
-            unit_cost = 0
-            
-            if "pn" in column_mapping:
-                pn_value = row.get(column_mapping["pn"], "")
-                if not pd.isna(pn_value):
-                    pn = str(pn_value).strip()
-            
-            if "description" in column_mapping:
-                desc_value = row.get(column_mapping["description"], "")
-                if not pd.isna(desc_value):
-                    description = str(desc_value).strip()
-            
-            if "qty" in column_mapping:
-                qty_value = row.get(column_mapping["qty"], 0)
-                if not pd.isna(qty_value):
-                    try:
-                        qty = int(float(qty_value))
-                    except (ValueError, TypeError):
-                        qty = 0
-            
-            if "unit_cost" in column_mapping:
-                cost_value = row.get(column_mapping["unit_cost"], 0)
-                if not pd.isna(cost_value):
-                    try:
-                        unit_cost = float(cost_value)
-                    except (ValueError, TypeError):
-                        unit_cost = 0
-            
-            # Si on a au moins un PN et une quantité, ajouter l'élément
-            if pn and qty > 0:
-                item = {
+    if not column_mapping:
+        return
+    logger.info(f"Colonnes identifiées: {column_mapping}")
+    
+    # Les données commencent après la ligne d'en-tête (dans le premier bloc)
+    start_row = header_row_idx + 1 if header_row_idx is not None else 0
+    for offset, chunk in sheet.chunks():
+        frame = extract_item_frame(chunk, column_mapping, start_row if offset == 0 else 0)
+        if len(frame):
+            yield [
+                {
                     "brand": "Cisco",  # Par défaut
                     "pn": pn,
                     "eq_reference": description or pn,
-                    "qty": qty,
-                    "unit_price": unit_cost,
+                    "qty": int(qty),
+                    "unit_price": float(unit_cost),
                     "currency": "USD"  # Par défaut
                 }
-                items.append(item)
-                logger.info(f"Élément trouvé: {item}")
+                for pn, description, qty, unit_cost in zip(frame["pn"], frame["description"], frame["qty"], frame["unit_cost"])
+            ]
+
+def parse_excel_sheets(sheets) -> dict:
+    """Analyser les feuilles d'un fichier Excel générique et extraire les éléments matériels."""
+    heads, items = [], []
+    for sheet in sheets:
+        heads.append(sheet.head)
+        for chunk_items in iter_sheet_items(sheet):
+            items.extend(chunk_items)
+    logger.info(f"{len(items)} éléments trouvés")
     
+    devis_info = extract_devis_info(heads)
     return {
         "devis_number": devis_info["devis_number"],
+        "devis_number_prefix": devis_info["devis_number_prefix"],
         "client": devis_info["client"],
         "items": items
     }
 
-def extract_pdf_text(pdf_content) -> str:
-    """Extraire le texte d'un fichier PDF."""
-    try:
-        import PyPDF2
-        pdf_reader = PyPDF2.PdfReader(io.BytesIO(pdf_content))
-        
-        # Extraire le texte de chaque page
-        text = ""
-        for page_num in range(len(pdf_reader.pages)):
-            page = pdf_reader.pages[page_num]
-            text += page.extract_text() + "\n\n"
-        
-        logger.info(f"Texte extrait du PDF ({len(text)} caractères)")
-        return text
-    except Exception as e:
-        logger.error(f"Erreur lors de l'extraction du texte PDF: {str(e)}", exc_info=True)
-        return ""
-
-def parse_cisco_quote_pdf(text) -> dict:
-    """Analyser spécifiquement un devis Cisco au format PDF."""
-    items = []
-    devis_info = {
-        "devis_number": None,
-        "client": None,
-        "project": None,
-        "date_creation": datetime.now().date(),
-        "total_amount": 0.0,
-    }
-    
-    # Extraire les informations du devis
-    quote_id_match = re.search(r'Quote ID\s*:\s*(\d+)', text)
-    if quote_id_match:
-        devis_info["devis_number"] = quote_id_match.group(1)
-        logger.info(f"Numéro de devis Cisco trouvé: {devis_info['devis_number']}")
-    
-    # Extraire le nom du client
-    client_match = re.search(r'End Customer\s*:\s*\n([A-Z\s]+)', text)
-    if client_match:
-        devis_info["client"] = client_match.group(1).strip()
-        logger.info(f"Client trouvé: {devis_info['client']}")
-    
-    # Extraire le nom du projet
-    project_match = re.search(r'Quote Name\s*:\s*([^\n]+)', text)
-    if project_match:
-        devis_info["project"] = project_match.group(1).strip()
-        logger.info(f"Projet trouvé: {devis_info['project']}")
-    
-    # Extraire les éléments matériels avec pattern amélioré
-    item_pattern = r'(\d+\.\d+)\s+([A-Z0-9\-/]+)\s+.*?([0-9,.]+)?\s+(\d+)\s+([0-9,.]+)?'
-    item_matches = re.finditer(item_pattern, text)
-    
-    for match in item_matches:
-        item_number, pn, unit_price_str, qty_str, extended_price_str = match.groups()
-        
-        pn = pn.strip()
-        qty = int(qty_str) if qty_str else 1
-        
-        unit_price = 0.0
-        if unit_price_str:
-            unit_price_str = unit_price_str.replace(',', '')
-            try:
-                unit_price = float(unit_price_str)
-            except ValueError:
-                unit_price = 0.0
-        
-        # Chercher la description
-        description_pattern = f"{re.escape(pn)}[^A-Z0-9\n]*\n([^\n]+)"
-        description_match = re.search(description_pattern, text)
-        description = description_match.group(1).strip() if description_match else pn
-        
-        if unit_price > 0 and qty > 0:
-            item = {
-                "brand": "Cisco",
-                "pn": pn,
-                "eq_reference": description,
-                "qty": qty,
-                "unit_price": unit_price,
-                "currency": "USD"
-            }
-            items.append(item)
-            logger.info(f"Élément Cisco trouvé: {item}")
-    
-    return {
-        "devis_number": devis_info["devis_number"] or f"CISCO-{datetime.now().strftime('%Y%m%d%H%M%S')}",
-        "client": devis_info["client"] or "Client non spécifié",
-        "project": devis_info["project"],
-        "items": items
-    }
+def parse_excel_generic(df) -> dict:
+    """Analyser un DataFrame Excel déjà chargé (une seule feuille)."""
+    return parse_excel_sheets([frame_sheet(df)])
 
 def parse_pdf_content(pdf_content) -> dict:
-    """Analyser le contenu d'un PDF et extraire les éléments matériels."""
-    text = extract_pdf_text(pdf_content)
-    
-    # Vérifier si c'est un devis Cisco
-    if "Price Quotation" in text and "Cisco" in text:
-        logger.info("Détection d'un devis Cisco, utilisation du parser spécialisé")
-        cisco_result = parse_cisco_quote_pdf(text)
-        if cisco_result["items"]:
-            return cisco_result
+    """Analyser le contenu d'un PDF et extraire les éléments matériels (moteur d'extraction commun)."""
+    quote = read_quote(QuoteDocument(pdf_content))
+    identity = quote_identity(quote)
+    prefix = quote["supplier"].upper() if quote["vendor"] != GENERIC_VENDOR else "PDF"
     
-    # Fallback pour autres types de PDF
-    devis_info = {
-        "devis_number": f"PDF-{datetime.now().strftime('%Y%m%d%H%M%S')}",
-        "client": "Client non spécifié",
-        "items": []
+    result = {
+        "devis_number": identity["quote_id"],
+        "devis_number_prefix": prefix,
+        "client": identity["client"] or "Client non spécifié",
+        "items": [
+            {
+                "brand": "Cisco",  # Par défaut
+                "pn": item["pn"],
+                "eq_reference": item["description"],
+                "qty": item["qty"],
+                "unit_price": item["unit_cost"],
+                "currency": "USD"  # Par défaut
+            }
+            for item in quote["items"]
+        ]
     }
-    
-    # Recherche basique dans le texte
-    lines = text.split('\n')
-    for line in lines:
-        # Chercher des lignes qui pourraient contenir des produits
-        if re.search(r'[A-Z0-9][\w\-]{4,}', line) and re.search(r'\d+', line):
-            # Extraire les informations basiques
-            pn_match = re.search(r'([A-Z0-9][\w\-]{4,})', line)
-            qty_match = re.search(r'\b(\d+)\b', line)
-            price_match = re.search(r'(\d+(?:\.\d+)?)', line)
-            
-            if pn_match and qty_match:
-                item = {
-                    "brand": "Cisco",
-                    "pn": pn_match.group(1),
-                    "eq_reference": line.strip()[:50],  # Description limitée
-                    "qty": int(qty_match.group(1)),
-                    "unit_price": float(price_match.group(1)) if price_match else 0,
-                    "currency": "USD"
-                }
-                devis_info["items"].append(item)
-    
-    return devis_info
+    if identity["project"]:
+        result["project"] = identity["project"]
+    return result
+
+def devis_number_for(parsed_data: dict) -> str:
+    """
+    Numéro du devis créé à l'import: celui lu dans le fichier, sinon un numéro
+    horodaté généré à chaque import (jamais mis en cache avec l'analyse).
+    """
+    return parsed_data["devis_number"] or f"{parsed_data['devis_number_prefix']}-{datetime.now().strftime('%Y%m%d%H%M%S')}"
 
 def process_file(file_content, file_extension):
     """Traiter le contenu du fichier en fonction de son extension."""
     if file_extension in ('.xlsx', '.xls'):
-        df = pd.read_excel(io.BytesIO(file_content))
-        return parse_excel_generic(df)
+        # .xlsx: lecture en streaming, toutes les feuilles
+        return parse_excel_sheets(read_excel_sheets(file_content, file_extension))
     elif file_extension == '.pdf':
         return parse_pdf_content(file_content)
     else:
         raise ValueError(f"Format de fichier non pris en charge: {file_extension}")
 
+async def load_parsed_upload(file: Optional[UploadFile], upload_token: Optional[str]) -> dict:
+    """
+    Résultat d'analyse d'un fichier importé, analysé une seule fois.
+
+    Le jeton renvoyé par la prévisualisation évite de renvoyer et de réanalyser
+    le fichier; un fichier identique à un fichier déjà analysé est lu depuis le cache.
+
+    Returns:
+        Entrée du cache: {"token", "extension", "filename", "parsed"}
+    """
+    if upload_token:
+        entry = parsed_upload_cache.get("devis", upload_token)
+        if entry is not None:
+            logger.info(f"Fichier {entry['filename']} lu depuis le cache d'import")
+            return entry
+        if file is None:
+            raise HTTPException(status_code=404, detail="Jeton d'import inconnu ou expiré: renvoyez le fichier")
+    if file is None:
+        raise HTTPException(status_code=400, detail="Fichier ou upload_token requis")
+
+    # Vérifier le type de fichier
+    file_extension = os.path.splitext(file.filename.lower())[1]
+    if file_extension not in ('.xlsx', '.xls', '.pdf'):
+        raise HTTPException(
+            status_code=400, 
+            detail="Le fichier doit être au format Excel (.xlsx ou .xls) ou PDF (.pdf)"
+        )
+
+    # Lecture par blocs: au-delà de la limite, refus sans lire la suite
+    try:
+        upload = await spool_upload(file, DEVIS_UPLOAD_MAX_BYTES)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    logger.info(f"Taille du fichier lu: {upload.size} octets")
+    # Analyse dans le pool de processus: la boucle d'événements reste libre; le
+    # fichier (ou son chemin) est lu sur place et supprimé à la fin de l'analyse
+    try:
+        entry = await import_jobs.run(
+            "devis", upload.source, file_extension, file.filename, process_file, upload.token, upload.close
+        )
+    except ImportQueueFull as e:
+        raise HTTPException(status_code=429, detail=f"Trop d'imports en cours, réessayez plus tard ({str(e)})")
+    return entry
+
 # Cache pour les données statiques
-@lru_cache(maxsize=1)
 def get_shipping_countries():
     """Récupérer la liste des pays disponibles pour le shipping avec cache."""
+    return _shipping_countries(get_dhl_calculator())
+
+@lru_cache(maxsize=1)
+def _shipping_countries(calculator: DHLPdfCalculator):
+    # Le cache est indexé par calculateur: une nouvelle grille tarifaire l'invalide
     try:
-        calculator = DHLPdfCalculator()
         countries = set(calculator.export_zones.keys()).union(set(calculator.import_zones.keys()))
         return sorted(list(countries))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur lors de la récupération des pays: {str(e)}")
 
-@lru_cache(maxsize=1)
 def get_premium_services():
     """Récupérer la liste des services premium avec cache."""
+    return _premium_services(get_dhl_calculator())
+
+@lru_cache(maxsize=1)
+def _premium_services(calculator: DHLPdfCalculator):
     try:
-        calculator = DHLPdfCalculator()
         return {
-            "premium_services": calculator.premium_services,
+            "premium_services": dict(calculator.premium_services),
             "currency": "MAD"
         }
     except Exception as e:
@@ -520,46 +439,50 @@ def get_exchange_rates():
 
 # Endpoint optimisé pour récupérer les produits et hardware combinés
 @router.get("/available-items")
-def get_available_items(db: Session = Depends(get_db)):
-    """Récupérer tous les items disponibles (products + hardware) pour la sélection."""
-    
-    products = db.query(models.Product).options(selectinload(models.Product.supplier)).all()
-    hardware_items = db.query(models.HardwareIT).options(selectinload(models.HardwareIT.supplier)).all()
+def get_available_items(
+    request: Request,
+    type: Optional[str] = Query(None, description="Filtrer par type: 'product' ou 'hardware'"),
+    cursor: Optional[str] = Query(None, description="Curseur de pagination (en-tête X-Next-Cursor de la page précédente)"),
+    limit: Optional[int] = Query(None, ge=1, le=5000, description="Taille de page (sans limite: tout le catalogue)"),
+    db: Session = Depends(get_db)
+):
+    """
+    Récupérer les items disponibles (products + hardware) pour la sélection.
+
+    Servi depuis l'instantané du catalogue: en-tête ETag (304 si inchangé),
+    X-Total-Count, et X-Next-Cursor tant qu'il reste des pages.
+    """
+    if type is not None and type not in ITEM_TYPES:
+        raise HTTPException(status_code=400, detail=f"Type invalide: {type} (attendu: {', '.join(ITEM_TYPES)})")
     
-    # Formater les données pour l'interface
-    available_items = []
+    etag = catalog_snapshot.refresh(db)
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
     
-    # Ajouter les produits
-    for product in products:
-        available_items.append({
-            "id": product.id,
-            "type": "product",
-            "brand": product.brand or "",
-            "pn": product.pn or "",
-            "eq_reference": product.eq_reference or "",
-            "unit_price": product.unit_price if hasattr(product, 'unit_price') else (
-                product.unit_cost_mad * (1 + (product.p_margin or 0) / 100) if product.unit_cost_mad else 0
-            ),
-            "currency": product.currency or "MAD",
-            "supplier": product.supplier.company if product.supplier else "",
-            "display_name": f"{product.brand or ''} - {product.pn or ''} - {product.eq_reference or ''}"
-        })
+    try:
+        available_items, next_cursor, total = catalog_snapshot.page(type, cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    # Ajouter les équipements hardware
-    for hardware in hardware_items:
-        available_items.append({
-            "id": hardware.id,
-            "type": "hardware",
-            "brand": hardware.brand or "",
-            "pn": hardware.pn or "",
-            "eq_reference": hardware.eq_reference or "",
-            "unit_price": hardware.unit_price or 0,
-            "currency": hardware.currency or "MAD",
-            "supplier": hardware.supplier.company if hardware.supplier else "",
-            "display_name": f"{hardware.brand or ''} - {hardware.pn or ''} - {hardware.eq_reference or ''}"
-        })
+    headers = {"ETag": etag, "X-Total-Count": str(total)}
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    # Lignes déjà sérialisables: pas de passage par jsonable_encoder
+    return JSONResponse(content=available_items, headers=headers)
+
+@router.get("/catalog/search")
+def search_catalog(
+    q: str = Query(..., min_length=1, description="Marque, PN ou désignation (début ou fragment)"),
+    type: Optional[str] = Query(None, description="Filtrer par type: 'product' ou 'hardware'"),
+    limit: int = Query(20, ge=1, le=100, description="Nombre maximum de résultats"),
+    db: Session = Depends(get_db)
+):
+    """Autocomplétion des lignes de devis: articles du catalogue triés par pertinence."""
+    if type is not None and type not in ITEM_TYPES:
+        raise HTTPException(status_code=400, detail=f"Type invalide: {type} (attendu: {', '.join(ITEM_TYPES)})")
     
-    return available_items
+    catalog_snapshot.refresh(db)
+    return JSONResponse(content=catalog_search_index.search(q, limit=limit, item_type=type))
 
 @router.get("/shipping/countries")
 def get_shipping_countries_endpoint():
@@ -575,51 +498,68 @@ def get_premium_services_endpoint():
 
 @router.post("/preview-file/")
 async def preview_file_import(file: UploadFile = File(...)):
-    """Prévisualiser les données qui seraient importées à partir d'un fichier Excel ou PDF."""
+    """
+    Prévisualiser les données qui seraient importées à partir d'un fichier Excel ou PDF.
+
+    La réponse contient upload_token, à renvoyer aux endpoints d'import à la
+    place du fichier.
+    """
     logger.info(f"Prévisualisation du fichier: {file.filename}, content_type: {file.content_type}")
     
-    # Vérifier le type de fichier
-    file_extension = os.path.splitext(file.filename.lower())[1]
-    if file_extension not in ('.xlsx', '.xls', '.pdf'):
-        raise HTTPException(
-            status_code=400, 
-            detail="Le fichier doit être au format Excel (.xlsx ou .xls) ou PDF (.pdf)"
-        )
-    
     try:
-        # Lire le contenu du fichier
-        contents = await file.read()
-        logger.info(f"Taille du fichier lu: {len(contents)} octets")
-        
-        # Traiter le fichier en fonction de son extension
-        parsed_data = process_file(contents, file_extension)
+        entry = await load_parsed_upload(file, None)
+        parsed_data = entry["parsed"]
         logger.info(f"Analyse terminée, {len(parsed_data['items'])} éléments trouvés")
         
-        return parsed_data
+        return {**parsed_data, "upload_token": entry["token"]}
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Erreur lors de l'analyse du fichier: {str(e)}", exc_info=True)
         raise HTTPException(status_code=400, detail=f"Erreur lors de l'analyse du fichier: {str(e)}")
 
-@router.post("/import-file/")
-async def import_file_to_devis(file: UploadFile = File(...), db: Session = Depends(get_db)):
-    """Importer un fichier et créer directement un devis."""
-    logger.info(f"Importation du fichier vers devis: {file.filename}")
-    
-    # Vérifier le type de fichier
-    file_extension = os.path.splitext(file.filename.lower())[1]
-    if file_extension not in ('.xlsx', '.xls', '.pdf'):
-        raise HTTPException(
-            status_code=400, 
-            detail="Le fichier doit être au format Excel (.xlsx ou .xls) ou PDF (.pdf)"
+# Lignes par insertion groupée lors d'un import (requêtes de taille bornée)
+IMPORT_INSERT_CHUNK_SIZE = 1000
+
+def insert_imported_devis_items(db: Session, devis_id: int, items: List[dict]) -> None:
+    """
+    Insère les lignes importées d'un devis, par insertions groupées de
+    IMPORT_INSERT_CHUNK_SIZE lignes.
+    """
+    for start in range(0, len(items), IMPORT_INSERT_CHUNK_SIZE):
+        db.execute(
+            insert(models.DevisItem).execution_options(render_nulls=True),
+            [
+                {
+                    "devis_id": devis_id,
+                    "product_id": None,
+                    "hardware_id": None,
+                    "source_type": "imported",
+                    "brand": item_data["brand"],
+                    "pn": item_data["pn"],
+                    "eq_reference": item_data["eq_reference"],
+                    "qty": item_data["qty"],
+                    "unit": "Unit",
+                    "unit_price": item_data["unit_price"],
+                    "total_price": item_data["unit_price"] * item_data["qty"]
+                }
+                for item_data in items[start:start + IMPORT_INSERT_CHUNK_SIZE]
+            ]
         )
+
+@router.post("/import-file/")
+async def import_file_to_devis(
+    file: Optional[UploadFile] = File(None),
+    upload_token: Optional[str] = Form(None),
+    db: Session = Depends(get_db)
+):
+    """Importer un fichier (ou le jeton de sa prévisualisation) et créer directement un devis."""
+    logger.info(f"Importation du fichier vers devis: {file.filename if file else upload_token}")
     
     try:
-        # Lire le contenu du fichier
-        contents = await file.read()
-        logger.info(f"Taille du fichier lu: {len(contents)} octets")
-        
-        # Traiter le fichier en fonction de son extension
-        parsed_data = process_file(contents, file_extension)
+        entry = await load_parsed_upload(file, upload_token)
+        parsed_data = entry["parsed"]
+        file_extension = entry["extension"]
         logger.info(f"Analyse terminée, {len(parsed_data['items'])} éléments trouvés")
         
         # Vérifier si des éléments ont été trouvés
@@ -630,7 +570,7 @@ async def import_file_to_devis(file: UploadFile = File(...), db: Session = Depen
             )
         
         # Créer le devis avec les informations extraites
-        devis_number = parsed_data["devis_number"]
+        devis_number = devis_number_for(parsed_data)
         client_name = parsed_data["client"]
         
         # Essayer de trouver le client dans la base de données
@@ -663,22 +603,8 @@ async def import_file_to_devis(file: UploadFile = File(...), db: Session = Depen
         db.add(new_devis)
         db.flush()  # Obtenir l'ID sans commit
         
-        # Créer les éléments de devis
-        for item_data in parsed_data["items"]:
-            devis_item = models.DevisItem(
-                devis_id=new_devis.id,
-                product_id=None,  # Pas de liaison directe pour les imports
-                hardware_id=None,
-                source_type="imported",
-                brand=item_data["brand"],
-                pn=item_data["pn"],
-                eq_reference=item_data["eq_reference"],
-                qty=item_data["qty"],
-                unit="Unit",
-                unit_price=item_data["unit_price"],
-                total_price=item_data["unit_price"] * item_data["qty"]
-            )
-            db.add(devis_item)
+        # Créer les éléments de devis (pas de liaison directe pour les imports)
+        insert_imported_devis_items(db, new_devis.id, parsed_data["items"])
         
         # Valider toutes les modifications
         db.commit()
@@ -690,6 +616,9 @@ async def import_file_to_devis(file: UploadFile = File(...), db: Session = Depen
             "devis_id": new_devis.id,
             "devis_number": devis_number
         }
+    except HTTPException:
+        db.rollback()
+        raise
     except Exception as e:
         db.rollback()
         logger.error(f"Erreur lors de la création du devis: {str(e)}", exc_info=True)
@@ -697,11 +626,12 @@ async def import_file_to_devis(file: UploadFile = File(...), db: Session = Depen
 
 @router.post("/import-to-client/")
 async def import_to_client_devis(
-    file: UploadFile = File(...), 
+    file: Optional[UploadFile] = File(None), 
     client_id: int = Form(...), 
+    upload_token: Optional[str] = Form(None),
     db: Session = Depends(get_db)
 ):
-    """Importer un fichier et créer un devis associé à un client spécifique."""
+    """Importer un fichier (ou le jeton de sa prévisualisation) et créer un devis associé à un client spécifique."""
     logger.info(f"Importation vers devis pour client: {client_id}")
     
     # Vérifier que le client existe
@@ -709,18 +639,10 @@ async def import_to_client_devis(
     if not client:
         raise HTTPException(status_code=404, detail="Client non trouvé")
     
-    # Vérifier le type de fichier
-    file_extension = os.path.splitext(file.filename.lower())[1]
-    if file_extension not in ('.xlsx', '.xls', '.pdf'):
-        raise HTTPException(
-            status_code=400, 
-            detail="Le fichier doit être au format Excel (.xlsx ou .xls) ou PDF (.pdf)"
-        )
-    
     try:
-        # Lire le contenu du fichier
-        contents = await file.read()
-        parsed_data = process_file(contents, file_extension)
+        entry = await load_parsed_upload(file, upload_token)
+        parsed_data = entry["parsed"]
+        file_extension = entry["extension"]
         
         if not parsed_data["items"]:
             raise HTTPException(
@@ -729,7 +651,7 @@ async def import_to_client_devis(
             )
         
         # Créer le devis avec les informations du client sélectionné
-        devis_number = parsed_data["devis_number"]
+        devis_number = devis_number_for(parsed_data)
         total_amount = sum(item["unit_price"] * item["qty"] for item in parsed_data["items"])
         
         new_devis = models.DevisOddnet(
@@ -754,21 +676,7 @@ async def import_to_client_devis(
         db.flush()
         
         # Créer les éléments de devis
-        for item_data in parsed_data["items"]:
-            devis_item = models.DevisItem(
-                devis_id=new_devis.id,
-                product_id=None,
-                hardware_id=None,
-                source_type="imported",
-                brand=item_data["brand"],
-                pn=item_data["pn"],
-                eq_reference=item_data["eq_reference"],
-                qty=item_data["qty"],
-                unit="Unit",
-                unit_price=item_data["unit_price"],
-                total_price=item_data["unit_price"] * item_data["qty"]
-            )
-            db.add(devis_item)
+        insert_imported_devis_items(db, new_devis.id, parsed_data["items"])
         
         db.commit()
         
@@ -778,6 +686,9 @@ async def import_to_client_devis(
             "devis_id": new_devis.id,
             "devis_number": devis_number
         }
+    except HTTPException:
+        db.rollback()
+        raise
     except Exception as e:
         db.rollback()
         logger.error(f"Erreur lors de la création du devis: {str(e)}", exc_info=True)
@@ -815,19 +726,7 @@ def create_devis(devis: DevisCreate, db: Session = Depends(get_db)):
     # Créer les articles du devis en batch
     devis_items = []
     for item in devis.items:
-        db_item = models.DevisItem(
-            devis_id=db_devis.id,
-            product_id=item.product_id,
-            hardware_id=item.hardware_id,
-            source_type=item.source_type,
-            brand=item.brand,
-            pn=item.pn,
-            eq_reference=item.eq_reference,
-            qty=item.qty,
-            unit=item.unit,
-            unit_price=item.unit_price,
-            total_price=item.unit_price * item.qty
-        )
+        db_item = models.DevisItem(devis_id=db_devis.id, **devis_item_values(item))
         devis_items.append(db_item)
     
     db.add_all(devis_items)
@@ -869,14 +768,135 @@ def create_devis(devis: DevisCreate, db: Session = Depends(get_db)):
     db.refresh(db_devis)
     return db_devis
 
-@router.get("/", response_model=List[DevisResponse])
-def read_devis(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    # Optimisation: charger les relations en une seule requête
-    devis = db.query(models.DevisOddnet).options(
-        selectinload(models.DevisOddnet.items),
-        selectinload(models.DevisOddnet.shipping_info)
-    ).offset(skip).limit(limit).all()
-    return devis
+# Colonnes renvoyées par la liste des devis (sans les lignes)
+DEVIS_LIST_COLUMNS = (
+    "id", "reference", "devis_number", "date_creation", "client_id", "company_name",
+    "contact_name", "country", "project", "currency", "total_amount", "tva",
+    "discount", "status", "eta"
+)
+DEVIS_LIST_INCLUDES = ("items", "shipping")
+DEVIS_LIST_SORTS = ("id", "date")
+
+def encode_devis_cursor(sort: str, row) -> str:
+    if sort == "date":
+        return f"{row.date_creation.isoformat() if row.date_creation else '~'},{row.id}"
+    return str(row.id)
+
+def devis_cursor_filter(sort: str, cursor: str):
+    """
+    Condition "après le curseur" pour la pagination par clé.
+
+    Tri "id": id croissant. Tri "date": date décroissante puis id décroissant,
+    devis sans date en dernier.
+
+    Raises:
+        ValueError: si le curseur est invalide
+    """
+    Devis = models.DevisOddnet
+    if sort == "id":
+        if not cursor.isdigit():
+            raise ValueError(f"Curseur invalide: {cursor}")
+        return Devis.id > int(cursor)
+
+    cursor_date, _, cursor_id = cursor.partition(",")
+    if not cursor_id.isdigit():
+        raise ValueError(f"Curseur invalide: {cursor}")
+    cursor_id = int(cursor_id)
+    if cursor_date == "~":
+        return and_(Devis.date_creation.is_(None), Devis.id < cursor_id)
+    cursor_date = date.fromisoformat(cursor_date)
+    return or_(
+        Devis.date_creation < cursor_date,
+        and_(Devis.date_creation == cursor_date, Devis.id < cursor_id),
+        Devis.date_creation.is_(None)
+    )
+
+@router.get("/", response_model=List[DevisListItem])
+def read_devis(
+    skip: int = Query(0, ge=0, description="Obsolète: préférer cursor (coût constant quelle que soit la page)"),
+    limit: int = Query(100, ge=1, le=500),
+    cursor: Optional[str] = Query(None, description="Curseur de pagination (en-tête X-Next-Cursor de la page précédente)"),
+    sort: str = Query("id", description="'id' (croissant) ou 'date' (plus récents d'abord)"),
+    include: Optional[str] = Query(None, description="Données supplémentaires: 'items', 'shipping' (séparées par des virgules)"),
+    status: Optional[str] = None,
+    client_id: Optional[int] = None,
+    currency: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    db: Session = Depends(get_db)
+):
+    """
+    Liste des devis: en-têtes et totaux seulement, pagination par clé.
+
+    En-têtes de réponse: X-Total-Count (nombre de devis pour ces filtres) et
+    X-Next-Cursor tant qu'il reste des pages.
+    """
+    if sort not in DEVIS_LIST_SORTS:
+        raise HTTPException(status_code=400, detail=f"Tri invalide: {sort} (attendu: {', '.join(DEVIS_LIST_SORTS)})")
+    includes = {part.strip() for part in include.split(",") if part.strip()} if include else set()
+    unknown = includes - set(DEVIS_LIST_INCLUDES)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"include invalide: {', '.join(sorted(unknown))} (attendu: {', '.join(DEVIS_LIST_INCLUDES)})")
+
+    Devis = models.DevisOddnet
+    filters = []
+    if status:
+        filters.append(Devis.status == status)
+    if client_id is not None:
+        filters.append(Devis.client_id == client_id)
+    if currency:
+        filters.append(Devis.currency == currency)
+    if date_from:
+        filters.append(Devis.date_creation >= date_from)
+    if date_to:
+        filters.append(Devis.date_creation <= date_to)
+
+    # Comptage sur les seules colonnes indexées (pas de lecture des lignes)
+    total = db.query(func.count(Devis.id)).filter(*filters).scalar()
+
+    query = db.query(*(getattr(Devis, column) for column in DEVIS_LIST_COLUMNS)).filter(*filters)
+    if cursor:
+        try:
+            query = query.filter(devis_cursor_filter(sort, cursor))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    elif skip:
+        query = query.offset(skip)
+    if sort == "date":
+        query = query.order_by(Devis.date_creation.desc(), Devis.id.desc())
+    else:
+        query = query.order_by(Devis.id)
+
+    # Une ligne de plus pour savoir s'il reste une page
+    rows = query.limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    devis_list = [row._asdict() for row in rows]
+
+    page_ids = [row.id for row in rows]
+    if "items" in includes:
+        items_by_devis = {devis_id: [] for devis_id in page_ids}
+        if page_ids:
+            for item in (
+                db.query(models.DevisItem)
+                .filter(models.DevisItem.devis_id.in_(page_ids))
+                .order_by(models.DevisItem.id)
+            ):
+                items_by_devis[item.devis_id].append(DevisItemResponse.model_validate(item))
+        for entry in devis_list:
+            entry["items"] = items_by_devis[entry["id"]]
+    if "shipping" in includes:
+        shipping_by_devis = {}
+        if page_ids:
+            for shipping in db.query(models.DevisShipping).filter(models.DevisShipping.devis_id.in_(page_ids)):
+                shipping_by_devis[shipping.devis_id] = DevisShippingResponse.model_validate(shipping)
+        for entry in devis_list:
+            entry["shipping_info"] = shipping_by_devis.get(entry["id"])
+
+    headers = {"X-Total-Count": str(total)}
+    if has_more and rows:
+        headers["X-Next-Cursor"] = encode_devis_cursor(sort, rows[-1])
+    return JSONResponse(content=jsonable_encoder(devis_list), headers=headers)
 
 @router.get("/{devis_id}", response_model=DevisResponse)
 def read_devis_by_id(devis_id: int, db: Session = Depends(get_db)):
@@ -890,46 +910,110 @@ def read_devis_by_id(devis_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Devis not found")
     return devis
 
+# Colonnes d'une ligne de devis comparées lors de la sauvegarde
+DEVIS_ITEM_FIELDS = (
+    "product_id", "hardware_id", "source_type", "brand", "pn",
+    "eq_reference", "qty", "unit", "unit_price", "total_price"
+)
+
+def devis_item_values(item: DevisItemCreate) -> dict:
+    """
+    Valeurs à enregistrer pour une ligne de devis (total calculé).
+    """
+    values = item.dict(include=set(DEVIS_ITEM_FIELDS) - {"total_price"})
+    values["total_price"] = item.unit_price * item.qty
+    return values
+
+def diff_devis_items(existing_rows, items: List[DevisItemCreate]) -> dict:
+    """
+    Compare les lignes enregistrées d'un devis avec les lignes soumises.
+
+    Les lignes soumises avec l'id d'une ligne existante du devis sont comparées
+    à celle-ci; les autres sont des ajouts et les lignes non référencées sont
+    supprimées. Si aucune ligne soumise ne porte d'id connu (ancien client),
+    les lignes sont appariées par position.
+
+    Args:
+        existing_rows: Lignes actuelles (id + DEVIS_ITEM_FIELDS), triées par id
+        items: Lignes soumises, dans l'ordre du devis
+
+    Returns:
+        {"insert": [valeurs], "update": [valeurs avec id], "delete": [ids]}
+    """
+    existing_by_id = {row.id: row for row in existing_rows}
+    pairs, new_items = [], []
+    if any(item.id in existing_by_id for item in items):
+        claimed = set()
+        for item in items:
+            if item.id in existing_by_id and item.id not in claimed:
+                claimed.add(item.id)
+                pairs.append((existing_by_id[item.id], item))
+            else:
+                new_items.append(item)
+        deleted = [row.id for row in existing_rows if row.id not in claimed]
+    else:
+        pairs = list(zip(existing_rows, items))
+        new_items = items[len(pairs):]
+        deleted = [row.id for row in existing_rows[len(pairs):]]
+
+    updates = []
+    for row, item in pairs:
+        values = devis_item_values(item)
+        if any(getattr(row, field) != value for field, value in values.items()):
+            updates.append({"id": row.id, **values})
+
+    return {
+        "insert": [devis_item_values(item) for item in new_items],
+        "update": updates,
+        "delete": deleted,
+    }
+
 @router.put("/{devis_id}", response_model=DevisResponse)
 def update_devis(devis_id: int, devis: DevisCreate, db: Session = Depends(get_db)):
-    db_devis = db.query(models.DevisOddnet).filter(models.DevisOddnet.id == devis_id).first()
+    # Le shipping est chargé avec le devis (relation 1-1)
+    db_devis = (
+        db.query(models.DevisOddnet)
+        .options(joinedload(models.DevisOddnet.shipping_info))
+        .filter(models.DevisOddnet.id == devis_id)
+        .first()
+    )
     if db_devis is None:
         raise HTTPException(status_code=404, detail="Devis not found")
     
     # Calculer le nouveau montant total
     total_amount = sum(item.unit_price * item.qty for item in devis.items)
     
-    # Mettre à jour les champs du devis
+    # Mettre à jour les champs du devis (seuls les champs modifiés sont écrits)
     for key, value in devis.dict(exclude={"items", "shipping"}).items():
         setattr(db_devis, key, value)
     
     db_devis.total_amount = total_amount
     
-    # Supprimer les anciens articles en batch
-    db.query(models.DevisItem).filter(models.DevisItem.devis_id == devis_id).delete()
+    # Appliquer uniquement les différences sur les lignes
+    existing_rows = (
+        db.query(models.DevisItem.id, *(getattr(models.DevisItem, field) for field in DEVIS_ITEM_FIELDS))
+        .filter(models.DevisItem.devis_id == devis_id)
+        .order_by(models.DevisItem.id)
+        .all()
+    )
+    changes = diff_devis_items(existing_rows, devis.items)
     
-    # Créer les nouveaux articles en batch
-    new_items = []
-    for item in devis.items:
-        db_item = models.DevisItem(
-            devis_id=db_devis.id,
-            product_id=item.product_id,
-            hardware_id=item.hardware_id,
-            source_type=item.source_type,
-            brand=item.brand,
-            pn=item.pn,
-            eq_reference=item.eq_reference,
-            qty=item.qty,
-            unit=item.unit,
-            unit_price=item.unit_price,
-            total_price=item.unit_price * item.qty
+    if changes["delete"]:
+        db.execute(delete(models.DevisItem).where(models.DevisItem.id.in_(changes["delete"])))
+    if changes["update"]:
+        db.execute(update(models.DevisItem), changes["update"])
+    if changes["insert"]:
+        db.execute(
+            insert(models.DevisItem).execution_options(render_nulls=True),
+            [{"devis_id": devis_id, **values} for values in changes["insert"]]
         )
-        new_items.append(db_item)
-    
-    db.add_all(new_items)
+    logger.debug(
+        f"Devis {devis_id} - lignes: {len(changes['insert'])} ajoutées, "
+        f"{len(changes['update'])} modifiées, {len(changes['delete'])} supprimées"
+    )
     
     # Gérer les informations de shipping
-    existing_shipping = db.query(models.DevisShipping).filter(models.DevisShipping.devis_id == devis_id).first()
+    existing_shipping = db_devis.shipping_info
     
     if devis.shipping and devis.shipping.enabled:
         legs_json = None
@@ -969,11 +1053,135 @@ def update_devis(devis_id: int, devis: DevisCreate, db: Session = Depends(get_db
     db.refresh(db_devis)
     return db_devis
 
+@router.patch("/{devis_id}/items/{item_id}", response_model=DevisItemResponse)
+def update_devis_item(devis_id: int, item_id: int, changes: DevisItemUpdate, db: Session = Depends(get_db)):
+    """
+    Modifie une seule ligne du devis (seuls les champs fournis sont changés).
+
+    Le total de la ligne est recalculé et le montant du devis ajusté de la
+    différence, sans relire ni réécrire les autres lignes.
+    """
+    db_item = (
+        db.query(models.DevisItem)
+        .filter(models.DevisItem.id == item_id, models.DevisItem.devis_id == devis_id)
+        .first()
+    )
+    if db_item is None:
+        raise HTTPException(status_code=404, detail="Ligne de devis introuvable")
+
+    try:
+        previous_total = db_item.total_price or 0.0
+        for key, value in changes.dict(exclude_unset=True).items():
+            setattr(db_item, key, value)
+        db_item.total_price = (db_item.unit_price or 0.0) * (db_item.qty or 0)
+
+        delta = db_item.total_price - previous_total
+        if delta:
+            # Ajustement atomique du total (pas de lecture des autres lignes)
+            db.execute(
+                update(models.DevisOddnet)
+                .where(models.DevisOddnet.id == devis_id)
+                .values(total_amount=func.coalesce(models.DevisOddnet.total_amount, 0.0) + delta)
+            )
+
+        db.commit()
+        db.refresh(db_item)
+        return db_item
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Erreur lors de la mise à jour de la ligne {item_id}: {str(e)}")
+        raise HTTPException(status_code=400, detail=f"Erreur lors de la mise à jour de la ligne: {str(e)}")
+
+def aggregate_devis_item_weights(db: Session, devis_id: int, calculator: DHLPdfCalculator) -> dict:
+    """
+    Agrège le poids des lignes d'un devis à partir des produits/équipements liés.
+
+    Une seule requête groupée (jointures externes sur Product et HardwareIT):
+    une ligne par article distinct avec la quantité cumulée, quel que soit le
+    nombre de lignes du devis.
+
+    Args:
+        db: Session SQLAlchemy
+        devis_id: ID du devis
+        calculator: Calculateur DHL (poids volumétrique)
+
+    Returns:
+        Poids réel, volumétrique et facturable cumulés, et les articles sans poids
+    """
+    # Poids à 0: non renseigné (article signalé, ou poids de l'équipement lié)
+    weight = func.coalesce(func.nullif(models.Product.poids_kg, 0), func.nullif(models.HardwareIT.poids_kg, 0))
+    dimensions = func.coalesce(models.Product.dimensions, models.HardwareIT.dimensions)
+    rows = (
+        db.query(
+            models.DevisItem.product_id,
+            models.DevisItem.hardware_id,
+            weight.label("poids_kg"),
+            dimensions.label("dimensions"),
+            func.min(models.DevisItem.pn).label("pn"),
+            func.count(models.DevisItem.id).label("lines"),
+            func.sum(func.coalesce(models.DevisItem.qty, 1)).label("qty")
+        )
+        .outerjoin(models.Product, models.Product.id == models.DevisItem.product_id)
+        .outerjoin(models.HardwareIT, models.HardwareIT.id == models.DevisItem.hardware_id)
+        .filter(models.DevisItem.devis_id == devis_id)
+        .group_by(models.DevisItem.product_id, models.DevisItem.hardware_id, weight, dimensions)
+        .all()
+    )
+
+    total_weight = 0.0
+    volumetric_weight = 0.0
+    lines = lines_with_weight = lines_without_dimensions = 0
+    items_without_weight = []
+    for row in rows:
+        lines += row.lines
+        qty = row.qty or 0
+        if not row.poids_kg or row.poids_kg <= 0:
+            items_without_weight.append({
+                "product_id": row.product_id,
+                "hardware_id": row.hardware_id,
+                "pn": row.pn,
+                "lines": row.lines,
+                "qty": qty,
+                "reason": "Article non lié à un produit" if row.product_id is None and row.hardware_id is None else "Poids non renseigné"
+            })
+            continue
+
+        lines_with_weight += row.lines
+        total_weight += qty * row.poids_kg
+        dims = calculator.parse_dimensions(row.dimensions) if row.dimensions else None
+        if dims:
+            volumetric_weight += qty * calculator.calculate_volumetric_weight(*dims)
+        else:
+            lines_without_dimensions += row.lines
+
+    return {
+        "total_weight_kg": round(total_weight, 3),
+        "volumetric_weight_kg": round(volumetric_weight, 3),
+        "billable_weight_kg": round(max(total_weight, volumetric_weight), 3),
+        "lines": lines,
+        "lines_with_weight": lines_with_weight,
+        "lines_without_weight": lines - lines_with_weight,
+        "lines_without_dimensions": lines_without_dimensions,
+        "items_without_weight": items_without_weight
+    }
+
+@router.get("/{devis_id}/shipping-weight")
+def get_devis_shipping_weight(
+    devis_id: int,
+    db: Session = Depends(get_db),
+    calculator: DHLPdfCalculator = Depends(get_dhl_calculator)
+):
+    """Aperçu du poids agrégé des lignes du devis (sans calcul des frais)."""
+    if not db.query(models.DevisOddnet.id).filter(models.DevisOddnet.id == devis_id).first():
+        raise HTTPException(status_code=404, detail="Devis non trouvé")
+    return aggregate_devis_item_weights(db, devis_id, calculator)
+
 @router.post("/{devis_id}/calculate-shipping")
 def calculate_shipping_for_devis(
     devis_id: int, 
     shipping_request: dict, 
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    calculator: DHLPdfCalculator = Depends(get_dhl_calculator)
 ):
     """Calculer les frais de transport pour l'ensemble du devis avec conversion de devise CORRIGÉE."""
     print(f"=== CALCUL SHIPPING POUR DEVIS {devis_id} ===")
@@ -986,8 +1194,25 @@ def calculate_shipping_for_devis(
     
     print(f"Devis trouvé - Devise: {devis.currency}")
     
+    # Poids saisi, ou agrégé depuis les produits/équipements liés aux lignes du devis
+    weight_summary = None
+    if shipping_request.get("weight_source") == "items":
+        weight_summary = aggregate_devis_item_weights(db, devis_id, calculator)
+        print(f"Poids agrégé des lignes: {weight_summary['total_weight_kg']}kg réel, "
+              f"{weight_summary['billable_weight_kg']}kg facturable, "
+              f"{len(weight_summary['items_without_weight'])} groupes sans poids")
+        if weight_summary["total_weight_kg"] <= 0:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Aucune ligne du devis n'a de poids renseigné ({weight_summary['lines_without_weight']} lignes sans poids)."
+            )
+        weight_kg_raw = weight_summary["total_weight_kg"]
+        dimensions = None
+    else:
+        weight_kg_raw = shipping_request.get("total_weight_kg")
+        dimensions = shipping_request.get("dimensions")
+    
     # Vérifier que le poids est fourni et le convertir en float
-    weight_kg_raw = shipping_request.get("total_weight_kg")
     if not weight_kg_raw:
         raise HTTPException(
             status_code=400, 
@@ -1005,13 +1230,12 @@ def calculate_shipping_for_devis(
         )
     
     try:
-        # Utiliser le calculateur DHL
-        calculator = DHLPdfCalculator()
-        
         # Calculer le poids effectif si les dimensions sont fournies
         effective_weight = weight_kg
-        if shipping_request.get("dimensions"):
-            dims = calculator.parse_dimensions(shipping_request["dimensions"])
+        if weight_summary:
+            effective_weight = weight_summary["billable_weight_kg"]
+        elif dimensions:
+            dims = calculator.parse_dimensions(dimensions)
             if dims:
                 length, width, height = dims
                 effective_weight = calculator.get_effective_weight(weight_kg, length, width, height)
@@ -1027,7 +1251,7 @@ def calculate_shipping_for_devis(
             result = calculator.calculate_multi_leg_shipping(
                 legs=legs,
                 weight_kg=effective_weight,
-                dimensions=calculator.parse_dimensions(shipping_request.get("dimensions")) if shipping_request.get("dimensions") else None,
+                dimensions=calculator.parse_dimensions(dimensions) if dimensions else None,
                 premium_service=shipping_request.get("premium_service")
             )
             
@@ -1064,7 +1288,7 @@ def calculate_shipping_for_devis(
         if shipping_info:
             shipping_info.enabled = True
             shipping_info.total_weight_kg = weight_kg
-            shipping_info.dimensions = shipping_request.get("dimensions")
+            shipping_info.dimensions = dimensions
             shipping_info.destination_country = shipping_request["destination_country"]
             shipping_info.direction = shipping_request.get("direction", "export")
             shipping_info.premium_service = shipping_request.get("premium_service")
@@ -1073,6 +1297,7 @@ def calculate_shipping_for_devis(
             shipping_info.shipping_zone = zone if isinstance(zone, int) else None
             shipping_info.effective_weight_kg = effective_weight
             shipping_info.calculated_at = datetime.now()
+            shipping_info.tariff_version = calculator.tariff_version
             shipping_info.is_multi_leg = shipping_request.get("is_multi_leg", False)
             if shipping_request.get("is_multi_leg") and shipping_request.get("legs"):
                 shipping_info.legs_data = json.dumps(shipping_request["legs"])
@@ -1081,7 +1306,7 @@ def calculate_shipping_for_devis(
                 devis_id=devis_id,
                 enabled=True,
                 total_weight_kg=weight_kg,
-                dimensions=shipping_request.get("dimensions"),
+                dimensions=dimensions,
                 destination_country=shipping_request["destination_country"],
                 direction=shipping_request.get("direction", "export"),
                 premium_service=shipping_request.get("premium_service"),
@@ -1090,6 +1315,7 @@ def calculate_shipping_for_devis(
                 shipping_zone=zone if isinstance(zone, int) else None,
                 effective_weight_kg=effective_weight,
                 calculated_at=datetime.now(),
+                tariff_version=calculator.tariff_version,
                 is_multi_leg=shipping_request.get("is_multi_leg", False),
                 legs_data=json.dumps(shipping_request["legs"]) if shipping_request.get("is_multi_leg") and shipping_request.get("legs") else None
             )
@@ -1109,8 +1335,12 @@ def calculate_shipping_for_devis(
             "currency": devis.currency,
             "exchange_rate": EXCHANGE_RATES.get(devis.currency, 1.0),
             "total_amount_with_shipping": total_with_shipping,
-            "is_multi_leg": shipping_request.get("is_multi_leg", False)
+            "is_multi_leg": shipping_request.get("is_multi_leg", False),
+            "tariff_version": calculator.tariff_version,
+            "weight_source": "items" if weight_summary else "manual"
         }
+        if weight_summary:
+            response["weight_summary"] = weight_summary
         
         print(f"=== RÉPONSE FINALE ===")
         print(f"Coût shipping: {shipping_cost_converted} {devis.currency}")
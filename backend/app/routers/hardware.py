@@ -5,7 +5,7 @@ from pydantic import BaseModel
 from ..database import get_db
 from .. import models
 from sqlalchemy import func
-from ..dhl_pdf_calculator import DHLPdfCalculator
+from ..dhl_pdf_calculator import DHLPdfCalculator, get_dhl_calculator
 from typing import Optional, List, Dict, Any
 
 router = APIRouter(
@@ -394,7 +394,7 @@ def get_brands_by_supplier(supplier_id: int, db: Session = Depends(get_db)):
 
 # Ajouter cette route
 @router.post("/calculate-shipping", response_model=Dict[str, Any])
-def calculate_hardware_shipping(request: HardwareShippingRequest, db: Session = Depends(get_db)):
+def calculate_hardware_shipping(request: HardwareShippingRequest, db: Session = Depends(get_db), dhl_calculator: DHLPdfCalculator = Depends(get_dhl_calculator)):
     """
     Calcule les frais de transport pour un équipement hardware.
     """
@@ -404,9 +404,6 @@ def calculate_hardware_shipping(request: HardwareShippingRequest, db: Session =
         raise HTTPException(status_code=404, detail="Hardware not found")
     
     try:
-        # Initialiser le calculateur DHL
-        dhl_calculator = DHLPdfCalculator()
-        
         # Vérifier si le poids est défini
         if not hardware.poids_kg:
             raise HTTPException(status_code=400, detail="Le poids de l'équipement n'est pas défini")
@@ -461,7 +458,8 @@ def update_hardware_shipping_info(
     hardware_id: int, 
     poids_kg: Optional[float] = None,
     dimensions: Optional[str] = None,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    dhl_calculator: DHLPdfCalculator = Depends(get_dhl_calculator)
 ):
     """
     Met à jour les informations de poids et dimensions pour un équipement hardware.
@@ -477,7 +475,6 @@ def update_hardware_shipping_info(
     
     if dimensions is not None:
         # Valider le format des dimensions
-        dhl_calculator = DHLPdfCalculator()
         if dhl_calculator.parse_dimensions(dimensions):
             hardware.dimensions = dimensions
         else:
@@ -3,7 +3,7 @@ from sqlalchemy.orm import Session
 from typing import Dict, Any, Optional, List
 from ..database import get_db
 from .. import models
-from ..dhl_pdf_calculator import DHLPdfCalculator
+from ..dhl_pdf_calculator import DHLPdfCalculator, get_dhl_calculator
 from sqlalchemy.sql import func
 import datetime
 import traceback
@@ -100,6 +100,7 @@ def get_all_hardware_shipping(
                 "shipping_cost": shipping_info.shipping_cost,
                 "shipping_zone": shipping_info.shipping_zone,
                 "calculated_at": shipping_info.calculated_at.isoformat() if shipping_info.calculated_at else None,
+                "tariff_version": shipping_info.tariff_version,
                 "saved": True
             }
             shipping_list.append(shipping_data)
@@ -144,6 +145,7 @@ def get_hardware_shipping(hardware_id: int, db: Session = Depends(get_db)):
             "effective_weight_kg": info.weight_kg,
             "currency": "MAD",
             "calculated_at": info.calculated_at.isoformat() if info.calculated_at else None,
+            "tariff_version": info.tariff_version,
             "saved": True,
             "exists": True
         }
@@ -169,7 +171,8 @@ def delete_hardware_shipping(id: int, db: Session = Depends(get_db)):
 def create_hardware_shipping(
     hardware_id: int,
     shipping_data: dict = Body(...),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    dhl_calculator: DHLPdfCalculator = Depends(get_dhl_calculator)
 ):
     """
     Crée ou met à jour les informations de transport pour un équipement hardware.
@@ -192,9 +195,6 @@ def create_hardware_shipping(
         if not weight or not dest_country:
             raise HTTPException(status_code=422, detail="Poids et pays de destination requis")
         
-        # Initialiser le calculateur DHL
-        dhl_calculator = DHLPdfCalculator()
-        
         # Calculer le poids effectif si les dimensions sont fournies
         effective_weight = weight
         if dims_str:
@@ -233,6 +233,7 @@ def create_hardware_shipping(
             hardware_shipping_info.shipping_cost = shipping_cost
             hardware_shipping_info.shipping_zone = zone
             hardware_shipping_info.calculated_at = func.now()
+            hardware_shipping_info.tariff_version = dhl_calculator.tariff_version
         else:
             # Créer de nouvelles informations de transport
             hardware_shipping_info = models.ShippingInfo(
@@ -243,7 +244,8 @@ def create_hardware_shipping(
                 direction=dir_value,
                 premium_service=premium,
                 shipping_cost=shipping_cost,
-                shipping_zone=zone
+                shipping_zone=zone,
+                tariff_version=dhl_calculator.tariff_version
             )
             db.add(hardware_shipping_info)
         
@@ -269,6 +271,7 @@ def create_hardware_shipping(
             "effective_weight_kg": effective_weight,
             "currency": "MAD",
             "calculated_at": datetime.datetime.now().isoformat(),
+            "tariff_version": dhl_calculator.tariff_version,
             "saved": True
         }
     except HTTPException:
@@ -284,7 +287,8 @@ def create_hardware_shipping(
 def update_hardware_shipping(
     hardware_id: int,
     shipping_data: dict = Body(...),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    dhl_calculator: DHLPdfCalculator = Depends(get_dhl_calculator)
 ):
     """
     Met à jour les informations de transport pour un équipement hardware.
@@ -308,7 +312,6 @@ def update_hardware_shipping(
                 setattr(shipping_info, field, shipping_data[field])
         
         # Recalculer si nécessaire
-        dhl_calculator = DHLPdfCalculator()
         shipping_info.shipping_cost = dhl_calculator.calculate_shipping_cost(
             weight_kg=shipping_info.weight_kg,
             country=shipping_info.destination_country,
@@ -320,6 +323,7 @@ def update_hardware_shipping(
             shipping_info.direction
         )
         shipping_info.calculated_at = func.now()
+        shipping_info.tariff_version = dhl_calculator.tariff_version
         
         db.commit()
         
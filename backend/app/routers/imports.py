@@ -0,0 +1,72 @@
+from fastapi import APIRouter, File, Form, HTTPException, UploadFile
+from fastapi.responses import JSONResponse
+import logging
+import os
+
+from . import devis, hardware_import
+from ..utils.import_jobs import ImportQueueFull, import_jobs
+from ..utils.uploads import UploadTooLarge, register_upload_limit, spool_upload
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(
+    prefix="/imports",
+    tags=["imports"],
+    responses={404: {"description": "Not found"}},
+)
+
+# Taille maximale des fichiers mis en file (UPLOAD_MAX_BYTES_IMPORTS), 413 au-delà
+IMPORTS_UPLOAD_MAX_BYTES = register_upload_limit("imports", "/imports/")
+
+# Analyseur utilisé pour chaque type d'import (même cache que les endpoints d'import)
+PARSERS = {
+    "devis": devis.process_file,
+    "hardware": hardware_import.process_file,
+}
+
+
+@router.post("/", status_code=202)
+async def submit_import(file: UploadFile = File(...), kind: str = Form("devis")):
+    """
+    Mettre un fichier en file d'analyse et retourner l'identifiant du travail.
+
+    Le résultat se consulte sur GET /imports/{job_id}; son upload_token
+    s'utilise ensuite avec les endpoints d'import (/devis/import-file/,
+    /hardware/import-to-devis/, ...).
+    """
+    if kind not in PARSERS:
+        raise HTTPException(status_code=400, detail=f"Type d'import invalide: {kind} (attendu: {', '.join(PARSERS)})")
+
+    file_extension = os.path.splitext(file.filename.lower())[1]
+    if file_extension not in ('.xlsx', '.xls', '.pdf'):
+        raise HTTPException(
+            status_code=400,
+            detail="Le fichier doit être au format Excel (.xlsx ou .xls) ou PDF (.pdf)"
+        )
+
+    try:
+        upload = await spool_upload(file, IMPORTS_UPLOAD_MAX_BYTES)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    # Fichier (ou son chemin) lu sur place par le travail, supprimé à la fin de l'analyse
+    try:
+        job_id = import_jobs.submit(
+            kind, upload.source, file_extension, file.filename, PARSERS[kind], upload.token, upload.close
+        )
+    except ImportQueueFull as e:
+        raise HTTPException(status_code=429, detail=f"Trop d'imports en cours, réessayez plus tard ({str(e)})")
+
+    logger.info(f"Import {kind} mis en file: {file.filename} -> {job_id}")
+    return JSONResponse(status_code=202, content=import_jobs.status(job_id))
+
+
+@router.get("/{job_id}")
+def get_import_status(job_id: str):
+    """
+    État d'un travail d'analyse: status (queued, running, done, failed),
+    progress (0-100), result et upload_token une fois terminé.
+    """
+    job = import_jobs.status(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Travail d'import introuvable ou expiré")
+    return job
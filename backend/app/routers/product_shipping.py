@@ -3,7 +3,7 @@ from sqlalchemy.orm import Session
 from typing import Dict, Any, Optional, List
 from ..database import get_db
 from .. import models
-from ..dhl_pdf_calculator import DHLPdfCalculator
+from ..dhl_pdf_calculator import DHLPdfCalculator, get_dhl_calculator
 from sqlalchemy.sql import func
 import datetime
 
@@ -17,7 +17,8 @@ router = APIRouter(
 def create_product_shipping(
     product_id: int,
     shipping_data: dict = Body(...),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    dhl_calculator: DHLPdfCalculator = Depends(get_dhl_calculator)
 ):
     """
     Crée ou met à jour les informations de transport pour un produit.
@@ -40,9 +41,6 @@ def create_product_shipping(
         if not weight or not dest_country:
             raise HTTPException(status_code=422, detail="Poids et pays de destination requis")
         
-        # Initialiser le calculateur DHL
-        dhl_calculator = DHLPdfCalculator()
-        
         # Calculer le poids effectif si les dimensions sont fournies
         effective_weight = weight
         if dims_str:
@@ -82,6 +80,7 @@ def create_product_shipping(
             product_shipping_info.shipping_cost = shipping_cost
             product_shipping_info.shipping_zone = zone
             product_shipping_info.calculated_at = func.now()
+            product_shipping_info.tariff_version = dhl_calculator.tariff_version
             product_shipping_info.is_multi_leg = False
             product_shipping_info.legs_data = None
         else:
@@ -95,6 +94,7 @@ def create_product_shipping(
                 premium_service=premium,
                 shipping_cost=shipping_cost,
                 shipping_zone=zone,
+                tariff_version=dhl_calculator.tariff_version,
                 is_multi_leg=False,
                 legs_data=None
             )
@@ -120,6 +120,7 @@ def create_product_shipping(
             "effective_weight_kg": effective_weight,
             "currency": "MAD",
             "calculated_at": datetime.datetime.now().isoformat(),
+            "tariff_version": dhl_calculator.tariff_version,
             "saved": True
         }
     
@@ -132,7 +133,8 @@ def create_product_shipping(
 def create_product_shipping_multi_leg(
     product_id: int,
     shipping_data: dict = Body(...),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    dhl_calculator: DHLPdfCalculator = Depends(get_dhl_calculator)
 ):
     """
     Crée ou met à jour les informations de transport multi-étapes pour un produit.
@@ -156,9 +158,6 @@ def create_product_shipping_multi_leg(
         if not leg_string:
             raise HTTPException(status_code=422, detail="Étapes de transport requises")
         
-        # Initialiser le calculateur DHL
-        dhl_calculator = DHLPdfCalculator()
-        
         # Parser les legs
         leg_list = []
         for leg_str in leg_string.split(","):
@@ -205,6 +204,7 @@ def create_product_shipping_multi_leg(
             product_shipping_info.shipping_cost = result.get("total_cost", 0)
             product_shipping_info.shipping_zone = 0  # Multi-leg n'a pas de zone unique
             product_shipping_info.calculated_at = func.now()
+            product_shipping_info.tariff_version = dhl_calculator.tariff_version
             product_shipping_info.is_multi_leg = True
             product_shipping_info.legs_data = str(leg_list)  # Stocker les informations des étapes
         else:
@@ -218,6 +218,7 @@ def create_product_shipping_multi_leg(
                 premium_service=premium,
                 shipping_cost=result.get("total_cost", 0),
                 shipping_zone=0,  # Multi-leg n'a pas de zone unique
+                tariff_version=dhl_calculator.tariff_version,
                 is_multi_leg=True,
                 legs_data=str(leg_list)  # Stocker les informations des étapes
             )
@@ -277,6 +278,7 @@ def get_product_shipping(product_id: int, db: Session = Depends(get_db)):
         "effective_weight_kg": product_shipping_info.weight_kg,  # Approximation
         "currency": "MAD",
         "calculated_at": product_shipping_info.calculated_at.isoformat(),
+        "tariff_version": product_shipping_info.tariff_version,
         "saved": True,
         "is_multi_leg": product_shipping_info.is_multi_leg
     }
@@ -319,6 +321,7 @@ def get_all_product_shipping(db: Session = Depends(get_db)):
                 "shipping_cost": info.shipping_cost,
                 "shipping_zone": info.shipping_zone,
                 "calculated_at": info.calculated_at.isoformat(),
+                "tariff_version": info.tariff_version,
                 "saved": True,
                 "is_multi_leg": info.is_multi_leg
             }
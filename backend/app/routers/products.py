@@ -7,7 +7,7 @@ from pydantic import BaseModel
 
 from ..database import get_db
 from .. import models
-from ..dhl_pdf_calculator import DHLPdfCalculator
+from ..dhl_pdf_calculator import DHLPdfCalculator, get_dhl_calculator
 
 router = APIRouter(
     prefix="/products",
@@ -337,7 +337,7 @@ class ProductShippingRequest(BaseModel):
     premium_service: Optional[str] = None
 
 @router.post("/calculate-shipping", response_model=Dict[str, Any])
-def calculate_product_shipping(request: ProductShippingRequest, db: Session = Depends(get_db)):
+def calculate_product_shipping(request: ProductShippingRequest, db: Session = Depends(get_db), dhl_calculator: DHLPdfCalculator = Depends(get_dhl_calculator)):
     """
     Calcule les frais de transport pour un produit.
     """
@@ -347,9 +347,6 @@ def calculate_product_shipping(request: ProductShippingRequest, db: Session = De
         raise HTTPException(status_code=404, detail="Produit non trouvé")
     
     try:
-        # Initialiser le calculateur DHL
-        dhl_calculator = DHLPdfCalculator()
-        
         # Vérifier si le poids est défini
         if not product.poids_kg:
             raise HTTPException(status_code=400, detail="Le poids du produit n'est pas défini")
@@ -403,7 +400,8 @@ def update_product_shipping_info(
     product_id: int, 
     poids_kg: Optional[float] = None,
     dimensions: Optional[str] = None,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    dhl_calculator: DHLPdfCalculator = Depends(get_dhl_calculator)
 ):
     """
     Met à jour les informations de poids et dimensions pour un produit.
@@ -419,7 +417,6 @@ def update_product_shipping_info(
     
     if dimensions is not None:
         # Valider le format des dimensions
-        dhl_calculator = DHLPdfCalculator()
         if dhl_calculator.parse_dimensions(dimensions):
             product.dimensions = dimensions
         else:
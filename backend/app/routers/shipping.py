@@ -1,10 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Body, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List, Dict, Optional, Any, Tuple
 from pydantic import BaseModel
-from ..database import get_db
+from ..database import get_db, SessionLocal
 from .. import models
-from ..dhl_pdf_calculator import DHLPdfCalculator
+from ..dhl_pdf_calculator import DHLPdfCalculator, get_dhl_calculator, reload_dhl_calculator, multi_leg_quote_cache
+from ..utils import repricing, tariff_store
+from ..utils.country_resolver import UnknownCountryError
+from ..utils.route_optimizer import RouteOptimizer
+from ..utils.parcel_optimizer import ParcelPlanOptimizer
+from functools import lru_cache
+import time
+import numpy as np
 from sqlalchemy import func
 import datetime
 import json
@@ -27,6 +35,16 @@ BASE_COUNTRIES = {
     "maroc", "morocco", "ma", "mar", "royaume du maroc", "kingdom of morocco"
 }
 
+# Hubs proposés par défaut pour l'optimisation de routes
+DEFAULT_ROUTING_HUBS = ["Maroc"]
+
+# Calcul par lots: nombre maximum d'envois par requête et taille des paquets streamés
+MAX_BATCH_SHIPMENTS = 20000
+BATCH_CHUNK_SIZE = 500
+
+# Nombre maximum de cartons (après quantités) pour l'optimisation des colis
+MAX_PARCEL_BOXES = 100
+
 # Modèles Pydantic
 class ShippingBase(BaseModel):
     weight_kg: float
@@ -44,6 +62,7 @@ class ShippingInfo(ShippingBase):
     shipping_cost: float
     shipping_zone: int
     calculated_at: datetime.datetime
+    tariff_version: Optional[str] = None
     
     class Config:
         from_attributes = True
@@ -60,6 +79,36 @@ class MultiLegShippingRequest(BaseModel):
     premium_service: Optional[str] = None
     currency: str = "MAD"
 
+class BatchShipmentSpec(BaseModel):
+    id: Optional[str] = None  # Identifiant libre renvoyé tel quel
+    weight_kg: float
+    dimensions: Optional[str] = None
+    premium_service: Optional[str] = None
+    # Envoi simple
+    country: Optional[str] = None
+    direction: str = "export"
+    # Envoi multi-étapes: route au format de /calculate-route, ou étapes détaillées
+    route: Optional[str] = None
+    legs: Optional[List[ShippingLegRequest]] = None
+
+class BatchShippingRequest(BaseModel):
+    shipments: List[BatchShipmentSpec]
+    currency: str = "MAD"
+
+class ParcelBox(BaseModel):
+    weight_kg: float
+    dimensions: Optional[str] = None  # Format "LxlxH" en cm
+    quantity: int = 1
+    label: Optional[str] = None
+
+class ParcelPlanRequest(BaseModel):
+    country: str
+    direction: str = "export"
+    boxes: List[ParcelBox]
+    premium_service: Optional[str] = None
+    max_parcel_weight_kg: Optional[float] = None
+    currency: str = "MAD"
+
 class CountryZone(BaseModel):
     country: str
     zone: int
@@ -173,6 +222,128 @@ def parse_route_string(route: str) -> List[Dict[str, str]]:
     
     return legs
 
+@lru_cache(maxsize=1)
+def get_route_optimizer(calculator: DHLPdfCalculator) -> RouteOptimizer:
+    """Graphe de routage précalculé, reconstruit uniquement quand la grille tarifaire change."""
+    return RouteOptimizer(calculator, is_base_country)
+
+def price_shipment_chunk(
+    calculator: DHLPdfCalculator,
+    shipments: List[BatchShipmentSpec],
+    offset: int,
+    currency: str
+) -> List[Dict[str, Any]]:
+    """
+    Calcule un paquet d'envois du lot (erreurs renvoyées par envoi, sans interrompre le lot).
+
+    Les envois simples sont tarifés en un appel vectorisé par direction; les
+    envois multi-étapes passent par calculate_multi_leg_shipping (devis mémorisés).
+
+    Args:
+        calculator: Calculateur DHL partagé
+        shipments: Envois du paquet
+        offset: Position du premier envoi dans le lot
+        currency: Devise de retour
+
+    Returns:
+        Un résultat par envoi, dans l'ordre du lot
+    """
+    results: List[Optional[Dict[str, Any]]] = [None] * len(shipments)
+    # direction -> [(position, poids effectif, zone, pays, service premium)]
+    single_shipments: Dict[str, List[Tuple[int, float, int, str, Optional[str]]]] = {"export": [], "import": []}
+
+    for position, spec in enumerate(shipments):
+        base = {"index": offset + position, "id": spec.id}
+        try:
+            if spec.weight_kg <= 0:
+                raise ValueError("Le poids doit être positif")
+
+            dimensions_tuple = calculator.parse_dimensions(spec.dimensions) if spec.dimensions else None
+
+            if spec.legs or spec.route:
+                if spec.legs:
+                    legs = [
+                        {
+                            "origin_country": leg.origin_country,
+                            "destination_country": leg.destination_country,
+                            "direction": leg.direction or determine_direction(leg.origin_country, leg.destination_country)
+                        }
+                        for leg in spec.legs
+                    ]
+                else:
+                    legs = parse_route_string(spec.route)
+                if not legs:
+                    raise ValueError("Format de route invalide ou route vide")
+
+                result = calculator.calculate_multi_leg_shipping(
+                    legs=legs,
+                    weight_kg=spec.weight_kg,
+                    dimensions=dimensions_tuple,
+                    premium_service=spec.premium_service
+                )
+                leg_errors = [leg["error"] for leg in result["legs"] if "error" in leg]
+                total_cost_mad = result["total_cost"]
+                results[position] = {
+                    **base,
+                    "ok": not leg_errors,
+                    "error": "; ".join(leg_errors) if leg_errors else None,
+                    "is_multi_leg": True,
+                    "weight_kg": spec.weight_kg,
+                    "effective_weight_kg": result["effective_weight"],
+                    "legs": result["legs"],
+                    "destination_country": legs[-1]["destination_country"],
+                    "direction": legs[-1]["direction"],
+                    "premium_service": spec.premium_service,
+                    "shipping_cost": convert_currency(total_cost_mad, currency),
+                    "shipping_cost_mad": total_cost_mad,
+                    "currency": currency
+                }
+                continue
+
+            if not spec.country:
+                raise ValueError("Pays, route ou étapes requis")
+            if spec.direction not in single_shipments:
+                raise ValueError(f"Direction invalide: {spec.direction}")
+
+            effective_weight = spec.weight_kg
+            if dimensions_tuple:
+                effective_weight = calculator.get_effective_weight(spec.weight_kg, *dimensions_tuple)
+            zone = calculator.get_zone_for_country(spec.country, spec.direction)
+            single_shipments[spec.direction].append(
+                (position, effective_weight, zone, spec.country, spec.premium_service)
+            )
+
+        except Exception as e:
+            results[position] = {**base, "ok": False, "error": str(e)}
+
+    # Un seul appel vectorisé par direction pour les envois simples
+    for direction, entries in single_shipments.items():
+        if not entries:
+            continue
+        positions, weights, zones, countries, premiums = zip(*entries)
+        costs = calculator.calculate_shipping_cost_for_zone(weights, zones, direction, premiums)
+        for position, weight, zone, country, premium, cost in zip(positions, weights, zones, countries, premiums, costs):
+            cost = float(cost)
+            results[position] = {
+                "index": offset + position,
+                "id": shipments[position].id,
+                "ok": True,
+                "error": None,
+                "is_multi_leg": False,
+                "weight_kg": shipments[position].weight_kg,
+                "effective_weight_kg": weight,
+                "country": country,
+                "destination_country": country,
+                "direction": direction,
+                "zone": zone,
+                "premium_service": premium,
+                "shipping_cost": convert_currency(cost, currency),
+                "shipping_cost_mad": cost,
+                "currency": currency
+            }
+
+    return results
+
 # Routes
 @router.get("/calculate")
 def calculate_shipping(
@@ -181,7 +352,8 @@ def calculate_shipping(
     direction: str = Query("export", description="Direction (export/import)"),
     dimensions: Optional[str] = Query(None, description="Dimensions LxlxH en cm"),
     premium_service: Optional[str] = Query(None, description="Service premium"),
-    currency: str = Query("MAD", description="Devise de retour")
+    currency: str = Query("MAD", description="Devise de retour"),
+    calculator: DHLPdfCalculator = Depends(get_dhl_calculator)
 ):
     """
     Calculer les frais de transport DHL pour un envoi simple.
@@ -190,8 +362,6 @@ def calculate_shipping(
     print(f"Poids: {weight_kg}kg, Pays: {country}, Direction: {direction}")
     
     try:
-        calculator = DHLPdfCalculator()
-        
         # Calculer le poids effectif si les dimensions sont fournies
         effective_weight = weight_kg
         if dimensions:
@@ -227,7 +397,8 @@ def calculate_shipping(
             "shipping_cost_mad": shipping_cost_mad,
             "currency": currency,
             "exchange_rate": EXCHANGE_RATES.get(currency, 1.0),
-            "is_multi_leg": False
+            "is_multi_leg": False,
+            "tariff_version": calculator.tariff_version
         }
         
         print(f"Résultat: {shipping_cost_converted} {currency} ({shipping_cost_mad} MAD)")
@@ -243,7 +414,8 @@ def calculate_route_shipping(
     route: str = Query(..., description="Route au format 'UK->Maroc->Turkey' ou 'UK:Maroc,Maroc:Turkey'"),
     dimensions: Optional[str] = Query(None, description="Dimensions LxlxH en cm"),
     premium_service: Optional[str] = Query(None, description="Service premium"),
-    currency: str = Query("MAD", description="Devise de retour")
+    currency: str = Query("MAD", description="Devise de retour"),
+    calculator: DHLPdfCalculator = Depends(get_dhl_calculator)
 ):
     """
     Calculer les frais de transport DHL pour n'importe quelle route multi-étapes.
@@ -260,8 +432,6 @@ def calculate_route_shipping(
     print(f"Poids: {weight_kg}kg, Route: {route}")
     
     try:
-        calculator = DHLPdfCalculator()
-        
         # Parser la route
         legs = parse_route_string(route)
         
@@ -318,8 +488,223 @@ def calculate_route_shipping(
         print(f"Erreur: {str(e)}")
         raise HTTPException(status_code=400, detail=f"Erreur lors du calcul de route: {str(e)}")
 
+@router.post("/calculate-batch")
+def calculate_shipping_batch(request: BatchShippingRequest, calculator: DHLPdfCalculator = Depends(get_dhl_calculator)):
+    """
+    Calculer les frais de transport DHL d'un lot d'envois (simples ou multi-étapes).
+
+    La réponse est streamée en NDJSON: une ligne JSON par envoi (dans l'ordre du
+    lot, avec "index" et "id"), puis une ligne finale {"summary": {...}}.
+    Une erreur sur un envoi est renvoyée sur sa ligne ("ok": false, "error")
+    sans interrompre le lot.
+    """
+    print("=== CALCUL SHIPPING PAR LOT ===")
+    print(f"Envois: {len(request.shipments)}, Devise: {request.currency}")
+
+    if request.currency not in EXCHANGE_RATES:
+        raise HTTPException(status_code=400, detail=f"Devise non supportée: {request.currency}")
+    if len(request.shipments) > MAX_BATCH_SHIPMENTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Trop d'envois ({len(request.shipments)}), maximum {MAX_BATCH_SHIPMENTS} par lot"
+        )
+
+    def generate_lines():
+        started = time.perf_counter()
+        errors = 0
+        for offset in range(0, len(request.shipments), BATCH_CHUNK_SIZE):
+            chunk = request.shipments[offset:offset + BATCH_CHUNK_SIZE]
+            lines = []
+            for result in price_shipment_chunk(calculator, chunk, offset, request.currency):
+                errors += not result["ok"]
+                lines.append(json.dumps(result, ensure_ascii=False))
+            yield "\n".join(lines) + "\n"
+
+        summary = {
+            "count": len(request.shipments),
+            "errors": errors,
+            "currency": request.currency,
+            "exchange_rate": EXCHANGE_RATES[request.currency],
+            "tariff_version": calculator.tariff_version,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 2)
+        }
+        print(f"Lot terminé: {summary['count']} envois, {errors} erreurs en {summary['elapsed_ms']} ms")
+        yield json.dumps({"summary": summary}, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(generate_lines(), media_type="application/x-ndjson")
+
+@router.get("/optimize-route")
+def optimize_route(
+    origin: str = Query(..., description="Pays d'origine"),
+    destination: str = Query(..., description="Pays de destination"),
+    weight_kg: float = Query(..., gt=0, description="Poids en kg"),
+    dimensions: Optional[str] = Query(None, description="Dimensions LxlxH en cm"),
+    premium_service: Optional[str] = Query(None, description="Service premium (dernière étape)"),
+    hubs: Optional[str] = Query(None, description="Pays hubs séparés par des virgules, ou 'all' pour tous les pays"),
+    max_hubs: int = Query(2, ge=0, le=2, description="Nombre maximum de hubs intermédiaires"),
+    top_k: int = Query(3, ge=1, le=20, description="Nombre de routes proposées"),
+    currency: str = Query("MAD", description="Devise de retour"),
+    calculator: DHLPdfCalculator = Depends(get_dhl_calculator)
+):
+    """
+    Proposer les routes les moins chères entre deux pays, directes ou via des hubs.
+    """
+    print("=== OPTIMISATION DE ROUTE ===")
+    print(f"Poids: {weight_kg}kg, {origin} -> {destination}, hubs: {hubs or DEFAULT_ROUTING_HUBS}")
+    
+    started = time.perf_counter()
+    try:
+        resolver = calculator.country_resolver
+        origin_key = resolver.resolve(origin)
+        destination_key = resolver.resolve(destination)
+        if origin_key == destination_key:
+            raise ValueError("L'origine et la destination doivent être différentes")
+        
+        if hubs and hubs.strip().lower() == "all":
+            hub_keys = None
+        else:
+            hub_names = [hub.strip() for hub in hubs.split(",") if hub.strip()] if hubs else DEFAULT_ROUTING_HUBS
+            hub_keys = [resolver.resolve(hub) for hub in hub_names]
+        
+        # Calculer le poids effectif si les dimensions sont fournies
+        effective_weight = weight_kg
+        if dimensions:
+            dims = calculator.parse_dimensions(dimensions)
+            if dims:
+                length, width, height = dims
+                effective_weight = calculator.get_effective_weight(weight_kg, length, width, height)
+        
+        routes = get_route_optimizer(calculator).optimize(
+            origin_key,
+            destination_key,
+            effective_weight,
+            hubs=hub_keys,
+            max_hubs=max_hubs,
+            top_k=top_k,
+            premium_service=premium_service
+        )
+        
+        for rank, route in enumerate(routes, start=1):
+            route["rank"] = rank
+            route["total_cost_mad"] = route["total_cost"]
+            route["total_cost"] = convert_currency(route["total_cost_mad"], currency)
+            route["currency"] = currency
+            for leg in route["legs"]:
+                leg["cost_mad"] = leg["cost"]
+                leg["cost"] = convert_currency(leg["cost_mad"], currency)
+                leg["currency"] = currency
+        
+        return {
+            "origin": origin_key,
+            "destination": destination_key,
+            "weight_kg": weight_kg,
+            "effective_weight_kg": effective_weight,
+            "premium_service": premium_service,
+            "currency": currency,
+            "exchange_rate": EXCHANGE_RATES.get(currency, 1.0),
+            "routes": routes,
+            "tariff_version": calculator.tariff_version,
+            "search_ms": round((time.perf_counter() - started) * 1000, 2)
+        }
+    
+    except Exception as e:
+        print(f"Erreur: {str(e)}")
+        raise HTTPException(status_code=400, detail=f"Erreur lors de l'optimisation de route: {str(e)}")
+
+@router.post("/optimize-parcels")
+def optimize_parcels(request: ParcelPlanRequest, calculator: DHLPdfCalculator = Depends(get_dhl_calculator)):
+    """
+    Proposer un regroupement de cartons en colis (consolidation ou fractionnement):
+    le moins cher jusqu'à 9 cartons (EXACT_MAX_BOXES, "exact": true), le meilleur
+    trouvé par recherche locale au-delà ("exact": false, heuristique).
+    """
+    print("=== OPTIMISATION DES COLIS ===")
+    print(f"{len(request.boxes)} lignes de cartons, pays: {request.country}, direction: {request.direction}")
+
+    started = time.perf_counter()
+    try:
+        if request.direction not in ("export", "import"):
+            raise ValueError("La direction doit être 'export' ou 'import'")
+
+        country_key = calculator.country_resolver.resolve(request.country)
+        zone = calculator.get_zone_for_country(country_key, request.direction)
+
+        # Un carton par unité, avec son poids volumétrique
+        weights, volumetric_weights, labels = [], [], []
+        for i, box in enumerate(request.boxes):
+            if box.weight_kg <= 0 or box.quantity < 1:
+                raise ValueError(f"Carton {i + 1}: poids et quantité doivent être positifs")
+            volumetric = 0.0
+            if box.dimensions:
+                dims = calculator.parse_dimensions(box.dimensions)
+                if not dims:
+                    raise ValueError(f"Carton {i + 1}: dimensions invalides '{box.dimensions}' (format LxlxH)")
+                volumetric = calculator.calculate_volumetric_weight(*dims)
+            for unit in range(box.quantity):
+                weights.append(box.weight_kg)
+                volumetric_weights.append(volumetric)
+                label = box.label or f"Carton {i + 1}"
+                labels.append(f"{label} #{unit + 1}" if box.quantity > 1 else label)
+
+        if not weights:
+            raise ValueError("Aucun carton fourni")
+        if len(weights) > MAX_PARCEL_BOXES:
+            raise ValueError(f"Trop de cartons ({len(weights)}), maximum {MAX_PARCEL_BOXES}")
+
+        def price(billable_weights):
+            return calculator.calculate_shipping_cost_for_zone(
+                billable_weights, zone, request.direction, request.premium_service
+            )
+
+        optimizer = ParcelPlanOptimizer(price, weights, volumetric_weights, request.max_parcel_weight_kg)
+        best = optimizer.optimize()
+        if best["assignment"] is None or not np.isfinite(best["cost"]):
+            raise ValueError("Aucun plan ne respecte le poids maximum par colis")
+
+        parcels = optimizer.describe(best["assignment"])
+        for parcel in parcels:
+            parcel["boxes"] = [labels[box] for box in parcel["boxes"]]
+            parcel["cost_mad"] = parcel["cost"]
+            parcel["cost"] = convert_currency(parcel["cost_mad"], request.currency)
+
+        # Plans de référence: tout en un colis, un colis par carton
+        size = len(weights)
+        single_parcel, one_per_box = (
+            float(cost) for cost in optimizer.evaluate(np.array([np.zeros(size, dtype=np.intp), np.arange(size)]))
+        )
+        total_mad = round(best["cost"], 2)
+
+        return {
+            "country": country_key,
+            "direction": request.direction,
+            "zone": zone,
+            "premium_service": request.premium_service,
+            "box_count": size,
+            "parcel_count": len(parcels),
+            # Plan le moins cher de tous (recherche exhaustive), sinon meilleur plan trouvé
+            "exact": best["exact"],
+            "parcels": parcels,
+            "total_cost_mad": total_mad,
+            "total_cost": convert_currency(total_mad, request.currency),
+            "baseline": {
+                # inf si le colis unique dépasse le poids maximum
+                "single_parcel_mad": round(single_parcel, 2) if np.isfinite(single_parcel) else None,
+                "one_parcel_per_box_mad": round(one_per_box, 2)
+            },
+            "savings_vs_one_parcel_per_box_mad": round(one_per_box - total_mad, 2),
+            "currency": request.currency,
+            "exchange_rate": EXCHANGE_RATES.get(request.currency, 1.0),
+            "plans_evaluated": optimizer.plans_evaluated,
+            "tariff_version": calculator.tariff_version,
+            "search_ms": round((time.perf_counter() - started) * 1000, 2)
+        }
+
+    except Exception as e:
+        print(f"Erreur: {str(e)}")
+        raise HTTPException(status_code=400, detail=f"Erreur lors de l'optimisation des colis: {str(e)}")
+
 @router.post("/calculate-multi-leg")
-def calculate_multi_leg_shipping_post(request: MultiLegShippingRequest):
+def calculate_multi_leg_shipping_post(request: MultiLegShippingRequest, calculator: DHLPdfCalculator = Depends(get_dhl_calculator)):
     """
     Calculer les frais de transport DHL pour un envoi multi-étapes via POST.
     Permet un contrôle précis de chaque étape.
@@ -328,8 +713,6 @@ def calculate_multi_leg_shipping_post(request: MultiLegShippingRequest):
     print(f"Poids: {request.weight_kg}kg, Étapes: {len(request.legs)}")
     
     try:
-        calculator = DHLPdfCalculator()
-        
         # Préparer les étapes
         legs = []
         for leg_request in request.legs:
@@ -401,7 +784,8 @@ def calculate_multi_leg_shipping_get(
     legs: str = Query(..., description="Étapes au format 'origine1:destination1,origine2:destination2'"),
     dimensions: Optional[str] = Query(None, description="Dimensions LxlxH en cm"),
     premium_service: Optional[str] = Query(None, description="Service premium"),
-    currency: str = Query("MAD", description="Devise de retour")
+    currency: str = Query("MAD", description="Devise de retour"),
+    calculator: DHLPdfCalculator = Depends(get_dhl_calculator)
 ):
     """
     Calculer les frais de transport DHL pour un envoi multi-étapes via GET.
@@ -411,8 +795,6 @@ def calculate_multi_leg_shipping_get(
     print(f"Poids: {weight_kg}kg, Étapes: {legs}")
     
     try:
-        calculator = DHLPdfCalculator()
-        
         # Parser les étapes avec la nouvelle logique
         leg_list = parse_route_string(legs)
         
@@ -471,7 +853,8 @@ def calculate_multi_leg_shipping_get(
 def test_uk_morocco_turkey(
     weight_kg: float = Query(200.0, description="Poids en kg"),
     dimensions: Optional[str] = Query(None, description="Dimensions LxlxH en cm"),
-    currency: str = Query("USD", description="Devise de retour")
+    currency: str = Query("USD", description="Devise de retour"),
+    calculator: DHLPdfCalculator = Depends(get_dhl_calculator)
 ):
     """
     Test spécifique pour le scénario UK → Maroc → Turkey
@@ -486,7 +869,8 @@ def test_uk_morocco_turkey(
             route=route,
             dimensions=dimensions,
             premium_service=None,
-            currency=currency
+            currency=currency,
+            calculator=calculator
         )
         
     except Exception as e:
@@ -494,14 +878,11 @@ def test_uk_morocco_turkey(
         raise HTTPException(status_code=400, detail=f"Erreur lors du test: {str(e)}")
 
 @router.get("/countries")
-def get_countries():
+def get_countries(dhl_calculator: DHLPdfCalculator = Depends(get_dhl_calculator)):
     """
     Retourne la liste des pays disponibles pour le calcul des frais de transport.
     """
     try:
-        # Initialiser le calculateur DHL
-        dhl_calculator = DHLPdfCalculator()
-        
         # Récupérer tous les pays uniques (export et import)
         countries = set(dhl_calculator.export_zones.keys()).union(set(dhl_calculator.import_zones.keys()))
         
@@ -513,14 +894,34 @@ def get_countries():
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+@router.get("/countries/search")
+def search_countries(
+    q: str = Query(..., min_length=1, description="Début du nom, alias ou code ISO du pays"),
+    limit: int = Query(10, ge=1, le=50, description="Nombre maximum de résultats"),
+    calculator: DHLPdfCalculator = Depends(get_dhl_calculator)
+):
+    """
+    Autocomplétion des pays avec leurs zones DHL (export et import).
+    """
+    try:
+        return [
+            {
+                **match,
+                "export_zone": calculator.export_zones[match["country"]],
+                "import_zone": calculator.import_zones[match["country"]]
+            }
+            for match in calculator.country_resolver.search(q, limit)
+        ]
+    
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @router.get("/country-codes")
-def get_country_codes():
+def get_country_codes(dhl_calculator: DHLPdfCalculator = Depends(get_dhl_calculator)):
     """
     Retourne un dictionnaire des codes pays et leurs noms.
     """
     try:
-        dhl_calculator = DHLPdfCalculator()
-        
         country_codes = {}
         
         # Ajouter les pays des zones d'export et d'import
@@ -558,32 +959,149 @@ def get_country_codes():
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/premium-services")
-def get_premium_services():
+def get_premium_services(dhl_calculator: DHLPdfCalculator = Depends(get_dhl_calculator)):
     """
     Retourne la liste des services premium disponibles et leurs suppléments.
     """
     try:
-        dhl_calculator = DHLPdfCalculator()
-        
         return {
-            "premium_services": dhl_calculator.premium_services,
+            "premium_services": dict(dhl_calculator.premium_services),
             "currency": "MAD"
         }
     
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+# ===== ADMINISTRATION DES GRILLES TARIFAIRES =====
+
+@router.get("/tariffs")
+def list_tariff_versions(calculator: DHLPdfCalculator = Depends(get_dhl_calculator)):
+    """
+    Liste les versions de grilles tarifaires DHL disponibles et la version en service.
+    """
+    try:
+        return {
+            "active_version": calculator.tariff_version,
+            "active_sha256": calculator.tariff_sha256,
+            "versions": tariff_store.list_versions()
+        }
+    
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/tariffs")
+def upload_tariff_version(
+    rate_card: Dict[str, Any] = Body(..., description="Grille tarifaire au format JSON versionné"),
+    activate: bool = Query(False, description="Activer immédiatement la nouvelle version")
+):
+    """
+    Enregistre une nouvelle version de grille tarifaire (une version existante n'est jamais écrasée).
+    """
+    try:
+        version, sha256 = tariff_store.save_rate_card(rate_card)
+    except FileExistsError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except (ValueError, KeyError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=f"Grille tarifaire invalide: {str(e)}")
+    
+    result = {"version": version, "sha256": sha256, "active": False}
+    if activate:
+        result = activate_tariff_version(version)
+    return result
+
+@router.post("/tariffs/{version}/activate")
+def activate_tariff_version(version: str):
+    """
+    Active une version de grille tarifaire sans redémarrage.
+    
+    La grille est chargée et validée avant d'être substituée atomiquement;
+    les autres workers la prennent en compte via le fichier ACTIVE.
+    """
+    try:
+        calculator = reload_dhl_calculator(version, activate=True)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Activation impossible: {str(e)}")
+    
+    return {"version": calculator.tariff_version, "sha256": calculator.tariff_sha256, "active": True}
+
+@router.post("/tariffs/reload")
+def reload_tariffs():
+    """
+    Recharge la version désignée par le fichier ACTIVE (après une modification manuelle).
+    """
+    try:
+        calculator = reload_dhl_calculator()
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Rechargement impossible: {str(e)}")
+    
+    return {"version": calculator.tariff_version, "sha256": calculator.tariff_sha256, "active": True}
+
+@router.get("/cache/stats")
+def get_quote_cache_stats():
+    """
+    Statistiques du cache des devis multi-étapes (succès, échecs, évictions).
+    """
+    return multi_leg_quote_cache.stats()
+
+@router.delete("/cache")
+def clear_quote_cache():
+    """
+    Vide le cache des devis multi-étapes.
+    """
+    multi_leg_quote_cache.clear()
+    return {"message": "Cache des devis vidé"}
+
+@router.post("/reprice")
+def start_repricing(
+    dry_run: bool = Query(False, description="Simulation: rapporte l'évolution des totaux sans rien écrire"),
+    only_stale: bool = Query(True, description="Ne recalculer que les frais calculés avec une autre grille"),
+    resume: bool = Query(True, description="Reprendre un recalcul interrompu pour la même grille"),
+    chunk_size: int = Query(repricing.DEFAULT_CHUNK_SIZE, ge=10, le=10000, description="Lignes par transaction"),
+    calculator: DHLPdfCalculator = Depends(get_dhl_calculator)
+):
+    """
+    Lance en arrière-plan le recalcul des frais de transport enregistrés
+    (équipements, produits, devis) avec la grille tarifaire active.
+    """
+    print(f"=== RECALCUL DES FRAIS DE TRANSPORT ({calculator.tariff_version}, dry_run={dry_run}) ===")
+    try:
+        return repricing.start_repricing(
+            calculator,
+            SessionLocal,
+            convert_currency,
+            dry_run=dry_run,
+            only_stale=only_stale,
+            resume=resume,
+            chunk_size=chunk_size
+        )
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        print(f"Erreur: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/reprice/status")
+def get_repricing_status():
+    """
+    Progression du recalcul en cours, ou résultat du dernier recalcul.
+    """
+    status = repricing.job_status()
+    if status is None:
+        raise HTTPException(status_code=404, detail="Aucun recalcul lancé")
+    return status
+
 @router.get("/zones/{country}")
 def get_country_zones(
     country: str,
-    direction: Optional[str] = Query(None, description="Direction (export/import), si non spécifiée, retourne les deux")
+    direction: Optional[str] = Query(None, description="Direction (export/import), si non spécifiée, retourne les deux"),
+    calculator: DHLPdfCalculator = Depends(get_dhl_calculator)
 ):
     """
     Obtenir les zones DHL pour un pays spécifique.
     """
     try:
-        calculator = DHLPdfCalculator()
-        
         result = {"country": country}
         
         if direction is None or direction == "export":
@@ -596,6 +1114,11 @@ def get_country_zones(
         
         return result
         
+    except UnknownCountryError as e:
+        raise HTTPException(
+            status_code=404,
+            detail={"message": str(e), "country": e.country, "suggestions": e.suggestions}
+        )
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Erreur lors de la récupération des zones: {str(e)}")
 
@@ -644,7 +1167,8 @@ def test_common_routes():
 def create_hardware_shipping(
     hardware_id: int,
     shipping_data: ShippingBase,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    dhl_calculator: DHLPdfCalculator = Depends(get_dhl_calculator)
 ):
     """
     Crée ou met à jour les informations de transport pour un équipement hardware.
@@ -654,8 +1178,6 @@ def create_hardware_shipping(
         raise HTTPException(status_code=404, detail="Équipement non trouvé")
     
     try:
-        dhl_calculator = DHLPdfCalculator()
-        
         effective_weight = shipping_data.weight_kg
         if shipping_data.dimensions:
             dims = dhl_calculator.parse_dimensions(shipping_data.dimensions)
@@ -683,6 +1205,7 @@ def create_hardware_shipping(
             shipping_info.shipping_cost = shipping_cost
             shipping_info.shipping_zone = zone
             shipping_info.calculated_at = func.now()
+            shipping_info.tariff_version = dhl_calculator.tariff_version
         else:
             shipping_info = models.ShippingInfo(
                 hardware_id=hardware_id,
@@ -692,7 +1215,8 @@ def create_hardware_shipping(
                 direction=shipping_data.direction,
                 premium_service=shipping_data.premium_service,
                 shipping_cost=shipping_cost,
-                shipping_zone=zone
+                shipping_zone=zone,
+                tariff_version=dhl_calculator.tariff_version
             )
             db.add(shipping_info)
         
@@ -743,13 +1267,11 @@ def delete_hardware_shipping(hardware_id: int, db: Session = Depends(get_db)):
     return {"message": "Informations de transport supprimées avec succès"}
 
 @router.post("/standalone", response_model=ShippingInfo)
-def create_standalone_shipping(shipping_data: ShippingCreate, db: Session = Depends(get_db)):
+def create_standalone_shipping(shipping_data: ShippingCreate, db: Session = Depends(get_db), dhl_calculator: DHLPdfCalculator = Depends(get_dhl_calculator)):
     """
     Crée des informations de transport autonomes (non liées à un équipement).
     """
     try:
-        dhl_calculator = DHLPdfCalculator()
-        
         effective_weight = shipping_data.weight_kg
         if shipping_data.dimensions:
             dims = dhl_calculator.parse_dimensions(shipping_data.dimensions)
@@ -774,7 +1296,8 @@ def create_standalone_shipping(shipping_data: ShippingCreate, db: Session = Depe
             direction=shipping_data.direction,
             premium_service=shipping_data.premium_service,
             shipping_cost=shipping_cost,
-            shipping_zone=zone
+            shipping_zone=zone,
+            tariff_version=dhl_calculator.tariff_version
         )
         
         db.add(shipping_info)
@@ -0,0 +1,262 @@
+"""
+Index de recherche (autocomplétion) sur le catalogue: marque, PN et désignation.
+
+L'index est dérivé de l'instantané du catalogue (catalog_snapshot) et tenu à
+jour avec lui, ligne par ligne, à chaque écriture sur les produits et équipements.
+
+Structure:
+- chaque article est découpé en termes normalisés par champ (PN aussi sous forme
+  compacte, sans séparateurs: "WS-C2960X-24TS" -> "wsc2960x24ts")
+- listes inverses terme -> articles, par champ
+- vocabulaire trié (recherche par préfixe en O(log n)) et index de trigrammes
+  sur le vocabulaire (recherche de sous-chaîne: "2960" trouve "c2960x")
+
+Le vocabulaire est bien plus petit que le catalogue: les trigrammes sont
+indexés par terme distinct et non par article.
+"""
+from bisect import bisect_left, insort
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Set, Tuple
+import heapq
+import re
+import threading
+import unicodedata
+
+from .catalog_snapshot import CatalogKey, ITEM_TYPES, catalog_snapshot
+
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+
+# Poids des champs et des types de correspondance dans le score
+FIELD_WEIGHTS = {"pn": 5.0, "brand": 3.0, "eq_reference": 1.0}
+MATCH_WEIGHTS = {"exact": 3.0, "prefix": 2.0, "infix": 1.0}
+
+# Nombre maximum de termes du vocabulaire examinés par terme de requête
+MAX_EXPANSIONS = 2000
+NGRAM = 3
+
+
+def normalize_text(text: str) -> str:
+    """
+    Minuscules sans accents, ponctuation remplacée par des espaces.
+    """
+    if not text:
+        return ""
+    if not text.isascii():
+        decomposed = unicodedata.normalize("NFKD", text)
+        text = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return _NON_ALNUM.sub(" ", text.casefold()).strip()
+
+
+def _ngrams(term: str) -> Set[str]:
+    return {term[i:i + NGRAM] for i in range(len(term) - NGRAM + 1)}
+
+
+def _item_terms(item: Dict[str, Any]) -> Dict[str, Set[str]]:
+    pn = normalize_text(item.get("pn", ""))
+    terms = {
+        "pn": set(pn.split()),
+        "brand": set(normalize_text(item.get("brand", "")).split()),
+        "eq_reference": set(normalize_text(item.get("eq_reference", "")).split()),
+    }
+    compact = pn.replace(" ", "")
+    if compact:
+        terms["pn"].add(compact)
+    return terms
+
+
+class CatalogSearchIndex:
+    """
+    Index inversé en mémoire, mis à jour incrémentalement (rebuild / upsert / remove).
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self._items: Dict[CatalogKey, Dict[str, Any]] = {}
+        self._terms: Dict[CatalogKey, Dict[str, Set[str]]] = {}
+        self._postings: Dict[str, Dict[str, Set[CatalogKey]]] = {field: defaultdict(set) for field in FIELD_WEIGHTS}
+        # Nombre de références de chaque terme (tous champs confondus)
+        self._vocabulary: Dict[str, int] = {}
+        self._sorted_terms: List[str] = []
+        self._ngram_terms: Dict[str, Set[str]] = defaultdict(set)
+
+    # ----- maintenance (appelée par l'instantané du catalogue) -----
+
+    def rebuild(self, items: Dict[CatalogKey, Dict[str, Any]]) -> None:
+        with self._lock:
+            self._reset()
+            postings, vocabulary = self._postings, self._vocabulary
+            for key, item in items.items():
+                terms = self._terms[key] = _item_terms(item)
+                for field, field_terms in terms.items():
+                    field_postings = postings[field]
+                    for term in field_terms:
+                        field_postings[term].add(key)
+                        vocabulary[term] = vocabulary.get(term, 0) + 1
+            # Trigrammes et tri une seule fois par terme distinct
+            for term in vocabulary:
+                for gram in _ngrams(term):
+                    self._ngram_terms[gram].add(term)
+            self._items = dict(items)
+            self._sorted_terms = sorted(vocabulary)
+
+    def upsert(self, key: CatalogKey, item: Dict[str, Any]) -> None:
+        with self._lock:
+            self._discard(key)
+            self._add(key, item)
+
+    def remove(self, key: CatalogKey) -> None:
+        with self._lock:
+            self._discard(key)
+
+    def _add(self, key: CatalogKey, item: Dict[str, Any]) -> None:
+        terms = _item_terms(item)
+        self._items[key] = item
+        self._terms[key] = terms
+        for field, field_terms in terms.items():
+            for term in field_terms:
+                self._postings[field][term].add(key)
+                count = self._vocabulary.get(term, 0)
+                self._vocabulary[term] = count + 1
+                if count == 0:
+                    for gram in _ngrams(term):
+                        self._ngram_terms[gram].add(term)
+                    insort(self._sorted_terms, term)
+
+    def _discard(self, key: CatalogKey) -> None:
+        terms = self._terms.pop(key, None)
+        self._items.pop(key, None)
+        if terms is None:
+            return
+        for field, field_terms in terms.items():
+            for term in field_terms:
+                postings = self._postings[field].get(term)
+                if postings is not None:
+                    postings.discard(key)
+                    if not postings:
+                        del self._postings[field][term]
+                count = self._vocabulary[term] - 1
+                if count:
+                    self._vocabulary[term] = count
+                    continue
+                del self._vocabulary[term]
+                for gram in _ngrams(term):
+                    grams = self._ngram_terms.get(gram)
+                    if grams is not None:
+                        grams.discard(term)
+                        if not grams:
+                            del self._ngram_terms[gram]
+                position = bisect_left(self._sorted_terms, term)
+                if position < len(self._sorted_terms) and self._sorted_terms[position] == term:
+                    del self._sorted_terms[position]
+
+    # ----- recherche -----
+
+    def _expand(self, query_term: str) -> List[Tuple[str, float]]:
+        """
+        Termes du vocabulaire correspondant à un terme de requête, avec leur poids.
+        """
+        matches: Dict[str, float] = {}
+        if query_term in self._vocabulary:
+            matches[query_term] = MATCH_WEIGHTS["exact"]
+
+        # Préfixe: plage contiguë du vocabulaire trié
+        position = bisect_left(self._sorted_terms, query_term)
+        for term in self._sorted_terms[position:position + MAX_EXPANSIONS]:
+            if not term.startswith(query_term):
+                break
+            matches.setdefault(term, MATCH_WEIGHTS["prefix"])
+
+        # Sous-chaîne: intersection des trigrammes, puis vérification
+        if len(query_term) >= NGRAM and len(matches) < MAX_EXPANSIONS:
+            gram_sets = sorted(
+                (self._ngram_terms.get(gram, set()) for gram in _ngrams(query_term)),
+                key=len
+            )
+            candidates = set(gram_sets[0]) if gram_sets else set()
+            for gram_set in gram_sets[1:]:
+                if not candidates:
+                    break
+                candidates &= gram_set
+            for term in candidates:
+                if term not in matches and query_term in term:
+                    matches[term] = MATCH_WEIGHTS["infix"]
+                    if len(matches) >= MAX_EXPANSIONS:
+                        break
+
+        return list(matches.items())
+
+    def _score_term(self, query_term: str) -> Dict[CatalogKey, float]:
+        scores: Dict[CatalogKey, float] = {}
+        for term, match_weight in self._expand(query_term):
+            # Bonus léger pour les termes courts (correspondance plus précise)
+            precision = len(query_term) / len(term)
+            for field, field_weight in FIELD_WEIGHTS.items():
+                postings = self._postings[field].get(term)
+                if not postings:
+                    continue
+                score = field_weight * match_weight * (1 + precision)
+                for key in postings:
+                    if score > scores.get(key, 0.0):
+                        scores[key] = score
+        return scores
+
+    def search(self, query: str, limit: int = 20, item_type: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Recherche les articles correspondant à tous les termes de la requête.
+
+        Args:
+            query: Texte saisi ("cisco 2960", "C9200-24", "switch poe")
+            limit: Nombre maximum de résultats
+            item_type: Filtrer par type ('product' ou 'hardware')
+
+        Returns:
+            Articles du catalogue triés par pertinence, avec leur score
+        """
+        normalized = normalize_text(query)
+        query_terms = normalized.split()
+        if not query_terms:
+            return []
+        # Un PN saisi avec séparateurs ("ws-c2960x") correspond aussi au PN compact
+        if len(query_terms) > 1:
+            compact_query = normalized.replace(" ", "")
+        else:
+            compact_query = None
+
+        with self._lock:
+            per_term = [self._score_term(term) for term in query_terms]
+            per_term.sort(key=len)
+            scores = dict(per_term[0])
+            for term_scores in per_term[1:]:
+                scores = {key: score + term_scores[key] for key, score in scores.items() if key in term_scores}
+                if not scores:
+                    break
+
+            if compact_query:
+                for key, score in self._score_term(compact_query).items():
+                    scores[key] = max(scores.get(key, 0.0), score * len(query_terms))
+
+            if item_type is not None:
+                rank = ITEM_TYPES.index(item_type)
+                scores = {key: score for key, score in scores.items() if key[0] == rank}
+
+            best = heapq.nlargest(
+                limit,
+                scores.items(),
+                key=lambda entry: (entry[1], -len(self._items[entry[0]]["pn"]), -entry[0][1])
+            )
+            return [{**self._items[key], "score": round(score, 2)} for key, score in best]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "items": len(self._items),
+                "terms": len(self._vocabulary),
+                "ngrams": len(self._ngram_terms),
+            }
+
+
+catalog_search_index = CatalogSearchIndex()
+catalog_snapshot.add_listener(catalog_search_index)
@@ -0,0 +1,339 @@
+"""
+Instantané précalculé du catalogue (produits + équipements) pour l'éditeur de devis.
+
+- construit une fois, avec les champs d'affichage déjà formatés
+- mis à jour incrémentalement: les écritures ORM sur Product, HardwareIT et
+  Supplier sont suivies par des événements de session, et seules les lignes
+  concernées sont relues au prochain accès (après le commit)
+- versionné: chaque changement incrémente la version, utilisée comme ETag
+- reconstruit entièrement après une écriture en masse (query.update/delete),
+  ou quand il a dépassé sa durée de vie (écritures faites par un autre worker)
+"""
+from bisect import bisect_right
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+import logging
+import os
+import threading
+import time
+import uuid
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from .. import models
+
+logger = logging.getLogger(__name__)
+
+CATALOG_SNAPSHOT_MAX_AGE = float(os.getenv("CATALOG_SNAPSHOT_MAX_AGE", "300"))
+
+# Ordre des types dans la liste (produits puis équipements, comme auparavant)
+ITEM_TYPES = ("product", "hardware")
+_TYPE_RANK = {item_type: rank for rank, item_type in enumerate(ITEM_TYPES)}
+
+CatalogKey = Tuple[int, int]  # (rang du type, id)
+
+
+def _product_rows(db: Session, ids: Optional[Iterable[int]] = None):
+    query = (
+        db.query(
+            models.Product.id,
+            models.Product.brand,
+            models.Product.pn,
+            models.Product.eq_reference,
+            models.Product.unit_cost_mad,
+            models.Product.p_margin,
+            models.Product.currency,
+            models.Product.supplier_id,
+            models.Supplier.company
+        )
+        .outerjoin(models.Supplier, models.Supplier.id == models.Product.supplier_id)
+    )
+    if ids is not None:
+        query = query.filter(models.Product.id.in_(list(ids)))
+    return query.all()
+
+
+def _hardware_rows(db: Session, ids: Optional[Iterable[int]] = None):
+    query = (
+        db.query(
+            models.HardwareIT.id,
+            models.HardwareIT.brand,
+            models.HardwareIT.pn,
+            models.HardwareIT.eq_reference,
+            models.HardwareIT.unit_price,
+            models.HardwareIT.currency,
+            models.HardwareIT.supplier_id,
+            models.Supplier.company
+        )
+        .outerjoin(models.Supplier, models.Supplier.id == models.HardwareIT.supplier_id)
+    )
+    if ids is not None:
+        query = query.filter(models.HardwareIT.id.in_(list(ids)))
+    return query.all()
+
+
+def _product_item(row) -> Dict[str, Any]:
+    return {
+        "id": row.id,
+        "type": "product",
+        "brand": row.brand or "",
+        "pn": row.pn or "",
+        "eq_reference": row.eq_reference or "",
+        "unit_price": row.unit_cost_mad * (1 + (row.p_margin or 0) / 100) if row.unit_cost_mad else 0,
+        "currency": row.currency or "MAD",
+        "supplier": row.company or "",
+        "display_name": f"{row.brand or ''} - {row.pn or ''} - {row.eq_reference or ''}"
+    }
+
+
+def _hardware_item(row) -> Dict[str, Any]:
+    return {
+        "id": row.id,
+        "type": "hardware",
+        "brand": row.brand or "",
+        "pn": row.pn or "",
+        "eq_reference": row.eq_reference or "",
+        "unit_price": row.unit_price or 0,
+        "currency": row.currency or "MAD",
+        "supplier": row.company or "",
+        "display_name": f"{row.brand or ''} - {row.pn or ''} - {row.eq_reference or ''}"
+    }
+
+
+_LOADERS = {
+    "product": (_product_rows, _product_item),
+    "hardware": (_hardware_rows, _hardware_item),
+}
+
+
+class CatalogSnapshot:
+    """
+    Catalogue en mémoire, trié par (type, id) pour la pagination par curseur.
+    """
+
+    def __init__(self, max_age_seconds: float = CATALOG_SNAPSHOT_MAX_AGE):
+        self.max_age_seconds = max_age_seconds
+        self._lock = threading.Lock()
+        self._items: Dict[CatalogKey, Dict[str, Any]] = {}
+        self._keys: List[CatalogKey] = []
+        self._supplier_of: Dict[CatalogKey, Optional[int]] = {}
+        self._built_at: Optional[float] = None
+        # Identifiant propre au processus: les versions de deux workers ne se confondent pas
+        self._generation = ""
+        self._version = 0
+        self._pending: Set[Tuple[str, int]] = set()
+        self._needs_rebuild = True
+        # Index dérivés tenus à jour avec l'instantané (rebuild / upsert / remove)
+        self._listeners: List[Any] = []
+
+    def add_listener(self, listener: Any) -> None:
+        """
+        Abonne un index dérivé (méthodes rebuild(items), upsert(key, item), remove(key)).
+        """
+        with self._lock:
+            self._listeners.append(listener)
+            if self._built_at is not None:
+                listener.rebuild(self._items)
+
+    # ----- suivi des écritures -----
+
+    def mark_changed(self, changes: Iterable[Tuple[str, int]]) -> None:
+        """
+        Signale des lignes modifiées: ("product" | "hardware" | "supplier", id).
+        """
+        with self._lock:
+            self._pending.update(changes)
+
+    def invalidate(self) -> None:
+        """
+        Force une reconstruction complète au prochain accès.
+        """
+        with self._lock:
+            self._needs_rebuild = True
+
+    # ----- lecture -----
+
+    @property
+    def etag(self) -> str:
+        return f'W/"catalog-{self._generation}-{self._version}"'
+
+    def refresh(self, db: Session) -> str:
+        """
+        Applique les changements en attente (ou reconstruit) et retourne l'ETag courant.
+        """
+        with self._lock:
+            expired = self._built_at is None or time.monotonic() - self._built_at > self.max_age_seconds
+            if self._needs_rebuild or expired:
+                self._rebuild(db)
+            elif self._pending:
+                self._apply_pending(db)
+            return self.etag
+
+    def page(
+        self,
+        item_type: Optional[str] = None,
+        cursor: Optional[str] = None,
+        limit: Optional[int] = None
+    ) -> Tuple[List[Dict[str, Any]], Optional[str], int]:
+        """
+        Page du catalogue après le curseur (clé de la dernière ligne renvoyée).
+
+        Returns:
+            (lignes, curseur suivant ou None, nombre total de lignes pour ce filtre)
+        """
+        with self._lock:
+            keys = self._keys
+            if item_type is not None:
+                rank = _TYPE_RANK[item_type]
+                start, end = bisect_right(keys, (rank, -1)), bisect_right(keys, (rank, float("inf")))
+            else:
+                start, end = 0, len(keys)
+            total = end - start
+
+            if cursor:
+                start = max(start, bisect_right(keys, decode_cursor(cursor)))
+            stop = end if limit is None else min(end, start + limit)
+            page = [self._items[key] for key in keys[start:stop]]
+            next_cursor = encode_cursor(keys[stop - 1]) if stop < end and page else None
+            return page, next_cursor, total
+
+    # ----- construction -----
+
+    def _rebuild(self, db: Session) -> None:
+        started = time.perf_counter()
+        items: Dict[CatalogKey, Dict[str, Any]] = {}
+        supplier_of: Dict[CatalogKey, Optional[int]] = {}
+        for item_type, (load_rows, build_item) in _LOADERS.items():
+            rank = _TYPE_RANK[item_type]
+            for row in load_rows(db):
+                items[(rank, row.id)] = build_item(row)
+                supplier_of[(rank, row.id)] = row.supplier_id
+
+        previous, first_build = self._items, self._built_at is None
+        changed = [key for key, item in items.items() if previous.get(key) != item]
+        removed = previous.keys() - items.keys()
+
+        self._items = items
+        self._supplier_of = supplier_of
+        self._keys = sorted(items)
+        self._pending.clear()
+        self._needs_rebuild = False
+        self._built_at = time.monotonic()
+        if first_build:
+            self._generation = uuid.uuid4().hex[:12]
+        elif changed or removed:
+            # Contenu modifié: nouvelle version (un contenu identique garde son ETag)
+            self._version += 1
+
+        # Les index dérivés ne reçoivent que les lignes réellement modifiées
+        for listener in self._listeners:
+            if first_build or len(changed) + len(removed) > len(items) // 2:
+                listener.rebuild(items)
+                continue
+            for key in changed:
+                listener.upsert(key, items[key])
+            for key in removed:
+                listener.remove(key)
+        logger.info(f"Catalogue reconstruit: {len(items)} articles en {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    def _apply_pending(self, db: Session) -> None:
+        pending, self._pending = self._pending, set()
+
+        ids_by_type: Dict[str, Set[int]] = {item_type: set() for item_type in ITEM_TYPES}
+        suppliers = {row_id for kind, row_id in pending if kind == "supplier"}
+        for kind, row_id in pending:
+            if kind in ids_by_type:
+                ids_by_type[kind].add(row_id)
+        # Un changement de fournisseur modifie le nom affiché de ses articles
+        if suppliers:
+            for (rank, row_id), supplier_id in self._supplier_of.items():
+                if supplier_id in suppliers:
+                    ids_by_type[ITEM_TYPES[rank]].add(row_id)
+
+        keys = set(self._keys)
+        for item_type, ids in ids_by_type.items():
+            if not ids:
+                continue
+            load_rows, build_item = _LOADERS[item_type]
+            rank = _TYPE_RANK[item_type]
+            found = set()
+            for row in load_rows(db, ids):
+                key = (rank, row.id)
+                self._items[key] = build_item(row)
+                self._supplier_of[key] = row.supplier_id
+                keys.add(key)
+                found.add(row.id)
+                for listener in self._listeners:
+                    listener.upsert(key, self._items[key])
+            # Lignes supprimées
+            for row_id in ids - found:
+                key = (rank, row_id)
+                self._items.pop(key, None)
+                self._supplier_of.pop(key, None)
+                keys.discard(key)
+                for listener in self._listeners:
+                    listener.remove(key)
+
+        self._keys = sorted(keys)
+        self._version += 1
+
+
+def encode_cursor(key: CatalogKey) -> str:
+    return f"{ITEM_TYPES[key[0]]}:{key[1]}"
+
+
+def decode_cursor(cursor: str) -> CatalogKey:
+    """
+    Raises:
+        ValueError: si le curseur est invalide
+    """
+    item_type, _, row_id = cursor.partition(":")
+    if item_type not in _TYPE_RANK or not row_id.isdigit():
+        raise ValueError(f"Curseur invalide: {cursor}")
+    return (_TYPE_RANK[item_type], int(row_id))
+
+
+catalog_snapshot = CatalogSnapshot()
+
+
+# ----- événements de session -----
+
+_TRACKED_MODELS = {
+    models.Product: "product",
+    models.HardwareIT: "hardware",
+    models.Supplier: "supplier",
+}
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_catalog_changes(session, flush_context):
+    changes = session.info.setdefault("catalog_changes", set())
+    for instance in (*session.new, *session.dirty, *session.deleted):
+        kind = _TRACKED_MODELS.get(type(instance))
+        if kind is not None and instance.id is not None:
+            changes.add((kind, instance.id))
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_catalog_changes(session):
+    changes = session.info.pop("catalog_changes", None)
+    if changes:
+        catalog_snapshot.mark_changed(changes)
+    if session.info.pop("catalog_bulk_write", False):
+        catalog_snapshot.invalidate()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_catalog_changes(session):
+    session.info.pop("catalog_changes", None)
+    session.info.pop("catalog_bulk_write", None)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _track_bulk_writes(orm_execute_state):
+    # Écritures en masse (query.update/delete, update()/delete() ORM): pas d'objets à suivre
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete or orm_execute_state.is_insert):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and mapper.class_ in _TRACKED_MODELS:
+        orm_execute_state.session.info["catalog_bulk_write"] = True
@@ -0,0 +1,463 @@
+"""
+Résolution des noms de pays vers les zones DHL.
+
+Index construit une seule fois à partir des tables de zones:
+- table de hachage sur les noms normalisés (sans accents, casse ignorée)
+- alias anglais/français et codes ISO-3166 (alpha-2 et alpha-3)
+- arbre de préfixes (trie) pour l'autocomplétion
+"""
+from typing import Dict, List, Mapping, Optional, Tuple
+import difflib
+import re
+import unicodedata
+
+
+# Alias par pays de référence (clé des tables de zones DHL)
+COUNTRY_ALIASES: Dict[str, Tuple[str, ...]] = {
+    "Algérie": ("Algeria", "DZ", "DZA"),
+    "Espagne": ("Spain", "España", "ES", "ESP"),
+    "France": ("FR", "FRA"),
+    "Mauritanie": ("Mauritania", "MR", "MRT"),
+    "Tunisie": ("Tunisia", "TN", "TUN"),
+    "Afghanistan": ("AF", "AFG"),
+    "Arabie Saoudite": ("Saudi Arabia", "KSA", "SA", "SAU"),
+    "Bahrein": ("Bahrain", "BH", "BHR"),
+    "Egypte": ("Egypt", "EG", "EGY"),
+    "Emirats Arabes Unis": ("UAE", "United Arab Emirates", "EAU", "AE", "ARE"),
+    "Irak": ("Iraq", "IQ", "IRQ"),
+    "Iran": ("IR", "IRN"),
+    "Jordanie": ("Jordan", "JO", "JOR"),
+    "Koweit": ("Kuwait", "KW", "KWT"),
+    "Liban": ("Lebanon", "LB", "LBN"),
+    "Libye": ("Libya", "LY", "LBY"),
+    "Oman": ("OM", "OMN"),
+    "Qatar": ("QA", "QAT"),
+    "Syrie": ("Syria", "SY", "SYR"),
+    "Yemen": ("YE", "YEM"),
+    "Allemagne": ("Germany", "Deutschland", "DE", "DEU"),
+    "Andorre": ("Andorra", "AD", "AND"),
+    "Autriche": ("Austria", "AT", "AUT"),
+    "Belgique": ("Belgium", "BE", "BEL"),
+    "Canaries": ("Canary Islands", "Iles Canaries", "IC"),
+    "Chypre": ("Cyprus", "CY", "CYP"),
+    "Crète": ("Crete",),
+    "Danemark": ("Denmark", "DK", "DNK"),
+    "Falklands": ("Falkland Islands", "Iles Malouines", "Malouines", "FK", "FLK"),
+    "Finlande": ("Finland", "FI", "FIN"),
+    "Grande Bretagne": (
+        "UK", "United Kingdom", "England", "Great Britain", "Royaume-Uni", "Angleterre", "Britain", "GB", "GBR"
+    ),
+    "Groenland": ("Greenland", "GL", "GRL"),
+    "Guernesey": ("Guernsey", "GG", "GGY"),
+    "Irlande": ("Ireland", "IE", "IRL"),
+    "Islande": ("Iceland", "IS", "ISL"),
+    "Italie": ("Italy", "IT", "ITA"),
+    "Jersey": ("JE", "JEY"),
+    "Liechtenstein": ("LI", "LIE"),
+    "Luxembourg": ("LU", "LUX"),
+    "Madère": ("Madeira",),
+    "Malte": ("Malta", "MT", "MLT"),
+    "Monaco": ("MC", "MCO"),
+    "Norvège": ("Norway", "NO", "NOR"),
+    "Pays-Bas": ("Netherlands", "Holland", "Hollande", "NL", "NLD"),
+    "Suède": ("Sweden", "SE", "SWE"),
+    "Suisse": ("Switzerland", "CH", "CHE"),
+    "Turquie": ("Turkey", "Türkiye", "Istanbul", "TR", "TUR"),
+    "Vatican": ("Vatican City", "Holy See", "VA", "VAT"),
+    "Albanie": ("Albania", "AL", "ALB"),
+    "Bielorussie": ("Belarus", "BY", "BLR"),
+    "Bosnie Herzegovine": ("Bosnia and Herzegovina", "Bosnia", "BA", "BIH"),
+    "Bulgarie": ("Bulgaria", "BG", "BGR"),
+    "Chine": ("China", "CN", "CHN"),
+    "Corée du Sud": ("South Korea", "Korea", "Republic of Korea", "KR", "KOR"),
+    "Croatie": ("Croatia", "HR", "HRV"),
+    "Estonie": ("Estonia", "EE", "EST"),
+    "Feroé": ("Faroe Islands", "Iles Feroe", "FO", "FRO"),
+    "Gibraltar": ("GI", "GIB"),
+    "Hong Kong": ("HK", "HKG"),
+    "Hongrie": ("Hungary", "HU", "HUN"),
+    "Israël": ("IL", "ISR"),
+    "Japon": ("Japan", "JP", "JPN"),
+    "Kosovo": ("XK", "XKX"),
+    "Lettonie": ("Latvia", "LV", "LVA"),
+    "Lithuanie": ("Lithuania", "Lituanie", "LT", "LTU"),
+    "Macédoine": ("North Macedonia", "Macedonia", "Macédoine du Nord", "MK", "MKD"),
+    "Moldavie": ("Moldova", "MD", "MDA"),
+    "Monténégro": ("ME", "MNE"),
+    "Pologne": ("Poland", "PL", "POL"),
+    "Roumanie": ("Romania", "RO", "ROU"),
+    "Russie": ("Russia", "Russian Federation", "RU", "RUS"),
+    "Serbie": ("Serbia", "RS", "SRB"),
+    "Slovaquie": ("Slovakia", "SK", "SVK"),
+    "Slovénie": ("Slovenia", "SI", "SVN"),
+    "Taïwan": ("TW", "TWN"),
+    "Tchèque": ("Czech Republic", "Czechia", "République Tchèque", "Tchéquie", "CZ", "CZE"),
+    "Ukraine": ("UA", "UKR"),
+    "Afrique du Sud": ("South Africa", "ZA", "ZAF"),
+    "Australie": ("Australia", "AU", "AUS"),
+    "Bangladesh": ("BD", "BGD"),
+    "Bhoutan": ("Bhutan", "BT", "BTN"),
+    "Brunei": ("BN", "BRN"),
+    "Cambodge": ("Cambodia", "KH", "KHM"),
+    "Canada": ("CA", "CAN"),
+    "Corée du Nord": ("North Korea", "KP", "PRK"),
+    "Guam": ("GU", "GUM"),
+    "Inde": ("India", "IN", "IND"),
+    "Indonésie": ("Indonesia", "ID", "IDN"),
+    "Laos": ("LA", "LAO"),
+    "Malaisie": ("Malaysia", "MY", "MYS"),
+    "Maldives": ("MV", "MDV"),
+    "Marshall": ("Marshall Islands", "Iles Marshall", "MH", "MHL"),
+    "Mexique": ("Mexico", "MX", "MEX"),
+    "Micronésie": ("Micronesia", "FM", "FSM"),
+    "Mongolie": ("Mongolia", "MN", "MNG"),
+    "N. Marianne": ("Northern Mariana Islands", "Mariannes du Nord", "MP", "MNP"),
+    "Népal": ("NP", "NPL"),
+    "Pakistan": ("PK", "PAK"),
+    "Palaos": ("Palau", "PW", "PLW"),
+    "Philippines": ("PH", "PHL"),
+    "Porto Rico": ("Puerto Rico", "PR", "PRI"),
+    "Singapour": ("Singapore", "SG", "SGP"),
+    "Thaïlande": ("Thailand", "TH", "THA"),
+    "Timor Oriental": ("East Timor", "Timor-Leste", "TL", "TLS"),
+    "Vietnam": ("Viet Nam", "VN", "VNM"),
+    "Vierges US": ("US Virgin Islands", "Iles Vierges américaines", "VI", "VIR"),
+    "Etats-Unis": ("USA", "United States", "United States of America", "US"),
+    "Angola": ("AO", "AGO"),
+    "Anguilla": ("AI", "AIA"),
+    "Antigua": ("Antigua and Barbuda", "Antigua-et-Barbuda", "AG", "ATG"),
+    "Aruba": ("AW", "ABW"),
+    "Azerbaijan": ("Azerbaïdjan", "AZ", "AZE"),
+    "Bahamas": ("BS", "BHS"),
+    "Barbades": ("Barbados", "Barbade", "BB", "BRB"),
+    "Belize": ("BZ", "BLZ"),
+    "Bermudes": ("Bermuda", "BM", "BMU"),
+    "Bolivie": ("Bolivia", "BO", "BOL"),
+    "Bonaire": ("BQ", "BES"),
+    "Botswana": ("BW", "BWA"),
+    "Brésil": ("Brazil", "Brasil", "BR", "BRA"),
+    "Burkina Faso": ("BF", "BFA"),
+    "Burundi": ("BI", "BDI"),
+    "Bénin": ("BJ", "BEN"),
+    "Cameroun": ("Cameroon", "CM", "CMR"),
+    "Cap Vert": ("Cape Verde", "Cabo Verde", "CV", "CPV"),
+    "Cayman": ("Cayman Islands", "Iles Caïmans", "KY", "CYM"),
+    "Chili": ("Chile", "CL", "CHL"),
+    "Colombie": ("Colombia", "CO", "COL"),
+    "Comores": ("Comoros", "KM", "COM"),
+    "Congo": ("Republic of the Congo", "Congo-Brazzaville", "CG", "COG"),
+    "Costa Rica": ("CR", "CRI"),
+    "Cuba": ("CU", "CUB"),
+    "Curaçao": ("CW", "CUW"),
+    "Côte d'Ivoire": ("Ivory Coast", "CI", "CIV"),
+    "Djibouti": ("DJ", "DJI"),
+    "République Dominicaine": ("Dominicaine", "Dominican Republic", "DO", "DOM"),
+    "Dominique": ("Dominica", "DM", "DMA"),
+    "El Salvador": ("Salvador", "SV", "SLV"),
+    "Equateur": ("Ecuador", "EC", "ECU"),
+    "Erythrée": ("Eritrea", "ER", "ERI"),
+    "Ethiopie": ("Ethiopia", "ET", "ETH"),
+    "Gabon": ("GA", "GAB"),
+    "Gambie": ("Gambia", "GM", "GMB"),
+    "Ghana": ("GH", "GHA"),
+    "Grenade": ("Grenada", "GD", "GRD"),
+    "Guadeloupe": ("GP", "GLP"),
+    "Guatemala": ("GT", "GTM"),
+    "Guinée Bissau": ("Guinea-Bissau", "GW", "GNB"),
+    "Guinée Equatoriale": ("Equatorial Guinea", "GQ", "GNQ"),
+    "Guinée République": ("Guinea", "Guinée", "GN", "GIN"),
+    "Guyana": ("GY", "GUY"),
+    "Guyane Française": ("French Guiana", "Guyane", "GF", "GUF"),
+    "Géorgie": ("Georgia", "GE", "GEO"),
+    "Haïti": ("HT", "HTI"),
+    "Honduras": ("HN", "HND"),
+    "Jamaïque": ("Jamaica", "JM", "JAM"),
+    "Kazakhstan": ("KZ", "KAZ"),
+    "Kenya": ("KE", "KEN"),
+    "Kirghizistan": ("Kyrgyzstan", "KG", "KGZ"),
+    "Lesotho": ("LS", "LSO"),
+    "Libéria": ("LR", "LBR"),
+    "Madagascar": ("MG", "MDG"),
+    "Malawi": ("MW", "MWI"),
+    "Mali": ("ML", "MLI"),
+    "Martinique": ("MQ", "MTQ"),
+    "Maurice": ("Mauritius", "Ile Maurice", "MU", "MUS"),
+    "Mayotte": ("YT", "MYT"),
+    "Montserrat": ("MS", "MSR"),
+    "Mozambique": ("MZ", "MOZ"),
+    "Namibie": ("Namibia", "NA", "NAM"),
+    "Nicaragua": ("NI", "NIC"),
+    "Niger": ("NE", "NER"),
+    "Nigeria": ("NG", "NGA"),
+    "Ouganda": ("Uganda", "UG", "UGA"),
+    "Ouzbekistan": ("Uzbekistan", "UZ", "UZB"),
+    "Panama": ("PA", "PAN"),
+    "Paraguay": ("PY", "PRY"),
+    "Pérou": ("Peru", "PE", "PER"),
+    "Rwanda": ("RW", "RWA"),
+    "Réunion": ("La Réunion", "RE", "REU"),
+    "Saint-Martin": ("St Martin", "MF", "MAF"),
+    "Sainte Hélène": ("Saint Helena", "SH", "SHN"),
+    "Sainte Lucie": ("Saint Lucia", "St Lucia", "LC", "LCA"),
+    "Saint-Barthélemy": ("St Barth", "BL", "BLM"),
+    "Saint-Kitts": ("Saint Kitts and Nevis", "St Kitts", "KN", "KNA"),
+    "Saint-Vincent": ("Saint Vincent and the Grenadines", "St Vincent", "VC", "VCT"),
+    "Sao Tomé et Principe": ("Sao Tome and Principe", "ST", "STP"),
+    "Seychelles": ("SC", "SYC"),
+    "Sierra Leone": ("SL", "SLE"),
+    "St Eustache": ("Sint Eustatius", "Saint Eustache"),
+    "Sud Soudan": ("South Sudan", "Soudan du Sud", "SS", "SSD"),
+    "Surinam": ("Suriname", "SR", "SUR"),
+    "Swaziland": ("Eswatini", "SZ", "SWZ"),
+    "Sénégal": ("SN", "SEN"),
+    "Tadjikistan": ("Tajikistan", "TJ", "TJK"),
+    "Tanzanie": ("Tanzania", "TZ", "TZA"),
+    "Tchad": ("Chad", "TD", "TCD"),
+    "Togo": ("TG", "TGO"),
+    "Trinité et Tobago": ("Trinidad and Tobago", "Trinidad", "TT", "TTO"),
+    "Turkmenistan": ("Turkménistan", "TM", "TKM"),
+    "Turks et Caicos": ("Turks and Caicos Islands", "TC", "TCA"),
+    "Uruguay": ("UY", "URY"),
+    "Vierges UK": ("British Virgin Islands", "Iles Vierges britanniques", "VG", "VGB"),
+    "Zambie": ("Zambia", "ZM", "ZMB"),
+    "Zimbabwe": ("ZW", "ZWE"),
+    "Cook": ("Cook Islands", "Iles Cook", "CK", "COK"),
+    "Fidji": ("Fiji", "FJ", "FJI"),
+    "Kiribati": ("KI", "KIR"),
+    "Nauru": ("NR", "NRU"),
+    "Niue": ("NU", "NIU"),
+    "Nouvelle Calédonie": ("New Caledonia", "NC", "NCL"),
+    "Nouvelle Zélande": ("New Zealand", "NZ", "NZL"),
+    "Papouasie Nouvelle Guinée": ("Papua New Guinea", "PG", "PNG"),
+    "Polynésie": ("French Polynesia", "Polynésie Française", "Tahiti", "PF", "PYF"),
+    "Salomon": ("Solomon Islands", "Iles Salomon", "SB", "SLB"),
+    "Samoa": ("WS", "WSM"),
+    "Samoa Américaines": ("American Samoa", "AS", "ASM"),
+    "Tonga": ("TO", "TON"),
+    "Tuvalu": ("TV", "TUV"),
+    "Vanuatu": ("VU", "VUT"),
+    "Birmanie": ("Myanmar", "Burma", "MM", "MMR"),
+    "Centrafrique": ("Central African Republic", "République Centrafricaine", "CF", "CAF"),
+    "Congo RD": (
+        "DR Congo", "Democratic Republic of the Congo", "RDC",
+        "République Démocratique du Congo", "Congo-Kinshasa", "CD", "COD"
+    ),
+    "Somalie": ("Somalia", "SO", "SOM"),
+    "Soudan": ("Sudan", "SD", "SDN"),
+    "Vénézuela": ("Venezuela", "VE", "VEN"),
+    "Maroc": ("Morocco", "Royaume du Maroc", "Kingdom of Morocco", "MA", "MAR"),
+}
+
+# Rang des correspondances pour l'autocomplétion
+_RANK_EXACT = 0
+_RANK_NAME_PREFIX = 1
+_RANK_WORD_PREFIX = 2
+
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+
+
+def normalize_country_name(name: str) -> str:
+    """
+    Normalise un nom de pays: sans accents, casse ignorée, ponctuation remplacée par des espaces.
+
+    Args:
+        name: Nom brut ("Côte d'Ivoire", "  PAYS-BAS ")
+
+    Returns:
+        Nom normalisé ("cote d ivoire", "pays bas")
+    """
+    decomposed = unicodedata.normalize("NFKD", name)
+    without_accents = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return _NON_ALNUM.sub(" ", without_accents.casefold()).strip()
+
+
+class UnknownCountryError(ValueError):
+    """
+    Pays absent des tables de zones DHL (aucune zone par défaut n'est appliquée).
+    """
+
+    def __init__(self, country: str, suggestions: Optional[List[str]] = None):
+        self.country = country
+        self.suggestions = suggestions or []
+        message = f"Pays inconnu: '{country}'"
+        if self.suggestions:
+            message += f" (suggestions: {', '.join(self.suggestions)})"
+        super().__init__(message)
+
+
+class _TrieNode:
+    __slots__ = ("children", "matches")
+
+    def __init__(self):
+        self.children: Dict[str, "_TrieNode"] = {}
+        # {pays: (rang, nom normalisé, nom affiché)} puis tuple trié après construction
+        self.matches = {}
+
+
+class CountryResolver:
+    """
+    Index pays -> zones DHL, construit une fois puis en lecture seule.
+    """
+
+    def __init__(
+        self,
+        zones_by_direction: Mapping[str, Mapping[str, int]],
+        aliases: Mapping[str, Tuple[str, ...]] = COUNTRY_ALIASES
+    ):
+        """
+        Args:
+            zones_by_direction: {"export": {pays: zone}, "import": {pays: zone}}
+            aliases: Alias par pays de référence
+        """
+        self.zones_by_direction = zones_by_direction
+
+        countries = dict.fromkeys(country for zones in zones_by_direction.values() for country in zones)
+
+        self._index: Dict[str, str] = {}
+        for country in countries:
+            self._add_to_index(normalize_country_name(country), country)
+        table_keys = set(self._index)
+        self._primary: Dict[str, str] = {}
+
+        searchable_names = [(country, country) for country in countries]
+        for country, country_aliases in aliases.items():
+            # Une grille tarifaire peut ne pas couvrir tous les pays connus
+            if country not in countries:
+                continue
+            for alias in country_aliases:
+                key = normalize_country_name(alias)
+                # Les noms des tables sont prioritaires sur les alias: un alias
+                # présent dans les tables désigne un doublon du pays de référence
+                if key in table_keys:
+                    duplicate = self._index[key]
+                    if all(zones.get(duplicate) == zones.get(country) for zones in zones_by_direction.values()):
+                        self._primary[duplicate] = country
+                    continue
+                self._add_to_index(key, country)
+                # Les codes ISO ne servent qu'à la correspondance exacte
+                if not (len(alias) <= 3 and alias.isupper()):
+                    searchable_names.append((alias, country))
+
+        self._trie = _TrieNode()
+        for display_name, country in searchable_names:
+            self._add_to_trie(display_name, country)
+        self._finalize_trie(self._trie)
+
+    def _add_to_index(self, key: str, country: str) -> None:
+        existing = self._index.get(key)
+        if existing is not None and existing != country:
+            if any(zones.get(existing) != zones.get(country) for zones in self.zones_by_direction.values()):
+                raise ValueError(f"Nom de pays ambigu '{key}': {existing} / {country}")
+            return
+        self._index[key] = country
+
+    def _add_to_trie(self, display_name: str, country: str) -> None:
+        normalized = normalize_country_name(display_name)
+        # Indexer le nom complet puis chaque mot ("dominicaine" -> République Dominicaine)
+        starts = [0] + [match.end() for match in re.finditer(" ", normalized)]
+        for start in starts:
+            rank = _RANK_NAME_PREFIX if start == 0 else _RANK_WORD_PREFIX
+            node = self._trie
+            for char in normalized[start:]:
+                node = node.children.setdefault(char, _TrieNode())
+                best = node.matches.get(country)
+                if best is None or rank < best[0]:
+                    node.matches[country] = (rank, normalized, display_name)
+
+    def _finalize_trie(self, node: _TrieNode) -> None:
+        node.matches = tuple(sorted(
+            (rank, sort_key, country, display_name)
+            for country, (rank, sort_key, display_name) in node.matches.items()
+        ))
+        for child in node.children.values():
+            self._finalize_trie(child)
+
+    def resolve(self, name: str) -> str:
+        """
+        Retourne le nom de référence du pays (clé des tables de zones).
+
+        Raises:
+            UnknownCountryError: si le pays n'est pas reconnu
+        """
+        country = self._index.get(normalize_country_name(name or ""))
+        if country is None:
+            raise UnknownCountryError(name, self.suggest(name))
+        return country
+
+    def primary_country(self, name: str) -> str:
+        """
+        Pays de référence, en regroupant les doublons des tables ("UK", "England" -> "Grande Bretagne").
+
+        Raises:
+            UnknownCountryError: si le pays n'est pas reconnu
+        """
+        country = self.resolve(name)
+        return self._primary.get(country, country)
+
+    def get_zone(self, name: str, direction: str = "export") -> int:
+        """
+        Retourne la zone DHL du pays pour la direction donnée.
+
+        Raises:
+            UnknownCountryError: si le pays n'est pas reconnu
+        """
+        zones = self.zones_by_direction["export" if direction == "export" else "import"]
+        return zones[self.resolve(name)]
+
+    def search(self, query: str, limit: int = 10) -> List[Dict[str, str]]:
+        """
+        Autocomplétion: pays dont un nom ou alias commence par la saisie.
+
+        Args:
+            query: Début de saisie
+            limit: Nombre maximum de résultats
+
+        Returns:
+            Liste de {"country", "matched_name"} (correspondance exacte, puis nom, puis mot)
+        """
+        normalized = normalize_country_name(query or "")
+        if not normalized:
+            return []
+
+        results: List[Tuple[int, str, str, str]] = []
+        exact = self._index.get(normalized)
+        if exact is not None:
+            results.append((_RANK_EXACT, "", exact, query.strip()))
+
+        node = self._trie
+        for char in normalized:
+            node = node.children.get(char)
+            if node is None:
+                break
+        else:
+            results.extend(node.matches)
+
+        seen = set()
+        matches = []
+        for _, _, country, display_name in results:
+            if country in seen:
+                continue
+            seen.add(country)
+            matches.append({"country": country, "matched_name": display_name})
+            if len(matches) >= limit:
+                break
+        return matches
+
+    def suggest(self, name: str, limit: int = 5) -> List[str]:
+        """
+        Propositions pour un nom non reconnu (noms proches puis préfixe commun).
+        """
+        normalized = normalize_country_name(name or "")
+        if not normalized:
+            return []
+
+        suggestions = [
+            self._index[key]
+            for key in difflib.get_close_matches(normalized, self._index.keys(), n=limit, cutoff=0.75)
+        ]
+        for length in range(len(normalized), 1, -1):
+            suggestions.extend(match["country"] for match in self.search(normalized[:length], limit))
+            if len(set(suggestions)) >= limit:
+                break
+
+        return list(dict.fromkeys(suggestions))[:limit]
@@ -0,0 +1,405 @@
+"""
+Extraction vectorisée des lignes d'une nomenclature (BOM) Excel.
+
+Toutes les opérations sont faites colonne par colonne avec pandas (pas de
+df.iloc[i] ni de pd.isna par cellule):
+- en-têtes: chaque motif est cherché en une expression régulière sur une
+  matrice de cellules en minuscules, le score d'une ligne est le nombre de
+  motifs trouvés
+- valeurs: to_numeric(errors="coerce") pour les quantités et les prix
+- lignes valides: masques booléens (PN non vide, quantité > 0)
+
+Les fichiers .xlsx sont lus en streaming (openpyxl read_only, iter_excel_sheets):
+chaque feuille est parcourue par blocs de EXCEL_CHUNK_ROWS lignes, la mémoire
+utilisée ne dépend pas de la taille du classeur. Les fonctions d'extraction
+s'appliquent à chaque bloc.
+
+Utilisé par les imports de devis (routers/devis.py) et de matériel
+(routers/hardware_import.py), qui gardent chacun leur format de sortie, et
+pour les tableaux des devis PDF (utils/quote_extraction.py).
+"""
+from itertools import islice
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from .uploads import FileSource, source_stream
+
+# Mots-clés des en-têtes de colonnes
+COLUMN_PATTERNS = {
+    "item_number": ["item", "line", "no", "number", "#"],
+    "pn": ["part number", "pn", "reference", "ref", "product code", "code"],
+    "description": ["description", "desc", "product", "item", "designation"],
+    "qty": ["quantity", "qty", "qté", "quantité", "amount"],
+    "unit_cost": ["price", "cost", "unit price", "unit cost", "prix"]
+}
+
+# Nombre minimum de colonnes reconnues pour qu'une ligne soit l'en-tête
+MIN_HEADER_MATCHES = 3
+
+# Lecture en streaming: lignes par bloc, lignes gardées en tête de chaque feuille
+# (recherche de l'en-tête, du numéro de devis et du client)
+EXCEL_CHUNK_ROWS = int(os.getenv("EXCEL_CHUNK_ROWS", "5000"))
+EXCEL_HEAD_ROWS = 40
+# Formats lus par openpyxl en mode read_only (les .xls passent par pd.read_excel)
+STREAMING_EXCEL_EXTENSIONS = ('.xlsx', '.xlsm')
+
+QUOTE_KEYWORDS = ["quote", "devis", "quotation", "id", "ref"]
+CLIENT_KEYWORDS = ["customer", "client", "end user", "end-user"]
+
+_PN_PATTERN = r"[A-Za-z0-9\-]+"
+_DIGITS_PATTERN = r"\d+"
+
+
+def _keyword_regex(keywords: List[str]) -> str:
+    return "|".join(re.escape(keyword) for keyword in keywords)
+
+
+def lowered_cells(df: pd.DataFrame, max_rows: Optional[int] = None) -> pd.DataFrame:
+    """
+    Cellules en texte minuscule (str(valeur).lower(), NaN compris), par colonne.
+    """
+    frame = df if max_rows is None else df.iloc[:max_rows]
+    return frame.apply(lambda column: column.astype(str).str.lower())
+
+
+def _contains(cells: pd.DataFrame, keywords: List[str]) -> np.ndarray:
+    """
+    Matrice booléenne lignes x colonnes: la cellule contient l'un des mots-clés.
+    """
+    regex = _keyword_regex(keywords)
+    if cells.empty:
+        return np.zeros(cells.shape, dtype=bool)
+    return np.column_stack([
+        cells.iloc[:, position].str.contains(regex, regex=True).to_numpy(dtype=bool)
+        for position in range(cells.shape[1])
+    ])
+
+
+def find_header_row(
+    df: pd.DataFrame,
+    patterns: Dict[str, List[str]] = COLUMN_PATTERNS,
+    max_rows: int = 20
+) -> Tuple[Optional[int], Dict[str, str]]:
+    """
+    Première ligne (parmi les max_rows premières) ressemblant à un en-tête.
+
+    Returns:
+        (indice de la ligne ou None, {champ: nom de colonne} pour cette ligne)
+    """
+    cells = lowered_cells(df, max_rows)
+    if cells.empty:
+        return None, {}
+
+    matches = {key: _contains(cells, keywords) for key, keywords in patterns.items()}
+    # Score: nombre de champs reconnus dans chaque ligne
+    scores = np.sum([mask.any(axis=1) for mask in matches.values()], axis=0)
+    candidates = np.flatnonzero(scores >= MIN_HEADER_MATCHES)
+    if not len(candidates):
+        return None, {}
+
+    row = int(candidates[0])
+    mapping = {
+        key: df.columns[int(np.argmax(mask[row]))]
+        for key, mask in matches.items() if mask[row].any()
+    }
+    return row, mapping
+
+
+def direct_column_mapping(df: pd.DataFrame, patterns: Dict[str, List[str]] = COLUMN_PATTERNS) -> Dict[str, str]:
+    """
+    Correspondance champ -> colonne d'après les noms de colonnes du DataFrame.
+    """
+    names = pd.Series([str(name).lower() for name in df.columns], dtype=object)
+    mapping = {}
+    for key, keywords in patterns.items():
+        found = np.flatnonzero(names.str.contains(_keyword_regex(keywords), regex=True).to_numpy(dtype=bool))
+        if len(found):
+            mapping[key] = df.columns[int(found[0])]
+    return mapping
+
+
+def first_data_row(df: pd.DataFrame, column_mapping: Dict[str, str], max_rows: int = 20) -> int:
+    """
+    Première ligne (parmi les max_rows premières) ayant une valeur dans une colonne reconnue.
+    """
+    columns = list(dict.fromkeys(column_mapping.values()))
+    filled = df.iloc[:max_rows][columns].notna().any(axis=1).to_numpy()
+    found = np.flatnonzero(filled)
+    return int(found[0]) if len(found) else 0
+
+
+def _text(column: pd.Series) -> pd.Series:
+    """str(valeur).strip(), chaîne vide pour les valeurs manquantes."""
+    text = column.astype(str).str.strip()
+    return text.where(column.notna(), "")
+
+
+def _number(column: pd.Series) -> pd.Series:
+    """Valeur numérique (float(valeur)), 0 si vide ou non numérique."""
+    values = pd.to_numeric(column, errors="coerce")
+    if values.dtype == object:
+        values = pd.to_numeric(column.astype(str).str.strip(), errors="coerce")
+    values = values.astype(float)
+    return values.where(np.isfinite(values), 0.0)
+
+
+def extract_item_frame(df: pd.DataFrame, column_mapping: Dict[str, str], start_row: int = 0) -> pd.DataFrame:
+    """
+    Lignes d'articles valides (PN non vide et quantité > 0) à partir de start_row.
+
+    Returns:
+        DataFrame avec les colonnes pn, description, qty (entier), unit_cost
+    """
+    rows = df.iloc[start_row:]
+    columns = list(dict.fromkeys(column_mapping.values()))
+    has_data = rows[columns].notna().any(axis=1) if columns else pd.Series(False, index=rows.index)
+
+    empty_text = pd.Series("", index=rows.index, dtype=object)
+    zeros = pd.Series(0.0, index=rows.index)
+    pn = _text(rows[column_mapping["pn"]]) if "pn" in column_mapping else empty_text
+    description = _text(rows[column_mapping["description"]]) if "description" in column_mapping else empty_text
+    # int(float(quantité)): troncature vers zéro
+    qty = np.trunc(_number(rows[column_mapping["qty"]])) if "qty" in column_mapping else zeros
+    unit_cost = _number(rows[column_mapping["unit_cost"]]) if "unit_cost" in column_mapping else zeros
+
+    valid = has_data & (pn != "") & (qty > 0)
+    return pd.DataFrame({
+        "pn": pn[valid],
+        "description": description[valid],
+        "qty": qty[valid].astype(np.int64),
+        "unit_cost": unit_cost[valid],
+    })
+
+
+def extract_item_frame_simple(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Extraction de secours sans en-tête, ligne par ligne et de gauche à droite:
+    - PN: première cellule alphanumérique (tirets admis) d'au moins 5 caractères
+    - description: première autre cellule de plus de 10 caractères
+    - quantité: première autre cellule entière non nulle
+
+    Returns:
+        DataFrame avec les colonnes pn, description, qty, unit_cost (0)
+    """
+    if df.empty:
+        return pd.DataFrame({"pn": [], "description": [], "qty": [], "unit_cost": []})
+
+    texts = [_text(df.iloc[:, position]) for position in range(df.shape[1])]
+    present = np.column_stack([df.iloc[:, position].notna().to_numpy() for position in range(df.shape[1])])
+    lengths = np.column_stack([text.str.len().to_numpy() for text in texts])
+    is_pn = present & np.column_stack([text.str.fullmatch(_PN_PATTERN).to_numpy(dtype=bool) for text in texts]) & (lengths >= 5)
+    is_long = present & (lengths > 10)
+    is_digits = present & np.column_stack([text.str.fullmatch(_DIGITS_PATTERN).to_numpy(dtype=bool) for text in texts])
+
+    positions = np.arange(df.shape[1])
+    has_pn = is_pn.any(axis=1)
+    pn_column = np.where(has_pn, is_pn.argmax(axis=1), -1)
+
+    # La cellule retenue comme PN ne peut pas servir de description
+    is_long &= positions != pn_column[:, None]
+    has_description = is_long.any(axis=1)
+    description_column = np.where(has_description, is_long.argmax(axis=1), -1)
+
+    # Une quantité nulle ("0") n'arrête pas la recherche
+    digit_values = np.column_stack([
+        pd.to_numeric(text.where(is_digits[:, position], ""), errors="coerce").fillna(0).to_numpy()
+        for position, text in enumerate(texts)
+    ])
+    is_qty = is_digits & (positions != pn_column[:, None]) & (positions != description_column[:, None]) & (digit_values > 0)
+    has_qty = is_qty.any(axis=1)
+    qty_column = is_qty.argmax(axis=1)
+
+    text_matrix = np.column_stack([text.to_numpy(dtype=object) for text in texts])
+    rows = np.flatnonzero(has_pn & has_qty)
+    pn = text_matrix[rows, pn_column[rows]]
+    description = np.where(
+        has_description[rows],
+        text_matrix[rows, np.maximum(description_column[rows], 0)],
+        ""
+    )
+    return pd.DataFrame({
+        "pn": pn,
+        "description": description,
+        "qty": digit_values[rows, qty_column[rows]].astype(np.int64),
+        "unit_cost": np.zeros(len(rows)),
+    })
+
+
+def find_quote_info(df: pd.DataFrame, max_rows: int = 30) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Numéro de devis et client dans l'en-tête du fichier (max_rows premières lignes).
+
+    Comme pour un parcours ligne par ligne, la dernière cellule correspondante
+    l'emporte. Le client est la première cellule non vide (plus de 2 caractères)
+    sous une cellule "customer"/"client", dans les 4 lignes suivantes.
+
+    Returns:
+        (numéro de devis ou None, client ou None)
+    """
+    cells = lowered_cells(df, max_rows)
+    if cells.empty:
+        return None, None
+
+    devis_number = None
+    quote_cells = _contains(cells, QUOTE_KEYWORDS) & np.column_stack([
+        cells.iloc[:, position].str.contains(r"\d", regex=True).to_numpy(dtype=bool)
+        for position in range(cells.shape[1])
+    ])
+    flat = np.flatnonzero(quote_cells.ravel())
+    if len(flat):
+        row, column = divmod(int(flat[-1]), cells.shape[1])
+        devis_number = re.findall(r"\d+", cells.iat[row, column])[0]
+
+    client = None
+    for row, column in np.argwhere(_contains(cells, CLIENT_KEYWORDS)):
+        below = df.iloc[row + 1:row + 5, column]
+        below = below[below.notna() & below.astype(bool)]
+        text = below.astype(str).str.strip()
+        text = text[text.str.len() > 2]
+        if len(text):
+            client = text.iloc[0]
+    return devis_number, client
+
+
+def find_workbook_quote_info(heads: List[pd.DataFrame]) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Numéro de devis et client d'un classeur: première feuille où chacun est trouvé.
+
+    Args:
+        heads: Premières lignes de chaque feuille, dans l'ordre du classeur
+    """
+    devis_number, client = None, None
+    for head in heads:
+        if devis_number and client:
+            break
+        sheet_number, sheet_client = find_quote_info(head)
+        devis_number = devis_number or sheet_number
+        client = client or sheet_client
+    return devis_number, client
+
+
+# ===== LECTURE PAR BLOCS =====
+
+class ExcelSheet:
+    """
+    Feuille lue par blocs de lignes.
+
+    head: les EXCEL_HEAD_ROWS premières lignes (sous la ligne de noms de colonnes)
+    chunks(): blocs (indice de la première ligne, DataFrame), head compris; les
+    colonnes et l'index sont ceux qu'aurait donnés pd.read_excel pour la feuille.
+    """
+
+    def __init__(self, name: str, head: pd.DataFrame, read_chunks: Callable[[], Iterator[Tuple[int, pd.DataFrame]]]):
+        self.name = name
+        self.head = head
+        self._read_chunks = read_chunks
+
+    def chunks(self) -> Iterator[Tuple[int, pd.DataFrame]]:
+        return self._read_chunks()
+
+
+def frame_sheet(df: pd.DataFrame, name: str = "") -> ExcelSheet:
+    """
+    DataFrame déjà en mémoire (fichier .xls, tableau PDF) vu comme une feuille d'un seul bloc.
+    """
+    return ExcelSheet(name, df.iloc[:EXCEL_HEAD_ROWS], lambda: iter([(0, df)]))
+
+
+# pandas 3 (future.infer_string): pd.read_excel donne le type str aux colonnes de texte
+try:
+    _INFER_STRING = bool(pd.get_option("future.infer_string"))
+except KeyError:
+    _INFER_STRING = False
+
+
+def _column_names(header: tuple, width: int) -> List:
+    """Noms de colonnes comme pd.read_excel: "Unnamed: i" si vide, suffixe .1, .2 si répété."""
+    names, seen = [], {}
+    for position in range(width):
+        value = header[position] if position < len(header) else None
+        name = f"Unnamed: {position}" if value is None else value
+        count = seen.get(name, 0)
+        seen[name] = count + 1
+        names.append(f"{name}.{count}" if count else name)
+    return names
+
+
+def _rows_frame(rows: List[Sequence], columns: List, offset: int) -> pd.DataFrame:
+    width = len(columns)
+    # openpyxl (read_only) renvoie [] et non un tuple pour une ligne vide
+    data = [tuple(row[:width]) + (None,) * (width - len(row)) for row in rows]
+    frame = pd.DataFrame(data, columns=columns, index=pd.RangeIndex(offset, offset + len(data)), dtype=object)
+    # Cellules vides: NaN, et types des colonnes déduits comme avec pd.read_excel
+    # (entiers avec cellules vides en float, texte seul en str), bloc par bloc
+    frame = frame.fillna(np.nan).infer_objects()
+    if _INFER_STRING:
+        for column in frame.columns[frame.dtypes == object]:
+            if pd.api.types.infer_dtype(frame[column], skipna=True) == "string":
+                frame[column] = frame[column].astype(str)
+    return frame
+
+
+def _stream_sheet(worksheet, chunk_rows: int) -> Optional[ExcelSheet]:
+    # Les dimensions déclarées dans le fichier sont parfois fausses (ex: "A1")
+    worksheet.reset_dimensions()
+    rows = worksheet.iter_rows(values_only=True)
+    header = next(rows, None)
+    if header is None:
+        return None
+    head_rows = list(islice(rows, EXCEL_HEAD_ROWS))
+    width = max([len(header)] + [len(row) for row in head_rows])
+    if not width:
+        return None
+    columns = _column_names(header, width)
+
+    def read_chunks() -> Iterator[Tuple[int, pd.DataFrame]]:
+        # Nouveau parcours de la feuille: le fichier est relu, rien n'est gardé entre deux blocs
+        rows = worksheet.iter_rows(values_only=True)
+        next(rows, None)
+        offset = 0
+        while True:
+            block = list(islice(rows, chunk_rows))
+            if not block:
+                return
+            yield offset, _rows_frame(block, columns, offset)
+            offset += len(block)
+
+    return ExcelSheet(worksheet.title, _rows_frame(head_rows, columns, 0), read_chunks)
+
+
+def iter_excel_sheets(content: FileSource, chunk_rows: int = EXCEL_CHUNK_ROWS) -> Iterator[ExcelSheet]:
+    """
+    Feuilles d'un classeur .xlsx, lues en streaming (openpyxl read_only).
+
+    Seuls les blocs en cours de traitement sont en mémoire (plus la table des
+    chaînes partagées du classeur). Les blocs d'une feuille se lisent avant de
+    passer à la feuille suivante: le classeur est fermé à la fin du parcours.
+
+    Args:
+        content: Contenu du fichier, ou chemin du fichier envoyé (lu sur place)
+        chunk_rows: Lignes par bloc
+    """
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(source_stream(content), read_only=True, data_only=True)
+    try:
+        for worksheet in workbook.worksheets:
+            sheet = _stream_sheet(worksheet, chunk_rows)
+            if sheet is not None:
+                yield sheet
+    finally:
+        workbook.close()
+
+
+def read_excel_sheets(content: FileSource, extension: str, chunk_rows: int = EXCEL_CHUNK_ROWS) -> Iterator[ExcelSheet]:
+    """
+    Feuilles d'un fichier Excel: streaming pour .xlsx/.xlsm, pd.read_excel
+    (première feuille, en mémoire) pour les anciens .xls.
+    """
+    if extension in STREAMING_EXCEL_EXTENSIONS:
+        return iter_excel_sheets(content, chunk_rows)
+    return iter([frame_sheet(pd.read_excel(source_stream(content)))])
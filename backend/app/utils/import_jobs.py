@@ -0,0 +1,282 @@
+"""
+File d'attente des analyses de fichiers importés (Excel / PDF).
+
+L'analyse (pandas read_excel, PyPDF2, tabula et sa JVM) est faite dans un pool
+de processus local, hors de la boucle d'événements d'uvicorn:
+- IMPORT_MAX_WORKERS analyses au plus en parallèle, les autres attendent
+- au-delà de IMPORT_MAX_PENDING analyses en cours ou en attente, les nouvelles
+  sont refusées (ImportQueueFull)
+- un même fichier déjà en cours d'analyse n'est pas soumis deux fois
+- un gros fichier est transmis par son chemin (fichier temporaire de
+  utils/uploads, supprimé par release à la fin de l'analyse) et non recopié
+  vers le processus
+- les résultats sont déposés dans le cache d'import (upload_cache): le jeton
+  d'un travail terminé s'utilise comme celui d'une prévisualisation
+
+Chaque travail a un identifiant consultable (GET /imports/{job_id}) tant qu'il
+n'a pas expiré (IMPORT_JOB_TTL après la fin).
+"""
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional, Tuple
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+
+from .upload_cache import parsed_upload_cache, upload_token
+from .uploads import FileSource
+
+logger = logging.getLogger(__name__)
+
+IMPORT_MAX_WORKERS = int(os.getenv("IMPORT_MAX_WORKERS", "2"))
+IMPORT_MAX_PENDING = int(os.getenv("IMPORT_MAX_PENDING", "16"))
+IMPORT_JOB_TTL = float(os.getenv("IMPORT_JOB_TTL", "3600"))
+
+# Avancement affiché pour chaque état
+JOB_PROGRESS = {"queued": 0, "running": 50, "done": 100, "failed": 100}
+
+
+class ImportQueueFull(RuntimeError):
+    """Trop d'analyses en cours ou en attente."""
+
+
+class ImportJobQueue:
+    """
+    Pool de processus + registre des travaux d'analyse.
+    """
+
+    def __init__(self, max_workers: int = IMPORT_MAX_WORKERS, max_pending: int = IMPORT_MAX_PENDING):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._futures: Dict[str, Future] = {}
+        # Travail -> future résolue par _finish une fois le travail à jour (entrée ou erreur)
+        self._finished: Dict[str, Future] = {}
+        # (espace de noms, jeton) -> travail en cours pour ce contenu
+        self._inflight: Dict[tuple, str] = {}
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # "spawn": pas de fork d'un serveur multi-thread
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    def submit(
+        self,
+        namespace: str,
+        source: FileSource,
+        extension: str,
+        filename: str,
+        parse: Callable[[FileSource, str], Dict[str, Any]],
+        token: Optional[str] = None,
+        release: Optional[Callable[[], None]] = None
+    ) -> str:
+        """
+        Soumet l'analyse d'un fichier et retourne l'identifiant du travail.
+
+        Args:
+            namespace: Espace de noms du cache d'import ("devis", "hardware")
+            source: Contenu du fichier ou chemin du fichier envoyé (voir uploads)
+            extension: Extension ('.xlsx', '.xls', '.pdf')
+            filename: Nom d'origine
+            parse: Fonction d'analyse (définie au niveau d'un module, pour le pool)
+            token: Empreinte du contenu, si déjà calculée (obligatoire avec un chemin)
+            release: Appelé quand la source n'est plus utilisée (fin de
+                l'analyse, ou tout de suite si elle n'est pas soumise)
+
+        Raises:
+            ImportQueueFull: si IMPORT_MAX_PENDING analyses sont déjà en cours
+        """
+        return self._submit_released(namespace, source, extension, filename, parse, token, release)[0]
+
+    def _submit_released(
+        self,
+        namespace: str,
+        source: FileSource,
+        extension: str,
+        filename: str,
+        parse: Callable[[FileSource, str], Dict[str, Any]],
+        token: Optional[str],
+        release: Optional[Callable[[], None]]
+    ) -> Tuple[str, Future]:
+        # _submit, en libérant la source si elle n'est pas soumise au pool
+        submitted = False
+        try:
+            job_id, submitted, finished = self._submit(
+                namespace, source, extension, filename, parse, token or upload_token(source), release
+            )
+            return job_id, finished
+        finally:
+            if release is not None and not submitted:
+                release()
+
+    def _submit(
+        self,
+        namespace: str,
+        source: FileSource,
+        extension: str,
+        filename: str,
+        parse: Callable[[FileSource, str], Dict[str, Any]],
+        token: str,
+        release: Optional[Callable[[], None]]
+    ) -> Tuple[str, bool, Future]:
+        # (identifiant du travail, analyse soumise au pool, future de fin du travail)
+        cached = parsed_upload_cache.get(namespace, token)
+
+        with self._lock:
+            self._prune()
+            inflight = self._inflight.get((namespace, token))
+            if inflight is not None:
+                return inflight, False, self._finished[inflight]
+
+            job_id = uuid.uuid4().hex
+            job = {
+                "job_id": job_id,
+                "namespace": namespace,
+                "filename": filename,
+                "upload_token": token,
+                "status": "queued",
+                "error": None,
+                "entry": None,
+                "created_at": time.time(),
+                "finished_at": None,
+            }
+            finished: Future = Future()
+            if cached is not None:
+                job.update(status="done", entry=cached, finished_at=time.time())
+                self._jobs[job_id] = job
+                finished.set_result(cached)
+                return job_id, False, finished
+
+            if len(self._futures) >= self.max_pending:
+                raise ImportQueueFull(f"{len(self._futures)} analyses déjà en cours ou en attente")
+
+            try:
+                future = self._get_executor().submit(parse, source, extension)
+            except BrokenProcessPool:
+                # Un processus a été tué (ex: JVM tabula): repartir d'un pool neuf
+                logger.warning("Pool d'analyse cassé, recréation")
+                self._executor = None
+                future = self._get_executor().submit(parse, source, extension)
+
+            self._jobs[job_id] = job
+            self._futures[job_id] = future
+            self._finished[job_id] = finished
+            self._inflight[(namespace, token)] = job_id
+
+        future.add_done_callback(lambda done: self._finish(job_id, extension, done, release))
+        return job_id, True, finished
+
+    def _finish(
+        self,
+        job_id: str,
+        extension: str,
+        future: Future,
+        release: Optional[Callable[[], None]] = None
+    ) -> None:
+        if release is not None:
+            release()
+        with self._lock:
+            job = self._jobs[job_id]
+        entry, error = None, None
+        try:
+            parsed = future.result()
+            entry = parsed_upload_cache.put(job["namespace"], job["upload_token"], extension, job["filename"], parsed)
+        except Exception as e:
+            logger.error(f"Échec de l'analyse de {job['filename']}: {e}")
+            error = e
+
+        # Travail à jour avant de quitter les travaux en cours: un doublon soumis
+        # entre-temps retrouve ce travail ou l'entrée du cache, jamais un travail vide
+        with self._lock:
+            if error is None:
+                job.update(status="done", entry=entry, finished_at=time.time())
+            else:
+                job.update(status="failed", error=str(error), finished_at=time.time())
+            self._futures.pop(job_id, None)
+            finished = self._finished.pop(job_id)
+            self._inflight.pop((job["namespace"], job["upload_token"]), None)
+        if error is None:
+            finished.set_result(entry)
+        else:
+            finished.set_exception(ValueError(str(error)))
+
+    async def run(
+        self,
+        namespace: str,
+        source: FileSource,
+        extension: str,
+        filename: str,
+        parse: Callable[[FileSource, str], Dict[str, Any]],
+        token: Optional[str] = None,
+        release: Optional[Callable[[], None]] = None
+    ) -> Dict[str, Any]:
+        """
+        Soumet l'analyse et l'attend sans bloquer la boucle d'événements
+        (arguments: voir submit).
+
+        Returns:
+            Entrée du cache d'import: {"token", "extension", "filename", "parsed"}
+
+        Raises:
+            ImportQueueFull: file pleine
+            Exception: l'erreur levée par l'analyse
+        """
+        _, finished = self._submit_released(namespace, source, extension, filename, parse, token, release)
+        # shield: une requête annulée n'annule pas la fin du travail, partagée avec ses doublons
+        return await asyncio.shield(asyncio.wrap_future(finished))
+
+    def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        État public d'un travail (None si inconnu ou expiré).
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            status = job["status"]
+            future = self._futures.get(job_id)
+            if status == "queued" and future is not None and future.running():
+                status = "running"
+
+        result = None
+        if status == "done":
+            result = {**job["entry"]["parsed"], "upload_token": job["upload_token"]}
+        return {
+            "job_id": job_id,
+            "status": status,
+            "progress": JOB_PROGRESS[status],
+            "filename": job["filename"],
+            "upload_token": job["upload_token"] if status == "done" else None,
+            "error": job["error"],
+            "result": result,
+            "created_at": job["created_at"],
+            "finished_at": job["finished_at"],
+        }
+
+    def _prune(self) -> None:
+        now = time.time()
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job["finished_at"] is not None and now - job["finished_at"] > IMPORT_JOB_TTL
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+import_jobs = ImportJobQueue()
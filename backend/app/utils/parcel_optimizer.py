@@ -0,0 +1,244 @@
+"""
+Optimisation du regroupement de colis (consolidation / fractionnement) pour DHL.
+
+Un plan affecte chaque carton à un colis (vecteur d'affectation). Chaque colis
+est facturé comme un envoi séparé sur son poids facturable:
+max(somme des poids réels, somme des volumes / diviseur volumétrique).
+Le volume d'un colis consolidé est la somme des volumes de ses cartons
+(emballage supposé sans perte).
+
+Jusqu'à EXACT_MAX_BOXES cartons, tous les plans (partitions des cartons) sont
+évalués en une passe vectorisée: le plan retenu est le moins cher. Au-delà, la
+recherche est heuristique: elle part de plusieurs plans initiaux puis améliore
+les meilleurs par recherche locale (déplacement d'un carton, échange de deux
+cartons), chaque voisinage étant évalué en une seule passe vectorisée sur la
+grille compilée; le plan retenu n'est pas forcément le moins cher.
+"""
+from typing import Any, Callable, Dict, List, Optional, Sequence
+import numpy as np
+
+# Capacités cibles des plans initiaux "premier ajustement décroissant" (kg facturables)
+SEED_CAPACITIES = (5.0, 10.0, 20.0, 30.0, 50.0, 70.0)
+# Recherche exhaustive jusqu'à ce nombre de cartons (21 147 plans pour 9 cartons)
+EXACT_MAX_BOXES = 9
+
+
+class ParcelPlanOptimizer:
+    """
+    Recherche d'un plan de colis pour une destination donnée: le moins cher
+    jusqu'à EXACT_MAX_BOXES cartons, le meilleur trouvé par recherche locale au-delà.
+    """
+
+    def __init__(
+        self,
+        price: Callable[[np.ndarray], np.ndarray],
+        weights: Sequence[float],
+        volumetric_weights: Sequence[float],
+        max_parcel_weight: Optional[float] = None,
+        max_iterations: Optional[int] = None
+    ):
+        """
+        Args:
+            price: Coût d'un envoi pour un vecteur de poids facturables (MAD)
+            weights: Poids réels des cartons (kg)
+            volumetric_weights: Poids volumétriques des cartons (kg)
+            max_parcel_weight: Poids réel maximum d'un colis regroupant plusieurs cartons
+            max_iterations: Nombre maximum d'améliorations (par défaut 10 x nombre de cartons)
+        """
+        self.price = price
+        self.weights = np.asarray(weights, dtype=np.float64)
+        self.volumes = np.asarray(volumetric_weights, dtype=np.float64)
+        self.size = len(self.weights)
+        self.max_parcel_weight = max_parcel_weight
+        self.max_iterations = max_iterations or 10 * self.size
+        self.plans_evaluated = 0
+
+    def _parcel_costs(self, weights: np.ndarray, volumes: np.ndarray, counts: np.ndarray) -> np.ndarray:
+        """
+        Coût de colis décrits par leurs sommes (colis vide = 0, colis trop lourd = inf).
+        """
+        costs = np.zeros(weights.shape, dtype=np.float64)
+        filled = counts > 0
+        if filled.any():
+            costs[filled] = self.price(np.maximum(weights[filled], volumes[filled]))
+        if self.max_parcel_weight is not None:
+            costs[(counts > 1) & (weights > self.max_parcel_weight + 1e-9)] = np.inf
+        return costs
+
+    def evaluate(self, assignments: np.ndarray) -> np.ndarray:
+        """
+        Coût total de plusieurs plans (une ligne d'affectation par plan).
+        """
+        assignments = np.atleast_2d(assignments)
+        plans, size = assignments.shape
+        flat = (assignments + np.arange(plans)[:, None] * size).ravel()
+        length = plans * size
+        weights = np.bincount(flat, weights=np.tile(self.weights, plans), minlength=length)
+        volumes = np.bincount(flat, weights=np.tile(self.volumes, plans), minlength=length)
+        counts = np.bincount(flat, minlength=length)
+        self.plans_evaluated += plans
+        return self._parcel_costs(weights, volumes, counts).reshape(plans, size).sum(axis=1)
+
+    def seed_plans(self) -> np.ndarray:
+        """
+        Plans initiaux: un seul colis, un colis par carton, et des regroupements
+        "premier ajustement décroissant" pour plusieurs capacités cibles.
+        """
+        seeds = [np.zeros(self.size, dtype=np.intp), np.arange(self.size, dtype=np.intp)]
+        billable = np.maximum(self.weights, self.volumes)
+        order = np.argsort(-billable, kind="stable")
+        for capacity in SEED_CAPACITIES:
+            if self.max_parcel_weight is not None:
+                capacity = min(capacity, self.max_parcel_weight)
+            assignment = np.empty(self.size, dtype=np.intp)
+            loads: List[float] = []
+            for box in order:
+                for parcel, load in enumerate(loads):
+                    if load + billable[box] <= capacity:
+                        loads[parcel] += billable[box]
+                        assignment[box] = parcel
+                        break
+                else:
+                    assignment[box] = len(loads)
+                    loads.append(billable[box])
+            seeds.append(assignment)
+        return np.unique(np.array(seeds), axis=0)
+
+    def all_plans(self) -> np.ndarray:
+        """
+        Tous les plans, un par partition des cartons (numérotation canonique:
+        chaque carton va dans un colis existant ou dans le suivant).
+        """
+        plans = np.zeros((1, 1), dtype=np.intp)
+        highest = np.zeros(1, dtype=np.intp)
+        for _ in range(1, self.size):
+            choices = highest + 2
+            rows = np.repeat(plans, choices, axis=0)
+            values = np.arange(len(rows)) - np.repeat(np.cumsum(choices) - choices, choices)
+            plans = np.column_stack([rows, values])
+            highest = np.maximum(np.repeat(highest, choices), values)
+        return plans
+
+    def improve(self, assignment: np.ndarray) -> np.ndarray:
+        """
+        Recherche locale (meilleure amélioration): déplacements et échanges de cartons.
+
+        Args:
+            assignment: Plan de départ réalisable (coût fini: les écarts de coût
+                d'un plan contenant un colis trop lourd ne sont pas définis)
+        """
+        assignment = self._compact(assignment)
+        boxes = np.arange(self.size)
+
+        for _ in range(self.max_iterations):
+            parcels = int(assignment.max()) + 2  # parcels existants + un colis vide
+            weights = np.bincount(assignment, weights=self.weights, minlength=parcels)
+            volumes = np.bincount(assignment, weights=self.volumes, minlength=parcels)
+            counts = np.bincount(assignment, minlength=parcels)
+            current = self._parcel_costs(weights, volumes, counts)
+            source = assignment
+
+            # Déplacement du carton i vers le colis p: seuls deux colis changent
+            left = self._parcel_costs(
+                weights[source] - self.weights, volumes[source] - self.volumes, counts[source] - 1
+            )
+            arrived = self._parcel_costs(
+                weights[None, :] + self.weights[:, None],
+                volumes[None, :] + self.volumes[:, None],
+                np.broadcast_to(counts[None, :] + 1, (self.size, parcels))
+            )
+            move_delta = left[:, None] + arrived - current[source][:, None] - current[None, :]
+            move_delta[boxes, source] = np.inf
+            self.plans_evaluated += move_delta.size
+
+            # Échange des cartons i et j de colis différents
+            weight_shift = self.weights[None, :] - self.weights[:, None]
+            volume_shift = self.volumes[None, :] - self.volumes[:, None]
+            same_counts = np.broadcast_to(counts[source][:, None], (self.size, self.size))
+            first = self._parcel_costs(weights[source][:, None] + weight_shift, volumes[source][:, None] + volume_shift, same_counts)
+            second = self._parcel_costs(weights[source][None, :] - weight_shift, volumes[source][None, :] - volume_shift, same_counts.T)
+            swap_delta = first + second - current[source][:, None] - current[source][None, :]
+            swap_delta[source[:, None] == source[None, :]] = np.inf
+            swap_delta[np.tril_indices(self.size)] = np.inf
+            self.plans_evaluated += self.size * (self.size - 1) // 2
+
+            best_move = np.unravel_index(np.argmin(move_delta), move_delta.shape)
+            best_swap = np.unravel_index(np.argmin(swap_delta), swap_delta.shape) if self.size > 1 else None
+            move_gain = move_delta[best_move]
+            swap_gain = swap_delta[best_swap] if best_swap is not None else np.inf
+
+            if min(move_gain, swap_gain) >= -1e-9:
+                break
+
+            assignment = assignment.copy()
+            if move_gain <= swap_gain:
+                assignment[best_move[0]] = best_move[1]
+            else:
+                i, j = best_swap
+                assignment[i], assignment[j] = assignment[j], assignment[i]
+            assignment = self._compact(assignment)
+
+        return assignment
+
+    @staticmethod
+    def _compact(assignment: np.ndarray) -> np.ndarray:
+        """
+        Renumérote les colis 0..k-1 dans l'ordre d'apparition.
+        """
+        _, first_seen, inverse = np.unique(assignment, return_index=True, return_inverse=True)
+        order = np.argsort(np.argsort(first_seen))
+        return order[inverse].astype(np.intp)
+
+    def optimize(self, restarts: int = 3) -> Dict[str, Any]:
+        """
+        Retourne le plan le moins cher (recherche exhaustive) ou, au-delà de
+        EXACT_MAX_BOXES cartons, le meilleur plan trouvé par recherche locale.
+
+        Args:
+            restarts: Nombre de plans initiaux améliorés par recherche locale
+
+        Returns:
+            {"assignment": affectation carton -> colis, "cost": coût total (MAD),
+             "exact": True si le plan est le moins cher de tous}
+        """
+        if 0 < self.size <= EXACT_MAX_BOXES:
+            plans = self.all_plans()
+            costs = self.evaluate(plans)
+            best = int(np.argmin(costs))
+            if not np.isfinite(costs[best]):
+                return {"assignment": None, "cost": np.inf, "exact": True}
+            return {"assignment": plans[best], "cost": float(costs[best]), "exact": True}
+
+        seeds = self.seed_plans()
+        seed_costs = self.evaluate(seeds)
+        # Plans initiaux irréalisables (colis trop lourd) écartés
+        feasible = np.flatnonzero(np.isfinite(seed_costs))
+
+        best_assignment, best_cost = None, np.inf
+        for index in feasible[np.argsort(seed_costs[feasible], kind="stable")[:restarts]]:
+            assignment = self.improve(seeds[index])
+            cost = float(self.evaluate(assignment)[0])
+            if cost < best_cost - 1e-9:
+                best_assignment, best_cost = assignment, cost
+
+        return {"assignment": best_assignment, "cost": best_cost, "exact": False}
+
+    def describe(self, assignment: np.ndarray) -> List[Dict[str, Any]]:
+        """
+        Détail des colis d'un plan.
+        """
+        parcels = []
+        for parcel in range(int(assignment.max()) + 1):
+            boxes = np.flatnonzero(assignment == parcel)
+            weight = float(self.weights[boxes].sum())
+            volumetric = float(self.volumes[boxes].sum())
+            billable = max(weight, volumetric)
+            parcels.append({
+                "parcel": parcel + 1,
+                "boxes": [int(box) for box in boxes],
+                "actual_weight_kg": round(weight, 3),
+                "volumetric_weight_kg": round(volumetric, 3),
+                "billable_weight_kg": round(billable, 3),
+                "cost": float(self.price(np.array([billable]))[0])
+            })
+        return parcels
@@ -0,0 +1,176 @@
+"""
+Extraction des tableaux d'un PDF (tabula-py) dans des processus dédiés.
+
+tabula lance une JVM à chaque appel, sauf si jpype est installé: la JVM est
+alors démarrée une fois dans le processus et réutilisée. Elle ne peut pas être
+redémarrée ensuite, d'où des processus dédiés plutôt que le processus appelant:
+- PDF_TABLE_WORKERS processus gardent chacun leur JVM chaude entre deux PDF
+- toutes les méthodes d'extraction sont essayées dans un seul aller-retour
+- sans extraction pendant PDF_TABLE_IDLE_SECONDS, les processus (et leur JVM)
+  sont arrêtés; le suivant est relancé à la demande
+- la présence de Java est vérifiée au premier besoin, sans lancer java
+"""
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+import multiprocessing
+import os
+import shutil
+import threading
+import time
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+PDF_TABLE_WORKERS = int(os.getenv("PDF_TABLE_WORKERS", "1"))
+PDF_TABLE_IDLE_SECONDS = float(os.getenv("PDF_TABLE_IDLE_SECONDS", "300"))
+
+# Méthodes d'extraction par ordre de priorité (la première qui trouve un tableau l'emporte)
+TABLE_EXTRACTION_METHODS = [
+    {"pages": 'all', "multiple_tables": True},
+    {"pages": 'all', "multiple_tables": True, "lattice": True},
+    {"pages": 'all', "multiple_tables": True, "stream": True},
+    {"pages": 'all', "multiple_tables": True, "guess": False, "area": [0, 0, 100, 100]}
+]
+
+
+@lru_cache(maxsize=1)
+def java_available() -> bool:
+    """
+    Java présent dans le PATH (ou JAVA_HOME), vérifié une seule fois.
+    """
+    java_home = os.getenv("JAVA_HOME")
+    if java_home and os.path.isfile(os.path.join(java_home, "bin", "java")):
+        return True
+    return shutil.which("java") is not None
+
+
+@lru_cache(maxsize=1)
+def jpype_available() -> bool:
+    """jpype installé: tabula garde sa JVM dans le processus."""
+    try:
+        import jpype  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def _read_tables(pdf_path: str, methods: List[Dict[str, Any]]) -> Tuple[Optional[int], List[pd.DataFrame]]:
+    """
+    Exécuté dans un processus dédié: essaie les méthodes dans l'ordre.
+
+    Returns:
+        (indice de la méthode retenue ou None, tableaux non vides)
+    """
+    import tabula
+
+    for i, method in enumerate(methods):
+        try:
+            tables = tabula.read_pdf(pdf_path, **method)
+        except Exception as e:
+            logger.debug(f"Méthode {i+1} échouée: {e}")
+            continue
+        if tables and not all(table.empty for table in tables):
+            return i, [table for table in tables if not table.empty]
+    return None, []
+
+
+class TableExtractionPool:
+    """
+    Processus d'extraction de tableaux, arrêtés après une période d'inactivité.
+    """
+
+    def __init__(self, max_workers: int = PDF_TABLE_WORKERS, idle_seconds: float = PDF_TABLE_IDLE_SECONDS):
+        self.max_workers = max_workers
+        self.idle_seconds = idle_seconds
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._active = 0
+        self._last_used = 0.0
+        self._idle_timer: Optional[threading.Timer] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            if not jpype_available():
+                logger.warning("jpype absent: tabula lancera une JVM par méthode d'extraction (pip install jpype1)")
+            # "spawn": la JVM ne survit pas à un fork
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    def extract(self, pdf_path: str, methods: List[Dict[str, Any]] = TABLE_EXTRACTION_METHODS) -> List[pd.DataFrame]:
+        """
+        Tableaux non vides du PDF, avec la première méthode qui en trouve.
+
+        Args:
+            pdf_path: Chemin du fichier PDF (lisible par le processus d'extraction)
+            methods: Options tabula.read_pdf, par ordre de priorité
+
+        Returns:
+            Liste de DataFrames (vide si Java est absent ou si rien n'est trouvé)
+        """
+        if not java_available():
+            logger.warning("Java manquant - extraction des tableaux PDF impossible")
+            return []
+
+        with self._lock:
+            executor = self._get_executor()
+            self._active += 1
+        try:
+            try:
+                method, tables = executor.submit(_read_tables, pdf_path, methods).result()
+            except BrokenProcessPool:
+                # JVM tuée (mémoire, signal): repartir d'un pool neuf, une seule fois
+                logger.warning("Processus d'extraction des tableaux cassé, recréation")
+                with self._lock:
+                    if self._executor is executor:
+                        self._executor = None
+                    executor = self._get_executor()
+                method, tables = executor.submit(_read_tables, pdf_path, methods).result()
+        finally:
+            with self._lock:
+                self._active -= 1
+                self._last_used = time.monotonic()
+                self._schedule_idle_shutdown()
+
+        if method is None:
+            logger.warning("Aucune méthode d'extraction n'a fonctionné")
+        else:
+            logger.info(f"Méthode {method+1} réussie: {len(tables)} tableaux")
+        return tables
+
+    def _schedule_idle_shutdown(self) -> None:
+        if self._idle_timer is not None:
+            self._idle_timer.cancel()
+        self._idle_timer = threading.Timer(self.idle_seconds, self._shutdown_if_idle)
+        self._idle_timer.daemon = True
+        self._idle_timer.start()
+
+    def _shutdown_if_idle(self) -> None:
+        with self._lock:
+            if self._active or time.monotonic() - self._last_used < self.idle_seconds:
+                return
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            logger.info("Extraction des tableaux PDF inactive: arrêt des processus")
+            executor.shutdown(wait=False)
+
+    def is_running(self) -> bool:
+        return self._executor is not None
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+            if self._idle_timer is not None:
+                self._idle_timer.cancel()
+                self._idle_timer = None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+pdf_table_pool = TableExtractionPool()
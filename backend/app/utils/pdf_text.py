@@ -0,0 +1,183 @@
+"""
+Extraction du texte des PDF importés, partagée par les routeurs d'import.
+
+- iter_pdf_pages: texte page par page, à la demande (une détection qui
+  s'arrête à la première page ne lit pas les suivantes)
+- extract_pdf_text: texte complet; les pages sont jointes en une fois
+  (liste + join), et réparties entre PDF_TEXT_WORKERS processus à partir de
+  PDF_TEXT_PARALLEL_MIN_PAGES pages
+- la bibliothèque de lecture est un backend interchangeable (PDF_TEXT_BACKEND):
+  PyPDF2 par défaut, PyMuPDF s'il est installé
+"""
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional
+import logging
+import multiprocessing
+import os
+import threading
+
+from .uploads import FileSource, source_stream
+
+logger = logging.getLogger(__name__)
+
+PDF_TEXT_BACKEND = os.getenv("PDF_TEXT_BACKEND", "pypdf2")
+PDF_TEXT_WORKERS = int(os.getenv("PDF_TEXT_WORKERS", str(min(4, os.cpu_count() or 1))))
+PDF_TEXT_PARALLEL_MIN_PAGES = int(os.getenv("PDF_TEXT_PARALLEL_MIN_PAGES", "40"))
+
+
+class PdfTextBackend:
+    """
+    Lecture du texte d'un PDF page par page.
+    """
+    name = ""
+
+    def page_count(self, content: FileSource) -> int:
+        raise NotImplementedError
+
+    def iter_pages(self, content: FileSource, start: int = 0, stop: Optional[int] = None) -> Iterator[str]:
+        """Texte des pages start à stop (exclu), lues au fur et à mesure (contenu ou chemin du PDF)."""
+        raise NotImplementedError
+
+
+class PyPDF2Backend(PdfTextBackend):
+    name = "pypdf2"
+
+    def page_count(self, content: FileSource) -> int:
+        import PyPDF2
+        return len(PyPDF2.PdfReader(source_stream(content)).pages)
+
+    def iter_pages(self, content: FileSource, start: int = 0, stop: Optional[int] = None) -> Iterator[str]:
+        import PyPDF2
+        pages = PyPDF2.PdfReader(source_stream(content)).pages
+        for page_num in range(start, len(pages) if stop is None else min(stop, len(pages))):
+            yield pages[page_num].extract_text()
+
+
+class PyMuPDFBackend(PdfTextBackend):
+    name = "pymupdf"
+
+    @staticmethod
+    def _open(content: FileSource):
+        import fitz
+        if isinstance(content, str):
+            return fitz.open(content, filetype="pdf")
+        return fitz.open(stream=content, filetype="pdf")
+
+    def page_count(self, content: FileSource) -> int:
+        with self._open(content) as document:
+            return document.page_count
+
+    def iter_pages(self, content: FileSource, start: int = 0, stop: Optional[int] = None) -> Iterator[str]:
+        with self._open(content) as document:
+            for page_num in range(start, document.page_count if stop is None else min(stop, document.page_count)):
+                yield document[page_num].get_text()
+
+
+PDF_TEXT_BACKENDS: Dict[str, PdfTextBackend] = {
+    backend.name: backend for backend in (PyPDF2Backend(), PyMuPDFBackend())
+}
+
+
+def get_backend(name: Optional[str] = None) -> PdfTextBackend:
+    """
+    Backend de lecture (par défaut PDF_TEXT_BACKEND).
+
+    Raises:
+        ValueError: backend inconnu
+    """
+    name = name or PDF_TEXT_BACKEND
+    if name not in PDF_TEXT_BACKENDS:
+        raise ValueError(f"Backend PDF inconnu: {name} (disponibles: {', '.join(PDF_TEXT_BACKENDS)})")
+    return PDF_TEXT_BACKENDS[name]
+
+
+def iter_pdf_pages(content: FileSource, backend: Optional[str] = None, max_pages: Optional[int] = None) -> Iterator[str]:
+    """
+    Texte de chaque page, lu seulement quand la page est demandée.
+
+    Args:
+        content: Contenu du PDF, ou chemin du fichier envoyé
+        backend: Nom du backend (PDF_TEXT_BACKEND par défaut)
+        max_pages: Nombre maximum de pages lues (toutes par défaut)
+    """
+    return get_backend(backend).iter_pages(content, 0, max_pages)
+
+
+def _extract_page_range(backend: str, content: FileSource, start: int, stop: int) -> List[str]:
+    # Exécuté dans un processus du pool (un chemin évite d'envoyer le PDF à chaque processus)
+    return list(get_backend(backend).iter_pages(content, start, stop))
+
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=PDF_TEXT_WORKERS,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _executor
+
+
+def shutdown() -> None:
+    """Arrête les processus de lecture parallèle (arrêt du serveur)."""
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def extract_pdf_pages(
+    content: FileSource,
+    backend: Optional[str] = None,
+    max_pages: Optional[int] = None,
+    start: int = 0
+) -> List[str]:
+    """
+    Texte de toutes les pages (ou des max_pages premières), dans l'ordre, à
+    partir de la page start (pages déjà lues par ailleurs sautées).
+
+    Les gros documents sont découpés en tranches de pages contiguës, une par
+    processus; les autres sont lus dans le processus appelant.
+    """
+    name = get_backend(backend).name
+    count = get_backend(name).page_count(content)
+    if max_pages is not None:
+        count = min(count, max_pages)
+
+    workers = min(PDF_TEXT_WORKERS, count - start)
+    if count - start < PDF_TEXT_PARALLEL_MIN_PAGES or workers < 2:
+        return list(get_backend(name).iter_pages(content, start, count))
+
+    size = -(-(count - start) // workers)
+    futures = [
+        _get_executor().submit(_extract_page_range, name, content, first, min(first + size, count))
+        for first in range(start, count, size)
+    ]
+    pages: List[str] = []
+    for future in futures:
+        pages.extend(future.result())
+    return pages
+
+
+def extract_pdf_text(
+    content: FileSource,
+    separator: str = "\n\n",
+    backend: Optional[str] = None,
+    max_pages: Optional[int] = None
+) -> str:
+    """
+    Texte du PDF: chaque page suivie de separator.
+
+    Args:
+        content: Contenu du PDF, ou chemin du fichier envoyé
+        separator: Ajouté après chaque page
+        backend: Nom du backend (PDF_TEXT_BACKEND par défaut)
+        max_pages: Nombre maximum de pages lues (toutes par défaut)
+    """
+    return "".join(page + separator for page in extract_pdf_pages(content, backend, max_pages))
@@ -0,0 +1,534 @@
+"""
+Moteur d'extraction des devis PDF, commun à tous les imports (devis, matériel,
+devis Cisco, extracteur générique).
+
+- QuoteDocument: le PDF est lu une seule fois (texte page par page,
+  utils/pdf_text); lignes, index des descriptions et tableaux (tabula,
+  utils/pdf_tables) sont calculés à la première demande et partagés par la
+  détection et les parsers
+- QUOTE_PARSERS: registre ordonné des parsers, un par format de devis; le
+  format est reconnu sur le texte de la première page seulement
+  (QuoteParser.matches), le parser générique sert quand aucun ne le reconnaît
+- extract_quote: devis au format commun ci-dessous; si le parser du format ne
+  trouve aucun article, les méthodes génériques (motifs, tableaux, lignes)
+  sont essayées
+
+Format commun:
+    {
+        "vendor": format reconnu ("cisco_price_quotation", "cisco", "generic"),
+        "supplier": fournisseur détecté ("cisco", "hp", ..., "generic"),
+        "info": champs d'en-tête trouvés (quote_id, client, project, ...),
+        "items": [{"line_number", "pn", "description", "qty", "unit_cost",
+                   "total_cost", "brand", "currency"}],
+        "totals": montants trouvés (subtotal, tax, shipping, handling, total),
+    }
+
+Chaque routeur convertit ce résultat dans son propre format de sortie.
+"""
+from typing import Any, Dict, List, Optional
+import logging
+import os
+import re
+import tempfile
+
+import pandas as pd
+
+from .excel_extraction import (
+    COLUMN_PATTERNS, direct_column_mapping, extract_item_frame, extract_item_frame_simple,
+    find_header_row, first_data_row
+)
+from .pdf_tables import pdf_table_pool
+from .pdf_text import extract_pdf_pages, iter_pdf_pages
+from .quote_patterns import GenericPDFExtractor
+from .quote_text import DescriptionIndex
+from .uploads import FileSource
+
+logger = logging.getLogger(__name__)
+
+GENERIC_VENDOR = "generic"
+
+
+class QuoteDocument:
+    """
+    Devis PDF lu une seule fois, partagé par la détection et les parsers.
+    """
+
+    def __init__(self, content: Optional[FileSource] = None, pages: Optional[List[str]] = None):
+        # Contenu du PDF, ou chemin du fichier envoyé (lu sur place par PyPDF2 et tabula)
+        self.content = content
+        self._pages = pages
+        self._first_page: Optional[str] = None
+        self._texts: Dict[str, str] = {}
+        self._lines: Optional[List[str]] = None
+        self._descriptions: Optional[DescriptionIndex] = None
+        self._tables: Optional[List[pd.DataFrame]] = None
+
+    @classmethod
+    def from_text(cls, text: str) -> "QuoteDocument":
+        """Document dont le texte est déjà extrait (une seule page, pas de tableaux)."""
+        return cls(pages=[text])
+
+    @property
+    def pages(self) -> List[str]:
+        """Texte de chaque page, extrait au premier accès (aucune page si le PDF est illisible)."""
+        if self._pages is None:
+            try:
+                if self._first_page is None:
+                    self._pages = extract_pdf_pages(self.content)
+                else:
+                    # Première page déjà lue pour la détection: lecture des suivantes
+                    self._pages = [self._first_page] + extract_pdf_pages(self.content, start=1)
+                logger.info(f"Texte PDF extrait: {len(self._pages)} pages")
+            except Exception as e:
+                logger.error(f"Erreur extraction texte PDF: {e}")
+                self._pages = []
+        return self._pages
+
+    @property
+    def first_page(self) -> str:
+        """
+        Texte de la première page (détection du format): seule cette page est
+        lue tant que le texte complet n'est pas demandé.
+        """
+        if self._pages is not None:
+            return self._pages[0] if self._pages else ""
+        if self._first_page is None:
+            try:
+                first = list(iter_pdf_pages(self.content, max_pages=1))
+            except Exception as e:
+                logger.error(f"Erreur extraction texte PDF: {e}")
+                first = []
+            if not first:
+                # PDF illisible ou sans page: rien d'autre à lire
+                self._pages = []
+                return ""
+            self._first_page = first[0]
+        return self._first_page
+
+    def text(self, separator: str = "\n\n") -> str:
+        """Texte complet: chaque page suivie de separator."""
+        if separator not in self._texts:
+            self._texts[separator] = "".join(page + separator for page in self.pages)
+        return self._texts[separator]
+
+    @property
+    def lines(self) -> List[str]:
+        """Lignes du texte complet."""
+        if self._lines is None:
+            self._lines = self.text().split("\n")
+        return self._lines
+
+    @property
+    def descriptions(self) -> DescriptionIndex:
+        """Index des descriptions des numéros de pièce (voir utils/quote_text)."""
+        if self._descriptions is None:
+            self._descriptions = DescriptionIndex(self.text())
+        return self._descriptions
+
+    @property
+    def tables(self) -> List[pd.DataFrame]:
+        """Tableaux du PDF (tabula), extraits seulement si un parser les demande."""
+        if self._tables is None:
+            self._tables = read_pdf_tables(self.content) if self.content else []
+        return self._tables
+
+
+def read_pdf_tables(pdf_content: FileSource) -> List[pd.DataFrame]:
+    """Extraire les tableaux d'un PDF avec plusieurs méthodes (processus tabula persistant)."""
+    temp_path = None
+    if isinstance(pdf_content, str):
+        # Fichier envoyé déjà sur disque: lu sur place
+        pdf_path = pdf_content
+    else:
+        with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as temp_file:
+            temp_file.write(pdf_content)
+            pdf_path = temp_path = temp_file.name
+
+    try:
+        logger.info("Extraction tableaux PDF")
+        # Toutes les méthodes sont essayées en un seul appel, avec une JVM déjà démarrée
+        return pdf_table_pool.extract(pdf_path)
+    except Exception as e:
+        logger.error(f"Erreur extraction PDF: {e}")
+        return []
+    finally:
+        if temp_path is not None:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+
+
+def quote_item(
+    line_number: str,
+    pn: str,
+    description: str,
+    qty: int,
+    unit_cost: float,
+    total_cost: Optional[float] = None,
+    brand: Optional[str] = None,
+    currency: Optional[str] = None
+) -> Dict[str, Any]:
+    """Article au format commun (brand/currency None: valeurs par défaut de l'import)."""
+    return {
+        "line_number": line_number,
+        "pn": pn,
+        "description": description,
+        "qty": qty,
+        "unit_cost": unit_cost,
+        "total_cost": unit_cost * qty if total_cost is None else total_cost,
+        "brand": brand,
+        "currency": currency
+    }
+
+
+def _amount(value: str) -> Optional[float]:
+    try:
+        return float(value.replace(',', '').replace(' ', ''))
+    except ValueError:
+        return None
+
+
+class QuoteParser:
+    """
+    Parser d'un format de devis.
+    """
+    vendor = GENERIC_VENDOR
+
+    def matches(self, first_page: str) -> bool:
+        """Le format est-il reconnu sur le texte de la première page?"""
+        return False
+
+    def parse(self, document: QuoteDocument) -> Dict[str, Any]:
+        """Devis au format commun (voir le module)."""
+        raise NotImplementedError
+
+
+QUOTE_PARSERS: Dict[str, QuoteParser] = {}
+
+
+def register_quote_parser(parser: QuoteParser) -> QuoteParser:
+    """Ajouter un parser au registre (les formats sont essayés dans l'ordre d'ajout)."""
+    QUOTE_PARSERS[parser.vendor] = parser
+    return parser
+
+
+class GenericQuoteParser(QuoteParser):
+    """
+    Devis de format inconnu: motifs génériques (GenericPDFExtractor), puis
+    tableaux du PDF, puis lignes du texte.
+    """
+    vendor = GENERIC_VENDOR
+    extractor = GenericPDFExtractor()
+
+    # Lignes du texte (dernier recours)
+    LINE_PN = re.compile(r'([A-Z0-9][\w\-]{4,})')
+    LINE_QTY = re.compile(r'\b(\d+)\b')
+    LINE_DESCRIPTION = re.compile(r'([A-Za-z][A-Za-z\s]{10,})')
+    LINE_PRICE = re.compile(r'(\d+(?:\.\d+)?)')
+
+    # Numéro de devis: au moins un chiffre, pas une date
+    QUOTE_ID = re.compile(r'(?=[^\d]*\d)[A-Z0-9][A-Z0-9\-_/]{2,39}', re.IGNORECASE)
+    QUOTE_ID_DATE = re.compile(r'\d{1,4}[\-/\.]\d{1,2}[\-/\.]\d{1,4}')
+    # Numéro annoncé par son libellé ("Quote #: 3000123456", "Devis N° 2024-11")
+    LABELLED_QUOTE_ID = re.compile(
+        r'\b(?:Quote|Quotation|Devis|Offre)\b[ \t]*(?:ID|Number|No|N°|Ref|#)?\.?[ \t]*[:#]?[ \t]*([A-Z0-9][A-Z0-9\-_/]+)',
+        re.IGNORECASE
+    )
+
+    def parse(self, document: QuoteDocument) -> Dict[str, Any]:
+        text = document.text("\n")
+        supplier = self.extractor.detect_supplier(document.first_page)
+        info = self.extractor.extract_header_info(text)
+        quote_id = self.quote_id(info.get("quote_id"), text)
+        if quote_id:
+            info["quote_id"] = quote_id
+        else:
+            info.pop("quote_id", None)
+        return {
+            "vendor": self.vendor,
+            "supplier": supplier,
+            "info": info,
+            "items": self.find_items(document, supplier),
+            "totals": self.extractor.extract_totals(text)
+        }
+
+    def quote_id(self, candidate: Optional[str], text: str) -> Optional[str]:
+        """
+        Numéro de devis: celui des motifs génériques de l'en-tête s'il ressemble
+        à un numéro, sinon le premier numéro annoncé par un libellé de devis.
+        """
+        candidates = [candidate] if candidate else []
+        candidates += [match.group(1) for match in self.LABELLED_QUOTE_ID.finditer(text)]
+        for value in candidates:
+            value = value.strip()
+            if self.QUOTE_ID.fullmatch(value) and not self.QUOTE_ID_DATE.fullmatch(value):
+                return value
+        return None
+
+    def find_items(self, document: QuoteDocument, supplier: str) -> List[Dict[str, Any]]:
+        """Articles trouvés par la première méthode qui en trouve."""
+        items = [
+            quote_item(
+                item['line_number'], item['part_number'], item['description'], item['quantity'],
+                item['unit_price'], item['total_price'], item['brand'], item['currency']
+            )
+            for item in self.extractor.extract_line_items(document.text("\n"), supplier)
+        ]
+        if not items:
+            items = self.table_items(document.tables)
+        if not items:
+            logger.info("Fallback: extraction texte")
+            items = self.line_items(document.lines)
+        return items
+
+    def table_items(self, tables: List[pd.DataFrame]) -> List[Dict[str, Any]]:
+        """Articles des tableaux du PDF (mêmes règles que les feuilles Excel)."""
+        items = []
+        for table in tables:
+            if table.empty:
+                continue
+            header_row, column_mapping = find_header_row(table, COLUMN_PATTERNS)
+            if header_row is None:
+                column_mapping = direct_column_mapping(table, COLUMN_PATTERNS)
+            frame = None
+            if column_mapping:
+                frame = extract_item_frame(table, column_mapping, first_data_row(table, column_mapping))
+            if frame is None or not len(frame):
+                frame = extract_item_frame_simple(table)
+            offset = len(items)
+            items.extend(
+                quote_item(str(offset + number + 1), pn, description or pn, int(qty), float(unit_cost))
+                for number, (pn, description, qty, unit_cost) in enumerate(
+                    zip(frame["pn"], frame["description"], frame["qty"], frame["unit_cost"])
+                )
+            )
+        if tables:
+            logger.info(f"Analyse {len(tables)} tableaux: {len(items)} articles")
+        return items
+
+    def line_items(self, lines: List[str]) -> List[Dict[str, Any]]:
+        """Une ligne avec un numéro de pièce et un nombre est un article."""
+        items = []
+        for line in lines:
+            pn_match = self.LINE_PN.search(line)
+            qty_match = self.LINE_QTY.search(line)
+            if pn_match and qty_match:
+                pn = pn_match.group(1)
+                desc_match = self.LINE_DESCRIPTION.search(line)
+                price_match = self.LINE_PRICE.search(line)
+                items.append(quote_item(
+                    str(len(items) + 1),
+                    pn,
+                    desc_match.group(1) if desc_match else pn,
+                    int(qty_match.group(1)),
+                    float(price_match.group(1)) if price_match else 0.0
+                ))
+        return items
+
+
+class CiscoQuoteParser(QuoteParser):
+    """
+    Devis Cisco (SAPO45): lignes "#01 PN description qté $ prix total".
+    """
+    vendor = "cisco"
+
+    INFO_PATTERNS = {
+        "quote_id": re.compile(r'Quote ID\s*:\s*(\d+)'),
+        "deal_id": re.compile(r'Deal ID\s*:\s*(\d+)'),
+        "project": re.compile(r'Quote Name\s*:\s*([^\n]+)'),
+        "client": re.compile(r'End Customer\s*:\s*\n([A-Z\s]+)'),
+        "contact": re.compile(r'Contact Details:\s*\n([^\n]+)'),
+        "email": re.compile(r'Email:\s*([^\n]+@[^\n]+)'),
+        "destination_country": re.compile(r'Total DDP-([A-Z]+):'),
+    }
+    # Champs de l'en-tête générique gardés (ceux que le format Cisco ne définit pas)
+    GENERIC_INFO = ("date", "expiration", "phone", "currency")
+    TOTAL_PATTERNS = {
+        "subtotal": re.compile(r'SubTotal - EXW\s*:\s*\$\s*([0-9,.]+)'),
+        "handling": re.compile(r'Handling Cost[^\$]+\$\s*([0-9,.]+)'),
+        "total": re.compile(r'Total DDP[^:]+:\s*\$\s*([0-9,.]+)'),
+    }
+
+    # Format typique: "#01 C9300X-24Y-A Catalyst 9300X 24x25G Fiber Ports, modular uplink Switch 2 $ 16,526.00 33,052.00"
+    ITEM_PATTERN = re.compile(r'#(\d+)\s+([A-Z0-9\-/=]+)\s+([^\n]+?)\s+(\d+)\s+\$\s+([0-9,.]+)\s+([0-9,.]+)')
+    ITEM_LINE = re.compile(r'^#(\d+)')
+    ITEM_LINE_END = re.compile(r'(\d+)\s+\$\s+([0-9,.]+)\s+([0-9,.]+)$')
+
+    def matches(self, first_page: str) -> bool:
+        first_page = first_page.lower()
+        return any(pattern.search(first_page) for pattern in GenericPDFExtractor.compiled_supplier_patterns["cisco"])
+
+    def parse(self, document: QuoteDocument) -> Dict[str, Any]:
+        text = document.text()
+        generic_info = GenericQuoteParser.extractor.extract_header_info(text)
+        info = {key: value for key, value in generic_info.items() if key in self.GENERIC_INFO}
+        for key, pattern in self.INFO_PATTERNS.items():
+            match = pattern.search(text)
+            if match:
+                info[key] = match.group(1).strip()
+                logger.info(f"{key} trouvé: {info[key]}")
+
+        totals = {}
+        for key, pattern in self.TOTAL_PATTERNS.items():
+            match = pattern.search(text)
+            amount = _amount(match.group(1)) if match else None
+            if amount is not None:
+                totals[key] = amount
+
+        return {
+            "vendor": self.vendor,
+            "supplier": "cisco",
+            "info": info,
+            "items": self.find_items(document),
+            "totals": totals
+        }
+
+    def find_items(self, document: QuoteDocument) -> List[Dict[str, Any]]:
+        items = []
+        for match in self.ITEM_PATTERN.finditer(document.text()):
+            ref_num, pn, description, qty_str, unit_price_str, total_price_str = match.groups()
+            unit_price, total_price = _amount(unit_price_str), _amount(total_price_str)
+            if unit_price is None or total_price is None:
+                logger.warning(f"Prix illisible pour {pn}")
+                continue
+            items.append(quote_item(
+                ref_num, pn.strip(), description.strip(), int(qty_str), unit_price, total_price, "Cisco", "USD"
+            ))
+
+        # Approche alternative: lignes commençant par "#xx", quantité et prix en fin de ligne
+        if not items:
+            for line in document.lines:
+                ref_match = self.ITEM_LINE.match(line)
+                parts = line.split()
+                if not ref_match or len(parts) < 3:
+                    continue
+                pn = parts[1]
+                remaining = line[line.find(pn) + len(pn):].strip()
+                end_match = self.ITEM_LINE_END.search(remaining)
+                if not end_match:
+                    continue
+                unit_price, total_price = _amount(end_match.group(2)), _amount(end_match.group(3))
+                if unit_price is None or total_price is None:
+                    continue
+                description = remaining[:remaining.rfind(end_match.group(0))].strip()
+                items.append(quote_item(
+                    ref_match.group(1), pn, description, int(end_match.group(1)), unit_price, total_price, "Cisco", "USD"
+                ))
+        return items
+
+
+class CiscoPriceQuotationParser(CiscoQuoteParser):
+    """
+    Devis Cisco "Price Quotation": lignes "1.0 PN SOUTHCOM prix qté total",
+    description sur la ligne qui suit le PN.
+    """
+    vendor = "cisco_price_quotation"
+
+    ITEM_PATTERNS = [
+        re.compile(r'(\d+\.\d+)\s+([A-Z0-9\-/]+)\s+SOUTHCOM(?:[^0-9]+)([0-9,.]+)?\s+(\d+)\s+([0-9,.]+)?'),
+        # Autre distributeur que SOUTHCOM
+        re.compile(r'(\d+\.\d+)\s+([A-Z0-9\-/]+)\s+.*?([0-9,.]+)?\s+(\d+)\s+([0-9,.]+)?'),
+    ]
+    # Recherche des numéros de pièce dans tout le texte (dernier recours)
+    FALLBACK_PN = re.compile(r'([A-Z0-9][\w\-/]{4,}(?:-[A-Z0-9]{1,5})?(?:=)?)')
+    FALLBACK_PN_SHAPE = re.compile(r'^[A-Z][A-Z0-9\-]+$')
+    FALLBACK_QTY = re.compile(r'(\d+)\s+(?:[0-9,.]+)')
+    FALLBACK_PRICE = re.compile(r'([0-9,.]+)\s+\d+\s+[0-9,.]+')
+
+    def matches(self, first_page: str) -> bool:
+        return "Price Quotation" in first_page and "Cisco" in first_page
+
+    def find_items(self, document: QuoteDocument) -> List[Dict[str, Any]]:
+        text = document.text()
+        for pattern in self.ITEM_PATTERNS:
+            items = []
+            for match in pattern.finditer(text):
+                item_number, pn, unit_price_str, qty_str, _ = match.groups()
+                pn = pn.strip()
+                qty = int(qty_str) if qty_str else 1
+                unit_price = (_amount(unit_price_str) or 0.0) if unit_price_str else 0.0
+                if unit_price > 0 and qty > 0:
+                    # Description: index des lignes construit une fois pour tout le texte
+                    description = document.descriptions.description(pn, default=pn)
+                    items.append(quote_item(item_number, pn, description, qty, unit_price, brand="Cisco", currency="USD"))
+            if items:
+                return items
+
+        logger.info("Fallback: recherche alternative")
+        return self.fallback_items(text)
+
+    def fallback_items(self, text: str) -> List[Dict[str, Any]]:
+        """Numéros de pièce du texte, quantité et prix cherchés autour."""
+        items = []
+        seen = set()
+        for match in self.FALLBACK_PN.finditer(text):
+            pn = match.group(1)
+            if pn in seen or not self.FALLBACK_PN_SHAPE.match(pn):
+                continue
+
+            context = text[max(0, match.start() - 100):min(len(text), match.end() + 200)]
+            qty_match = self.FALLBACK_QTY.search(context)
+            qty = int(qty_match.group(1)) if qty_match else 1
+            price_match = self.FALLBACK_PRICE.search(context)
+            unit_price = (_amount(price_match.group(1)) or 0.0) if price_match else 0.0
+            desc_match = re.search(f"{re.escape(pn)}[^A-Z0-9\n]*\n([^\n]+)", context)
+            description = desc_match.group(1).strip() if desc_match else pn
+
+            if unit_price > 0 and qty > 0:
+                seen.add(pn)
+                items.append(quote_item(str(len(items) + 1), pn, description, qty, unit_price, brand="Cisco", currency="USD"))
+        return items
+
+
+# Ordre de détection: du format le plus précis au plus large
+register_quote_parser(CiscoPriceQuotationParser())
+register_quote_parser(CiscoQuoteParser())
+register_quote_parser(GenericQuoteParser())
+
+
+def detect_quote_parser(document: QuoteDocument, default_vendor: str = GENERIC_VENDOR) -> QuoteParser:
+    """
+    Parser du premier format reconnu sur la première page, default_vendor sinon.
+    """
+    first_page = document.first_page
+    for parser in QUOTE_PARSERS.values():
+        if parser.matches(first_page):
+            logger.info(f"Format de devis détecté: {parser.vendor}")
+            return parser
+    logger.info(f"Format de devis non reconnu, parser {default_vendor}")
+    return QUOTE_PARSERS[default_vendor]
+
+
+def extract_quote(document: QuoteDocument, default_vendor: str = GENERIC_VENDOR) -> Dict[str, Any]:
+    """
+    Devis au format commun (voir le module).
+
+    Args:
+        document: Devis PDF (QuoteDocument(contenu ou chemin))
+        default_vendor: Parser utilisé si aucun format n'est reconnu
+
+    Returns:
+        {"vendor", "supplier", "info", "items", "totals"}
+    """
+    parser = detect_quote_parser(document, default_vendor)
+    quote = parser.parse(document)
+    if not quote["items"] and parser.vendor != GENERIC_VENDOR:
+        logger.info(f"Aucun article trouvé ({parser.vendor}), méthodes génériques")
+        generic = QUOTE_PARSERS[GENERIC_VENDOR]
+        # Fournisseur de la première page: le parser peut avoir été choisi par défaut
+        quote["items"] = generic.find_items(document, generic.extractor.detect_supplier(document.first_page))
+    logger.info(f"Devis {parser.vendor}: {len(quote['items'])} articles")
+    return quote
+
+
+def quote_identity(quote: Dict[str, Any]) -> Dict[str, Optional[str]]:
+    """
+    Numéro de devis, client et projet utilisables pour créer un devis. Pour un
+    format inconnu, seul le numéro de devis (vérifié par GenericQuoteParser)
+    est gardé: le motif générique du client est trop large pour servir de nom.
+    """
+    info = quote["info"]
+    if quote["vendor"] == GENERIC_VENDOR:
+        return {"quote_id": info.get("quote_id"), "client": None, "project": None}
+    return {key: info.get(key) for key in ("quote_id", "client", "project")}
@@ -0,0 +1,394 @@
+"""
+Motifs des devis PDF: détection du fournisseur, en-tête, articles et totaux
+(GenericPDFExtractor), motifs précompilés et cherchés à partir de leurs
+mots-clés (FieldScanner).
+
+Utilisé par le moteur d'extraction des devis (utils/quote_extraction.py).
+"""
+from typing import Any, Dict, List, Optional
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+# Découpage des lignes de tableau (extract_items_from_tables)
+DIGITS = re.compile(r'\d+')
+LETTERS = re.compile(r'[A-Za-z]')
+COLUMN_GAP = re.compile(r'\s{2,}')
+INTEGER = re.compile(r'^\d+$')
+AMOUNT = re.compile(r'^[\d\.,]+$')
+
+# Caractères que re.IGNORECASE rapproche d'une lettre ASCII mais que lower() ne ramène pas à celle-ci
+CASE_FIXES = str.maketrans({"\u0130": "i", "\u0131": "i", "\u017f": "s", "\u212a": "k"})
+
+def fold_case(text: str) -> str:
+    """Minuscules avec les équivalences de re.IGNORECASE (pour comparer des mots-clés)."""
+    return text.translate(CASE_FIXES).lower()
+
+class FieldScanner:
+    """
+    Premier résultat de chaque champ d'un texte, motifs compilés une seule fois.
+
+    Chaque champ a plusieurs motifs par ordre de priorité; le premier motif qui
+    correspond quelque part dans le texte l'emporte (comme une suite de re.search).
+    La plupart des motifs commencent par une alternative de mots-clés
+    littéraux, (?:Quote|Devis|...): chaque mot-clé est cherché une fois
+    (str.find sur le texte en minuscules), et le motif n'est cherché qu'à partir
+    de la première occurrence de l'un de ses mots-clés, ou pas du tout si aucun
+    n'apparaît.
+    """
+
+    def __init__(self, fields: Dict[str, List[str]], flags: int = 0):
+        self.fields = {
+            key: [(re.compile(pattern, flags), _leading_keywords(pattern)) for pattern in patterns]
+            for key, patterns in fields.items()
+        }
+
+    def scan(self, text: str) -> Dict[str, str]:
+        """
+        Valeur (premier groupe, sans espaces autour) de chaque champ trouvé.
+        """
+        folded = fold_case(text)
+        # fold_case garde la longueur du texte: mêmes positions que dans text
+        aligned = len(folded) == len(text)
+        positions: Dict[str, int] = {}
+        found = {}
+        for key, alternatives in self.fields.items():
+            for pattern, keywords in alternatives:
+                start = 0
+                if keywords is not None and aligned:
+                    for keyword in keywords:
+                        if keyword not in positions:
+                            positions[keyword] = folded.find(keyword)
+                    starts = [positions[keyword] for keyword in keywords if positions[keyword] >= 0]
+                    if not starts:
+                        continue
+                    start = min(starts)
+                match = pattern.search(text, start)
+                if match:
+                    found[key] = match.group(1).strip()
+                    break
+        return found
+
+
+def _leading_keywords(pattern: str) -> Optional[List[str]]:
+    """
+    Mots-clés littéraux de l'alternative (?:A|B|...) qui commence le motif
+    (voir fold_case), None si le motif ne commence pas par des littéraux.
+    """
+    match = re.match(r'\(\?:([^()\[\]]+)\)', pattern)
+    if not match or re.search(r'\\[A-Za-z0-9]', match.group(1)):
+        return None
+    keywords = [re.sub(r'\\(.)', r'\1', keyword) for keyword in match.group(1).split('|')]
+    if any(not keyword or re.search(r'[.^$*+?{}\[\]|()\\]', keyword) for keyword in keywords):
+        return None
+    return [fold_case(keyword) for keyword in keywords]
+
+
+class GenericPDFExtractor:
+    """Extracteur générique pour les devis PDF de différents fournisseurs"""
+
+    # Motifs compilés une fois, au chargement de la classe (voir FieldScanner)
+    common_patterns = {
+        'quote_id': [
+            r'(?:Quote|Devis|Quotation|Reference)[\s#]*(?:ID|Number|N°|Ref|No)[:\s]*([A-Z0-9\-_]+)',
+            r'(?:Quote|Devis|Quotation|Reference)[:\s]*([A-Z0-9\-_]+)',
+            r'(?:ID|Number|N°|Ref|No)[:\s]*([A-Z0-9\-_]+)'
+        ],
+        'date': [
+            r'(?:Date|Date de création)[:\s]*(\d{1,2}[\/\-\.]\d{1,2}[\/\-\.]\d{2,4})',
+            r'(?:Date|Date de création)[:\s]*(\d{1,2}[\s\-]+[A-Za-zéû]+[\s\-]+\d{2,4})'
+        ],
+        'expiration': [
+            r'(?:Expiration|Validité|Valid until|Expiry)[:\s]*(\d{1,2}[\/\-\.]\d{1,2}[\/\-\.]\d{2,4})',
+            r'(?:Expiration|Validité|Valid until|Expiry)[:\s]*(\d{1,2}[\s\-]+[A-Za-zéû]+[\s\-]+\d{2,4})'
+        ],
+        'client': [
+            r'(?:Client|Customer|End Customer|Client final)[:\s]*([A-Za-z0-9\s\-&\.]+)',
+            r'(?:Bill To|Facturer à)[:\s]*([A-Za-z0-9\s\-&\.]+)'
+        ],
+        'contact': [
+            r'(?:Contact|Attention|A l\'attention de)[:\s]*([A-Za-z0-9\s\-\.]+)',
+            r'(?:Name|Nom)[:\s]*([A-Za-z0-9\s\-\.]+)'
+        ],
+        'email': [
+            r'(?:Email|E-mail|Courriel)[:\s]*([a-zA-Z0-9._%+\-]+@[a-zA-Z0-9.\-]+\.[a-zA-Z]{2,})',
+            r'([a-zA-Z0-9._%+\-]+@[a-zA-Z0-9.\-]+\.[a-zA-Z]{2,})'
+        ],
+        'phone': [
+            r'(?:Phone|Tel|Téléphone|Telephone)[:\s]*([0-9+\-\.$$$$\s]{7,20})',
+            r'(?:Mobile|Portable|Cell)[:\s]*([0-9+\-\.$$$$\s]{7,20})'
+        ],
+        'currency': [
+            r'(?:Currency|Devise|Monnaie)[:\s]*([A-Z]{3})',
+            r'(?:Currency|Devise|Monnaie)[:\s]*([A-Za-zé]{3,})'
+        ],
+        'total': [
+            r'(?:Total|Montant total|Total Amount)[:\s]*(?:[A-Z]{3})?[\s]*([0-9\s\.,]+)',
+            r'(?:Total|Montant total|Total Amount)[:\s]*(?:[$€£])?[\s]*([0-9\s\.,]+)'
+        ],
+        'subtotal': [
+            r'(?:Subtotal|Sous-total|Sub-Total)[:\s]*(?:[A-Z]{3})?[\s]*([0-9\s\.,]+)',
+            r'(?:Subtotal|Sous-total|Sub-Total)[:\s]*(?:[$€£])?[\s]*([0-9\s\.,]+)'
+        ],
+        'tax': [
+            r'(?:Tax|Taxe|TVA|VAT)[:\s]*(?:[0-9]{1,2}%)?[\s]*(?:[A-Z]{3})?[\s]*([0-9\s\.,]+)',
+            r'(?:Tax|Taxe|TVA|VAT)[:\s]*(?:[0-9]{1,2}%)?[\s]*(?:[$€£])?[\s]*([0-9\s\.,]+)'
+        ]
+    }
+
+    # Patterns pour détecter le fournisseur
+    supplier_patterns = {
+        'cisco': [r'cisco', r'CISCO SYSTEMS'],
+        'hp': [r'hewlett[\s\-]*packard', r'hp inc', r'hp enterprise'],
+        'dell': [r'dell', r'dell technologies', r'dell emc'],
+        'ibm': [r'ibm', r'international business machines'],
+        'lenovo': [r'lenovo'],
+        'microsoft': [r'microsoft'],
+        'oracle': [r'oracle'],
+        'vmware': [r'vmware'],
+        'juniper': [r'juniper networks'],
+        'fortinet': [r'fortinet'],
+        'palo_alto': [r'palo alto networks'],
+        'huawei': [r'huawei']
+    }
+
+    # Patterns pour les tableaux d'articles
+    item_patterns = {
+        "generic": [
+            # Format: référence, description, quantité, prix unitaire, prix total
+            r'([A-Z0-9\-_]+)[\s\t]+([A-Za-z0-9\s\-\.,;\/$$$$]+)[\s\t]+(\d+)[\s\t]+([0-9\s\.,]+)[\s\t]+([0-9\s\.,]+)',
+            # Format: numéro, référence, description, quantité, prix unitaire, prix total
+            r'(\d+)[\s\t]+([A-Z0-9\-_]+)[\s\t]+([A-Za-z0-9\s\-\.,;\/$$$$]+)[\s\t]+(\d+)[\s\t]+([0-9\s\.,]+)[\s\t]+([0-9\s\.,]+)'
+        ],
+        'cisco': [
+            r'#(\d+)\s+([A-Z0-9\-/=]+)\s+([^\n]+?)\s+(\d+)\s+\$\s+([0-9,.]+)\s+([0-9,.]+)'
+        ],
+        'hp': [
+            r'(\d+)\s+([A-Z0-9\-]+)\s+([^\n]+?)\s+(\d+)\s+([0-9,.]+)\s+([0-9,.]+)'
+        ]
+    }
+
+    # Totaux du devis (premier motif trouvé pour chaque montant)
+    total_patterns = {
+        'subtotal': [r'(?:Subtotal|Sous-total|Sub-Total)[:\s]*(?:[A-Z]{3})?[\s]*([0-9\s\.,]+)'],
+        'tax': [r'(?:Tax|Taxe|TVA|VAT)[:\s]*(?:[0-9]{1,2}%)?[\s]*(?:[A-Z]{3})?[\s]*([0-9\s\.,]+)'],
+        'shipping': [r'(?:Shipping|Livraison|Delivery|Transport)[:\s]*(?:[A-Z]{3})?[\s]*([0-9\s\.,]+)'],
+        'total': [r'(?:Total|Montant total|Total Amount)[:\s]*(?:[A-Z]{3})?[\s]*([0-9\s\.,]+)']
+    }
+
+    header_scanner = FieldScanner(common_patterns, re.IGNORECASE | re.MULTILINE)
+    total_scanner = FieldScanner(total_patterns, re.IGNORECASE)
+    compiled_supplier_patterns = {
+        supplier: [re.compile(pattern) for pattern in patterns]
+        for supplier, patterns in supplier_patterns.items()
+    }
+    compiled_item_patterns = {
+        supplier: [re.compile(pattern, re.MULTILINE) for pattern in patterns]
+        for supplier, patterns in item_patterns.items()
+    }
+
+    def detect_supplier(self, text: str) -> str:
+        """Détecte le fournisseur à partir du texte du PDF"""
+        text_lower = text.lower()
+        
+        for supplier, patterns in self.compiled_supplier_patterns.items():
+            for pattern in patterns:
+                if pattern.search(text_lower):
+                    logger.info(f"Fournisseur détecté: {supplier}")
+                    return supplier
+        
+        logger.info("Fournisseur non détecté, utilisation du mode générique")
+        return "generic"
+
+    def extract_header_info(self, text: str) -> Dict[str, Any]:
+        """Extrait les informations d'en-tête du devis"""
+        info = self.header_scanner.scan(text)
+        for key, value in info.items():
+            logger.debug(f"Trouvé {key}: {value}")
+        
+        return info
+
+    def extract_line_items(self, text: str, supplier: str = "generic") -> List[Dict[str, Any]]:
+        """Extrait les éléments de ligne du devis"""
+        items = []
+        
+        # Utiliser les patterns spécifiques au fournisseur s'ils existent, sinon utiliser les génériques
+        patterns = self.compiled_item_patterns.get(supplier, self.compiled_item_patterns['generic'])
+        
+        for pattern in patterns:
+            matches = pattern.finditer(text)
+            
+            for match in matches:
+                try:
+                    if supplier == "cisco" and len(match.groups()) == 6:
+                        ref_num, pn, description, qty_str, unit_price_str, total_price_str = match.groups()
+                        
+                        # Nettoyer et convertir les valeurs
+                        qty = int(qty_str)
+                        unit_price = float(unit_price_str.replace(',', '').replace(' ', ''))
+                        total_price = float(total_price_str.replace(',', '').replace(' ', ''))
+                        
+                        items.append({
+                            'line_number': ref_num,
+                            'part_number': pn.strip(),
+                            'description': description.strip(),
+                            'quantity': qty,
+                            'unit_price': unit_price,
+                            'total_price': total_price,
+                            'currency': 'USD',  # Par défaut pour Cisco
+                            'brand': 'Cisco',
+                            'supplier': 'Cisco'
+                        })
+                    
+                    elif supplier == "hp" and len(match.groups()) == 6:
+                        item_num, pn, description, qty_str, unit_price_str, total_price_str = match.groups()
+                        
+                        # Nettoyer et convertir les valeurs
+                        qty = int(qty_str)
+                        unit_price = float(unit_price_str.replace(',', '').replace(' ', ''))
+                        total_price = float(total_price_str.replace(',', '').replace(' ', ''))
+                        
+                        items.append({
+                            'line_number': item_num,
+                            'part_number': pn.strip(),
+                            'description': description.strip(),
+                            'quantity': qty,
+                            'unit_price': unit_price,
+                            'total_price': total_price,
+                            'currency': 'USD',  # Par défaut pour HP
+                            'brand': 'HP',
+                            'supplier': 'HP'
+                        })
+                    
+                    elif len(match.groups()) == 5:  # Format générique 1
+                        pn, description, qty_str, unit_price_str, total_price_str = match.groups()
+                        
+                        # Nettoyer et convertir les valeurs
+                        qty = int(qty_str)
+                        unit_price = float(unit_price_str.replace(',', '').replace(' ', ''))
+                        total_price = float(total_price_str.replace(',', '').replace(' ', ''))
+                        
+                        items.append({
+                            'line_number': str(len(items) + 1),
+                            'part_number': pn.strip(),
+                            'description': description.strip(),
+                            'quantity': qty,
+                            'unit_price': unit_price,
+                            'total_price': total_price,
+                            'currency': 'USD',  # Par défaut
+                            'brand': supplier.capitalize(),
+                            'supplier': supplier.capitalize()
+                        })
+                    
+                    elif len(match.groups()) == 6:  # Format générique 2
+                        item_num, pn, description, qty_str, unit_price_str, total_price_str = match.groups()
+                        
+                        # Nettoyer et convertir les valeurs
+                        qty = int(qty_str)
+                        unit_price = float(unit_price_str.replace(',', '').replace(' ', ''))
+                        total_price = float(total_price_str.replace(',', '').replace(' ', ''))
+                        
+                        items.append({
+                            'line_number': item_num,
+                            'part_number': pn.strip(),
+                            'description': description.strip(),
+                            'quantity': qty,
+                            'unit_price': unit_price,
+                            'total_price': total_price,
+                            'currency': 'USD',  # Par défaut
+                            'brand': supplier.capitalize(),
+                            'supplier': supplier.capitalize()
+                        })
+                except (ValueError, IndexError) as e:
+                    logger.warning(f"Erreur lors de l'extraction d'un élément: {e}")
+                    continue
+        
+        # Si aucun élément n'a été trouvé avec les patterns, essayer d'extraire des tableaux
+        if not items:
+            logger.info("Aucun élément trouvé avec les patterns, tentative d'extraction de tableaux")
+            items = self.extract_items_from_tables(text)
+        
+        return items
+
+    def extract_items_from_tables(self, text: str) -> List[Dict[str, Any]]:
+        """Tente d'extraire des éléments à partir de tableaux dans le texte"""
+        items = []
+        
+        # Rechercher des lignes qui ressemblent à des éléments de tableau
+        lines = text.split('\n')
+        for i, line in enumerate(lines):
+            # Ignorer les lignes trop courtes
+            if len(line.strip()) < 10:
+                continue
+            
+            # Rechercher des lignes qui contiennent des chiffres et des lettres
+            if DIGITS.search(line) and LETTERS.search(line):
+                # Diviser la ligne en colonnes en fonction des espaces
+                columns = COLUMN_GAP.split(line.strip())
+                
+                # Vérifier si nous avons suffisamment de colonnes (au moins 4)
+                if len(columns) >= 4:
+                    try:
+                        # Essayer de trouver les colonnes qui contiennent des nombres
+                        qty_col = None
+                        price_cols = []
+                        
+                        for j, col in enumerate(columns):
+                            if INTEGER.match(col.strip()):
+                                qty_col = j
+                            elif AMOUNT.match(col.strip().replace('$', '').replace('€', '')):
+                                price_cols.append(j)
+                        
+                        # Si nous avons trouvé une colonne de quantité et au moins une colonne de prix
+                        if qty_col is not None and len(price_cols) >= 1:
+                            # Déterminer la colonne de référence (généralement la première)
+                            ref_col = 0
+                            
+                            # Déterminer la colonne de description (généralement entre la référence et la quantité)
+                            desc_col = 1
+                            
+                            # Déterminer les colonnes de prix unitaire et total
+                            unit_price_col = price_cols[0]
+                            total_price_col = price_cols[-1] if len(price_cols) > 1 else price_cols[0]
+                            
+                            # Extraire les valeurs
+                            part_number = columns[ref_col].strip()
+                            description = columns[desc_col].strip()
+                            quantity = int(columns[qty_col].strip())
+                            
+                            # Nettoyer et convertir les prix
+                            unit_price_str = columns[unit_price_col].strip().replace("$", "").replace("€", "")
+                            unit_price = float(unit_price_str.replace(",", "").replace(" ", ""))
+                            
+                            total_price_str = columns[total_price_col].strip().replace("$", "").replace("€", "")
+                            total_price = float(total_price_str.replace(",", "").replace(" ", ""))
+                            
+                            items.append({
+                                'line_number': str(len(items) + 1),
+                                'part_number': part_number,
+                                'description': description,
+                                'quantity': quantity,
+                                'unit_price': unit_price,
+                                'total_price': total_price,
+                                'currency': 'USD',  # Par défaut
+                                'brand': 'Unknown',
+                                'supplier': 'Unknown'
+                            })
+                    except (ValueError, IndexError) as e:
+                        logger.warning(f"Erreur lors de l'extraction d'un élément de tableau: {e}")
+                        continue
+        
+        return items
+
+    def extract_totals(self, text: str) -> Dict[str, float]:
+        """Extrait les totaux du devis (sous-total, TVA, livraison, total)"""
+        totals = {}
+        
+        for key, value in self.total_scanner.scan(text).items():
+            try:
+                totals[key] = float(value.replace(' ', '').replace(',', '.'))
+            except ValueError:
+                pass
+        
+        return totals
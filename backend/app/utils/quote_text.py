@@ -0,0 +1,70 @@
+"""
+Index des lignes du texte d'un devis PDF (Cisco): description d'un numéro de pièce.
+
+La description d'un article est la ligne qui suit la première ligne du texte
+où le numéro de pièce (PN) apparaît sans autre chiffre ni majuscule après
+lui, ce que donnait la recherche
+
+    re.search(re.escape(pn) + r"[^A-Z0-9\n]*\n([^\n]+)", text)
+
+lancée pour chaque article (tout le texte relu à chaque fois). Ici le texte
+est découpé une seule fois: chaque ligne suivie d'une ligne non vide est
+indexée par son dernier mot de PN ([A-Z0-9-/]), sous les suffixes de ce mot
+d'au plus MAX_INDEXED_PN caractères, et la recherche d'un PN est une lecture
+de dictionnaire. L'index reste linéaire en taille de texte même avec de longs
+mots (références, URL); un PN plus long que MAX_INDEXED_PN, rare, est cherché
+directement dans le texte.
+"""
+from typing import Dict, List, Optional, Tuple
+import re
+
+_PN_TOKEN = re.compile(r"[A-Z0-9\-/]+")
+# Caractères d'un PN qui peuvent suivre le PN sur sa ligne
+_TRAILING = "-/"
+# Longueur maximale (sans -/ finaux) des PN indexés: les PN Cisco en font moins de 30
+MAX_INDEXED_PN = 40
+
+
+class DescriptionIndex:
+    """
+    Descriptions des numéros de pièce d'un texte, indexées en un seul passage.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        # Fin du PN (sans -/ finaux) -> [(-/ qui suivent sur la ligne, ligne suivante)], dans l'ordre du texte
+        self._entries: Dict[str, List[Tuple[str, str]]] = {}
+
+        lines = text.split("\n")
+        for line, following in zip(lines, lines[1:]):
+            if not following:
+                continue
+            # Dernier mot contenant un chiffre ou une majuscule: un PN suivi de
+            # la fin de ligne sans chiffre ni majuscule se termine dans ce mot
+            token = next(
+                (token for token in reversed(_PN_TOKEN.findall(line)) if token.strip(_TRAILING)),
+                None
+            )
+            if token is None:
+                continue
+            core = token.rstrip(_TRAILING)
+            entry = (token[len(core):], following.strip())
+            for start in range(max(0, len(core) - MAX_INDEXED_PN), len(core)):
+                self._entries.setdefault(core[start:], []).append(entry)
+
+    def description(self, pn: str, default: Optional[str] = None) -> Optional[str]:
+        """
+        Description (ligne suivante, sans espaces autour) du PN, default si absente.
+        """
+        core = pn.rstrip(_TRAILING)
+        if not core or len(core) > MAX_INDEXED_PN:
+            # PN sans chiffre ni majuscule ("-", "/") ou plus long que les
+            # suffixes indexés: recherche directe
+            match = re.search(f"{re.escape(pn)}[^A-Z0-9\n]*\n([^\n]+)", self.text)
+            return match.group(1).strip() if match else default
+
+        trailing = pn[len(core):]
+        for line_trailing, description in self._entries.get(core, ()):
+            if line_trailing.startswith(trailing):
+                return description
+        return default
@@ -0,0 +1,369 @@
+"""
+Recalcul en masse des frais de transport enregistrés après un changement de grille DHL.
+
+Les lignes dont la version tarifaire diffère de la grille active sont lues en
+flux (yield_per, par paquets ordonnés par id), recalculées par appels vectorisés
+au calculateur, puis réécrites par UPDATE groupés, une transaction par paquet.
+
+Après chaque paquet validé, un point de reprise (dernier id traité par table)
+est écrit sur disque: un job interrompu reprend là où il s'était arrêté.
+En mode simulation (dry_run), rien n'est écrit et le job rapporte l'évolution
+des totaux.
+"""
+from datetime import datetime
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+import ast
+import json
+import logging
+import threading
+import time
+import uuid
+
+from sqlalchemy import case, func, or_, select, update
+
+from .. import models
+from . import tariff_store
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_FILE = tariff_store.CACHE_DIR / "repricing-checkpoint.json"
+DEFAULT_CHUNK_SIZE = 1000
+MAX_ERROR_SAMPLES = 20
+
+
+class RepricingTarget(NamedTuple):
+    model: Any
+    weight_column: str
+    cost_column: str  # Coût en MAD
+    has_legs: bool
+    legs_format: Optional[str]  # "json" ou "repr" (str() d'une liste Python)
+    devis_currency: bool  # Coût converti dans la devise du devis
+    # Poids effectif enregistré, repris tel quel pour les lignes sans dimensions
+    # (poids facturable agrégé des lignes du devis, volumétrique compris)
+    effective_weight_column: Optional[str] = None
+
+
+TARGETS: Dict[str, RepricingTarget] = {
+    "shipping_info": RepricingTarget(models.ShippingInfo, "weight_kg", "shipping_cost", False, None, False),
+    "product_shipping_info": RepricingTarget(models.ProductShippingInfo, "weight_kg", "shipping_cost", True, "repr", False),
+    "devis_shipping": RepricingTarget(
+        models.DevisShipping, "total_weight_kg", "shipping_cost_mad", True, "json", True, "effective_weight_kg"
+    ),
+}
+
+_job: Optional[Dict[str, Any]] = None
+_job_lock = threading.Lock()
+
+
+def _select_rows(target: RepricingTarget, tariff_version: str, after_id: int, only_stale: bool):
+    model = target.model
+    weight = getattr(model, target.weight_column)
+    if target.effective_weight_column:
+        # Sans dimensions, le volumétrique ne peut pas être recalculé: celui
+        # compris dans le poids effectif enregistré est conservé
+        weight = case(
+            (or_(model.dimensions.is_(None), model.dimensions == ""),
+             func.coalesce(getattr(model, target.effective_weight_column), weight)),
+            else_=weight
+        )
+    columns = [
+        model.id,
+        weight.label("weight_kg"),
+        model.dimensions,
+        model.destination_country,
+        model.direction,
+        model.premium_service,
+        getattr(model, target.cost_column).label("old_cost_mad"),
+    ]
+    if target.has_legs:
+        columns += [model.is_multi_leg, model.legs_data]
+    if target.devis_currency:
+        columns.append(models.DevisOddnet.currency)
+
+    query = select(*columns).where(model.id > after_id)
+    if target.devis_currency:
+        query = query.outerjoin(models.DevisOddnet, models.DevisOddnet.id == model.devis_id)
+    if only_stale:
+        query = query.where(or_(model.tariff_version.is_(None), model.tariff_version != tariff_version))
+    return query.order_by(model.id)
+
+
+def _parse_legs(legs_data: Optional[str], legs_format: Optional[str]) -> List[Dict[str, Any]]:
+    if not legs_data:
+        return []
+    legs = json.loads(legs_data) if legs_format == "json" else ast.literal_eval(legs_data)
+    if not isinstance(legs, list):
+        raise ValueError("Étapes enregistrées illisibles")
+    return legs
+
+
+def price_rows(calculator, rows: List[Any], target: RepricingTarget) -> List[Dict[str, Any]]:
+    """
+    Recalcule un paquet de lignes (mêmes règles que les endpoints de calcul).
+
+    Returns:
+        Pour chaque ligne: {"cost", "zone", "effective_weight", "error"}
+        (zone None = zone inchangée, pour les envois multi-étapes)
+    """
+    priced: List[Dict[str, Any]] = [None] * len(rows)
+    # direction -> [(position, poids effectif, zone, service premium)]
+    singles: Dict[str, List[Tuple[int, float, int, Optional[str]]]] = {"export": [], "import": []}
+
+    for position, row in enumerate(rows):
+        try:
+            if not row.weight_kg or row.weight_kg <= 0:
+                raise ValueError("Poids manquant")
+            dims = calculator.parse_dimensions(row.dimensions) if row.dimensions else None
+
+            if target.has_legs and row.is_multi_leg and row.legs_data:
+                result = calculator.calculate_multi_leg_shipping(
+                    legs=_parse_legs(row.legs_data, target.legs_format),
+                    weight_kg=row.weight_kg,
+                    dimensions=dims,
+                    premium_service=row.premium_service
+                )
+                leg_errors = [leg["error"] for leg in result["legs"] if "error" in leg]
+                if leg_errors:
+                    raise ValueError("; ".join(leg_errors))
+                priced[position] = {
+                    "cost": result["total_cost"],
+                    "zone": None,
+                    "effective_weight": result["effective_weight"],
+                    "error": None
+                }
+                continue
+
+            direction = row.direction or "export"
+            if direction not in singles:
+                raise ValueError(f"Direction invalide: {direction}")
+            effective_weight = calculator.get_effective_weight(row.weight_kg, *dims) if dims else row.weight_kg
+            zone = calculator.get_zone_for_country(row.destination_country, direction)
+            singles[direction].append((position, effective_weight, zone, row.premium_service))
+
+        except Exception as e:
+            priced[position] = {"cost": None, "zone": None, "effective_weight": None, "error": str(e)}
+
+    # Un seul appel vectorisé par direction
+    for direction, entries in singles.items():
+        if not entries:
+            continue
+        positions, weights, zones, premiums = zip(*entries)
+        costs = calculator.calculate_shipping_cost_for_zone(weights, zones, direction, premiums)
+        for position, weight, zone, cost in zip(positions, weights, zones, costs):
+            priced[position] = {"cost": float(cost), "zone": int(zone), "effective_weight": weight, "error": None}
+
+    return priced
+
+
+def _update_values(target: RepricingTarget, row: Any, price: Dict[str, Any], tariff_version: str,
+                   now: datetime, convert_currency: Callable[[float, str], float]) -> Dict[str, Any]:
+    values = {
+        "id": row.id,
+        target.cost_column: price["cost"],
+        "tariff_version": tariff_version,
+        "calculated_at": now,
+    }
+    if price["zone"] is not None:
+        values["shipping_zone"] = price["zone"]
+    if target.devis_currency:
+        values["shipping_cost"] = convert_currency(price["cost"], row.currency or "MAD")
+        values["effective_weight_kg"] = price["effective_weight"]
+    return values
+
+
+def _new_job(tariff_version: str, dry_run: bool, only_stale: bool, chunk_size: int) -> Dict[str, Any]:
+    return {
+        "job_id": uuid.uuid4().hex,
+        "tariff_version": tariff_version,
+        "dry_run": dry_run,
+        "only_stale": only_stale,
+        "chunk_size": chunk_size,
+        "status": "running",
+        "started_at": datetime.now().isoformat(),
+        "finished_at": None,
+        "error": None,
+        "targets": {
+            name: {
+                "last_id": 0,
+                "total": None,
+                "processed": 0,
+                "updated": 0,
+                "changed": 0,
+                "errors": 0,
+                "old_total_mad": 0.0,
+                "new_total_mad": 0.0,
+                "error_samples": [],
+            }
+            for name in TARGETS
+        },
+    }
+
+
+def read_checkpoint() -> Optional[Dict[str, Any]]:
+    try:
+        return json.loads(CHECKPOINT_FILE.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def _write_checkpoint(job: Dict[str, Any]) -> None:
+    CHECKPOINT_FILE.parent.mkdir(parents=True, exist_ok=True)
+    tariff_store._atomic_write(CHECKPOINT_FILE, json.dumps(job, ensure_ascii=False, indent=2).encode("utf-8"))
+
+
+def _snapshot(job: Dict[str, Any]) -> Dict[str, Any]:
+    return json.loads(json.dumps(job))
+
+
+def job_status() -> Optional[Dict[str, Any]]:
+    """
+    État du job en cours ou du dernier job (à défaut, du point de reprise sur disque).
+    """
+    with _job_lock:
+        job = _snapshot(_job) if _job is not None else None
+    if job is None:
+        job = read_checkpoint()
+    if job is None:
+        return None
+
+    processed = sum(stats["processed"] for stats in job["targets"].values())
+    totals = [stats["total"] for stats in job["targets"].values()]
+    total = sum(totals) if all(value is not None for value in totals) else None
+    job["processed"] = processed
+    job["total"] = total
+    job["progress"] = round(processed / total, 4) if total else (1.0 if job["status"] == "completed" else 0.0)
+    for stats in job["targets"].values():
+        stats["old_total_mad"] = round(stats["old_total_mad"], 2)
+        stats["new_total_mad"] = round(stats["new_total_mad"], 2)
+        stats["delta_mad"] = round(stats["new_total_mad"] - stats["old_total_mad"], 2)
+    return job
+
+
+def start_repricing(
+    calculator,
+    session_factory,
+    convert_currency: Callable[[float, str], float],
+    dry_run: bool = False,
+    only_stale: bool = True,
+    resume: bool = True,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    background: bool = True
+) -> Dict[str, Any]:
+    """
+    Lance le recalcul des frais de transport enregistrés.
+
+    Args:
+        calculator: Calculateur DHL (grille cible)
+        session_factory: Fabrique de sessions SQLAlchemy (SessionLocal)
+        convert_currency: Conversion MAD -> devise du devis
+        dry_run: Simulation sans écriture (rapporte l'évolution des totaux)
+        only_stale: Ne recalculer que les lignes d'une autre version tarifaire
+        resume: Reprendre un job interrompu pour la même version tarifaire
+        chunk_size: Lignes par paquet (et par transaction)
+        background: Exécuter dans un thread (sinon, de façon synchrone)
+
+    Returns:
+        État initial du job
+
+    Raises:
+        RuntimeError: si un job est déjà en cours
+    """
+    global _job
+    with _job_lock:
+        if _job is not None and _job["status"] == "running":
+            raise RuntimeError(f"Un recalcul est déjà en cours ({_job['job_id']})")
+
+        job = None
+        if resume and not dry_run:
+            checkpoint = read_checkpoint()
+            if (
+                checkpoint
+                and checkpoint.get("status") != "completed"
+                and not checkpoint.get("dry_run")
+                and checkpoint.get("tariff_version") == calculator.tariff_version
+            ):
+                job = checkpoint
+                job.update(status="running", error=None, finished_at=None, chunk_size=chunk_size)
+                logger.info(f"Reprise du recalcul {job['job_id']} depuis le point de reprise")
+        if job is None:
+            job = _new_job(calculator.tariff_version, dry_run, only_stale, chunk_size)
+        _job = job
+        snapshot = _snapshot(job)
+
+    if background:
+        threading.Thread(
+            target=_run, args=(job, calculator, session_factory, convert_currency),
+            name=f"repricing-{job['job_id'][:8]}", daemon=True
+        ).start()
+    else:
+        _run(job, calculator, session_factory, convert_currency)
+        snapshot = job_status()
+    return snapshot
+
+
+def _run(job: Dict[str, Any], calculator, session_factory, convert_currency) -> None:
+    started = time.perf_counter()
+    reader = session_factory()
+    writer = session_factory()
+    try:
+        for name, target in TARGETS.items():
+            stats = job["targets"][name]
+            query = _select_rows(target, job["tariff_version"], stats["last_id"], job["only_stale"])
+            remaining = reader.execute(
+                select(func.count()).select_from(query.order_by(None).subquery())
+            ).scalar()
+            with _job_lock:
+                stats["total"] = stats["processed"] + remaining
+
+            result = reader.execute(query.execution_options(yield_per=job["chunk_size"]))
+            for rows in result.partitions():
+                now = datetime.now()
+                prices = price_rows(calculator, rows, target)
+                values = []
+                chunk_stats = {"updated": 0, "changed": 0, "errors": 0, "old": 0.0, "new": 0.0, "samples": []}
+                for row, price in zip(rows, prices):
+                    if price["error"] is not None:
+                        chunk_stats["errors"] += 1
+                        chunk_stats["samples"].append({"id": row.id, "error": price["error"]})
+                        continue
+                    old_cost = row.old_cost_mad or 0.0
+                    chunk_stats["old"] += old_cost
+                    chunk_stats["new"] += price["cost"]
+                    chunk_stats["changed"] += abs(price["cost"] - old_cost) >= 0.005
+                    values.append(_update_values(target, row, price, job["tariff_version"], now, convert_currency))
+
+                if values and not job["dry_run"]:
+                    writer.execute(update(target.model), values)
+                    writer.commit()
+                    chunk_stats["updated"] = len(values)
+
+                with _job_lock:
+                    stats["last_id"] = rows[-1].id
+                    stats["processed"] += len(rows)
+                    stats["updated"] += chunk_stats["updated"]
+                    stats["changed"] += chunk_stats["changed"]
+                    stats["errors"] += chunk_stats["errors"]
+                    stats["old_total_mad"] += chunk_stats["old"]
+                    stats["new_total_mad"] += chunk_stats["new"]
+                    room = MAX_ERROR_SAMPLES - len(stats["error_samples"])
+                    stats["error_samples"].extend(chunk_stats["samples"][:max(room, 0)])
+                    if not job["dry_run"]:
+                        _write_checkpoint(job)
+
+        with _job_lock:
+            job["status"] = "completed"
+    except Exception as e:
+        writer.rollback()
+        logger.exception("Recalcul des frais de transport interrompu")
+        with _job_lock:
+            job["status"] = "failed"
+            job["error"] = str(e)
+    finally:
+        reader.close()
+        writer.close()
+        with _job_lock:
+            job["finished_at"] = datetime.now().isoformat()
+            job["elapsed_s"] = round(time.perf_counter() - started, 2)
+            if not job["dry_run"]:
+                _write_checkpoint(job)
+        logger.info(f"Recalcul {job['job_id']}: {job['status']} en {job['elapsed_s']} s")
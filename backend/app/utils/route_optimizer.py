@@ -0,0 +1,213 @@
+"""
+Recherche des routes multi-étapes les moins chères via des pays hubs.
+
+Le coût d'une étape ne dépend que de la zone DHL d'un des deux pays:
+- vers le pays de base (Maroc) depuis l'étranger: tarif import, zone import de l'origine
+- sinon: tarif export, zone export de la destination
+
+Les pays ayant la même signature (zone export, zone import, pays de base) sont
+donc interchangeables comme hubs: le graphe est précalculé sur ces classes, et
+une recherche se résume à quelques opérations vectorisées sur les coûts par zone.
+"""
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+
+
+class RouteOptimizer:
+    """
+    Graphe de routage précalculé pour une grille tarifaire donnée.
+    """
+
+    def __init__(self, calculator, is_base_country: Callable[[str], bool]):
+        """
+        Args:
+            calculator: DHLPdfCalculator (grille et zones)
+            is_base_country: Prédicat "pays de base" (détermine la direction des étapes)
+        """
+        self.calculator = calculator
+
+        self.countries = list(dict.fromkeys(list(calculator.export_zones) + list(calculator.import_zones)))
+        self.export_zone = np.array([calculator.export_zones.get(country, 0) for country in self.countries], dtype=np.intp)
+        self.import_zone = np.array([calculator.import_zones.get(country, 0) for country in self.countries], dtype=np.intp)
+        self.is_base = np.array([is_base_country(country) for country in self.countries], dtype=bool)
+        self._position = {country: i for i, country in enumerate(self.countries)}
+
+        # Les doublons des tables ("UK", "England"...) désignent le même pays que leur pays de référence
+        resolver = calculator.country_resolver
+        self.primary = np.array(
+            [self._position[resolver.primary_country(country)] for country in self.countries],
+            dtype=np.intp
+        )
+
+        # Hubs par défaut: pays de référence présents dans les deux tables
+        self._hub_candidates = np.flatnonzero(
+            (self.export_zone > 0) & (self.import_zone > 0) & (self.primary == np.arange(len(self.countries)))
+        )
+
+    def zone_costs(self, weight_kg: float) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Coûts d'une étape par zone pour un poids donné (indice = zone, 0 inutilisé).
+        """
+        return (
+            self.calculator.zone_cost_table(weight_kg, "export"),
+            self.calculator.zone_cost_table(weight_kg, "import")
+        )
+
+    def leg_costs(
+        self,
+        origins: np.ndarray,
+        destinations: np.ndarray,
+        export_costs: np.ndarray,
+        import_costs: np.ndarray
+    ) -> np.ndarray:
+        """
+        Coûts vectorisés des étapes origine[i] -> destination[j] (diffusion NumPy).
+        """
+        is_import = self.is_base[destinations] & ~self.is_base[origins]
+        return np.where(
+            is_import,
+            import_costs[self.import_zone[origins]],
+            export_costs[self.export_zone[destinations]]
+        )
+
+    def leg_direction(self, origin: int, destination: int) -> str:
+        return "import" if self.is_base[destination] and not self.is_base[origin] else "export"
+
+    def hub_classes(self, hubs: Optional[Iterable[str]], excluded: Iterable[int]) -> List[List[int]]:
+        """
+        Regroupe les hubs candidats par signature tarifaire (hubs interchangeables).
+
+        Args:
+            hubs: Pays hubs (None = tous les pays)
+            excluded: Positions à exclure (origine et destination, avec leurs doublons)
+        """
+        excluded_primary = {int(self.primary[position]) for position in excluded}
+        if hubs is None:
+            candidates = self._hub_candidates
+        else:
+            candidates = [self._position[hub] for hub in hubs if hub in self._position]
+
+        classes: Dict[Tuple[int, int, bool], List[int]] = {}
+        for position in candidates:
+            position = int(position)
+            if int(self.primary[position]) in excluded_primary:
+                continue
+            signature = (int(self.export_zone[position]), int(self.import_zone[position]), bool(self.is_base[position]))
+            classes.setdefault(signature, []).append(position)
+        return list(classes.values())
+
+    def optimize(
+        self,
+        origin: str,
+        destination: str,
+        weight_kg: float,
+        hubs: Optional[Iterable[str]] = None,
+        max_hubs: int = 2,
+        top_k: int = 3,
+        premium_service: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Retourne les `top_k` routes les moins chères de l'origine à la destination.
+
+        Args:
+            origin: Pays d'origine (nom de référence des tables de zones)
+            destination: Pays de destination (nom de référence)
+            weight_kg: Poids effectif en kg
+            hubs: Pays hubs autorisés (None = tous les pays)
+            max_hubs: Nombre maximum de hubs intermédiaires (0 à 2)
+            top_k: Nombre de routes retournées
+            premium_service: Service premium (appliqué à la dernière étape)
+
+        Returns:
+            Routes triées par coût total (MAD), avec le détail par étape
+        """
+        o = self._position[origin]
+        d = self._position[destination]
+        export_costs, import_costs = self.zone_costs(weight_kg)
+
+        classes = self.hub_classes(hubs, excluded=(o, d))
+        # Un représentant par classe suffit pour les coûts
+        representatives = np.array([members[0] for members in classes], dtype=np.intp)
+
+        candidates: List[Tuple[float, int, Tuple[int, ...]]] = []
+
+        # Routes non tarifables (coût infini) écartées avant de garder les top_k
+        # meilleures: elles ne doivent pas prendre la place d'une route valide
+        direct = float(self.leg_costs(np.array([o]), np.array([d]), export_costs, import_costs)[0])
+        if np.isfinite(direct):
+            candidates.append((direct, 1, ()))
+
+        if max_hubs >= 1 and len(representatives):
+            to_hub = self.leg_costs(np.full(len(representatives), o), representatives, export_costs, import_costs)
+            from_hub = self.leg_costs(representatives, np.full(len(representatives), d), export_costs, import_costs)
+            one_hub = to_hub + from_hub
+            priced = np.flatnonzero(np.isfinite(one_hub))
+            for i in priced[np.argsort(one_hub[priced], kind="stable")[:top_k]]:
+                candidates.append((float(one_hub[i]), 2, (int(i),)))
+
+            if max_hubs >= 2 and len(representatives) > 1:
+                between = self.leg_costs(representatives[:, None], representatives[None, :], export_costs, import_costs)
+                two_hubs = to_hub[:, None] + between + from_hub[None, :]
+                np.fill_diagonal(two_hubs, np.inf)
+                flat = two_hubs.ravel()
+                priced = np.flatnonzero(np.isfinite(flat))
+                best = priced[np.argpartition(flat[priced], top_k)[:top_k]] if priced.size > top_k else priced
+                for index in best:
+                    first, second = divmod(int(index), len(representatives))
+                    candidates.append((float(flat[index]), 3, (first, second)))
+
+        # Moins cher d'abord, puis le moins d'étapes
+        candidates.sort(key=lambda candidate: (round(candidate[0], 2), candidate[1]))
+
+        premium_fee = float(self.calculator.premium_services.get(premium_service, 0.0)) if premium_service else 0.0
+        routes = []
+        for cost, _, hub_classes in candidates[:top_k]:
+            path = [o] + [int(representatives[i]) for i in hub_classes] + [d]
+            routes.append(self._describe_route(path, [classes[i] for i in hub_classes], export_costs, import_costs, premium_fee))
+        return routes
+
+    def _describe_route(
+        self,
+        path: List[int],
+        hub_classes: List[List[int]],
+        export_costs: np.ndarray,
+        import_costs: np.ndarray,
+        premium_fee: float
+    ) -> Dict[str, Any]:
+        legs = []
+        total = 0.0
+        for i, (origin, destination) in enumerate(zip(path, path[1:])):
+            direction = self.leg_direction(origin, destination)
+            if direction == "import":
+                zone = int(self.import_zone[origin])
+                cost = float(import_costs[zone])
+            else:
+                zone = int(self.export_zone[destination])
+                cost = float(export_costs[zone])
+            # Service premium uniquement sur la dernière étape
+            if i == len(path) - 2:
+                cost += premium_fee
+            cost = round(cost, 2)
+            total += cost
+            legs.append({
+                "leg": i + 1,
+                "from": self.countries[origin],
+                "to": self.countries[destination],
+                "direction": direction,
+                "zone": zone,
+                "cost": cost,
+                "currency": "MAD"
+            })
+
+        return {
+            "route": [self.countries[position] for position in path],
+            "hubs": [self.countries[position] for position in path[1:-1]],
+            # Autres pays donnant exactement le même coût à la place de chaque hub
+            "equivalent_hubs": [
+                [self.countries[position] for position in members[1:]]
+                for members in hub_classes
+            ],
+            "legs": legs,
+            "total_cost": round(total, 2),
+            "currency": "MAD"
+        }
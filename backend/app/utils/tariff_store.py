@@ -0,0 +1,242 @@
+"""
+Stockage des grilles tarifaires DHL versionnées.
+
+- une grille par fichier JSON: <TARIFFS_DIR>/<version>.json
+- la version active est désignée par le fichier <TARIFFS_DIR>/ACTIVE
+- les tableaux compilés sont mis en cache au format .npy (mappables en mémoire)
+  dans <TARIFFS_DIR>/.cache/<version>-<sha256>/
+"""
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+TARIFFS_DIR = Path(os.getenv("DHL_TARIFFS_DIR", Path(__file__).resolve().parent.parent / "data" / "tariffs"))
+ACTIVE_FILE = TARIFFS_DIR / "ACTIVE"
+CACHE_DIR = TARIFFS_DIR / ".cache"
+
+DIRECTIONS = ("export", "import")
+
+_VERSION_PATTERN = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]{0,63}$")
+
+
+def check_version_name(version: str) -> str:
+    """
+    Vérifie qu'un identifiant de version est utilisable comme nom de fichier.
+    """
+    if not isinstance(version, str) or not _VERSION_PATTERN.match(version):
+        raise ValueError(f"Identifiant de version tarifaire invalide: {version!r}")
+    return version
+
+
+def rate_card_path(version: str) -> Path:
+    return TARIFFS_DIR / f"{check_version_name(version)}.json"
+
+
+def list_versions() -> List[str]:
+    """
+    Retourne les versions tarifaires disponibles (triées).
+    """
+    return sorted(path.stem for path in TARIFFS_DIR.glob("*.json"))
+
+
+def read_active_version() -> str:
+    """
+    Retourne la version désignée par le fichier ACTIVE.
+    """
+    return check_version_name(ACTIVE_FILE.read_text(encoding="utf-8").strip())
+
+
+def active_pointer_signature() -> Optional[int]:
+    """
+    Signature bon marché du fichier ACTIVE (mtime), pour détecter un changement
+    fait par un autre worker sans relire le fichier à chaque requête.
+    """
+    try:
+        return ACTIVE_FILE.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def write_active_version(version: str) -> None:
+    """
+    Désigne atomiquement la version active (écriture temporaire puis renommage).
+    """
+    if not rate_card_path(version).exists():
+        raise FileNotFoundError(f"Version tarifaire introuvable: {version}")
+    _atomic_write(ACTIVE_FILE, f"{version}\n".encode("utf-8"))
+
+
+def load_rate_card(version: str) -> Tuple[Dict[str, Any], str]:
+    """
+    Charge et valide une grille tarifaire.
+
+    Args:
+        version: Identifiant de la version
+
+    Returns:
+        (grille, empreinte sha256 du fichier)
+    """
+    path = rate_card_path(version)
+    if not path.exists():
+        raise FileNotFoundError(f"Version tarifaire introuvable: {version}")
+
+    raw = path.read_bytes()
+    card = json.loads(raw)
+    validate_rate_card(card)
+    if card["version"] != version:
+        raise ValueError(f"Le fichier {path.name} déclare la version {card['version']}")
+
+    return card, hashlib.sha256(raw).hexdigest()
+
+
+def save_rate_card(card: Dict[str, Any]) -> Tuple[str, str]:
+    """
+    Enregistre une nouvelle grille tarifaire (une version existante n'est jamais écrasée).
+
+    Returns:
+        (version, empreinte sha256 du fichier)
+    """
+    validate_rate_card(card)
+    path = rate_card_path(card["version"])
+    if path.exists():
+        raise FileExistsError(f"La version tarifaire {card['version']} existe déjà")
+
+    raw = json.dumps(card, ensure_ascii=False, indent=2).encode("utf-8")
+    _atomic_write(path, raw)
+    return card["version"], hashlib.sha256(raw).hexdigest()
+
+
+def validate_rate_card(card: Dict[str, Any]) -> None:
+    """
+    Vérifie la structure d'une grille tarifaire.
+
+    Format attendu:
+        {
+            "version": "...",
+            "currency": "MAD",
+            "premium_services": {nom: supplément},
+            "special_services": {nom: tarif},
+            "export" / "import": {
+                "max_zone": 10,
+                "rates": {"0.5": [tarif zone 1, ..., tarif zone max]},
+                "additional_kg_rates": [{"from_kg": 10.1, "to_kg": 20.0, "rates": [...]}],
+                "zones": {pays: zone}
+            }
+        }
+
+    Raises:
+        ValueError: si la grille est incomplète ou incohérente
+    """
+    if not isinstance(card, dict):
+        raise ValueError("La grille tarifaire doit être un objet JSON")
+    check_version_name(card.get("version"))
+    if not isinstance(card.get("premium_services"), dict):
+        raise ValueError("premium_services manquant")
+
+    for direction in DIRECTIONS:
+        table = card.get(direction)
+        if not isinstance(table, dict):
+            raise ValueError(f"Grille {direction} manquante")
+
+        max_zone = table.get("max_zone")
+        if not isinstance(max_zone, int) or max_zone < 1:
+            raise ValueError(f"{direction}: max_zone invalide")
+
+        rates = table.get("rates") or {}
+        if not rates:
+            raise ValueError(f"{direction}: aucun palier de poids")
+        for weight, zone_rates in rates.items():
+            float(weight)
+            if len(zone_rates) != max_zone:
+                raise ValueError(f"{direction}: le palier {weight} kg doit avoir {max_zone} tarifs")
+        if not any(float(weight) == 10.0 for weight in rates):
+            raise ValueError(f"{direction}: le palier de 10 kg est requis pour les tarifs par kg supplémentaire")
+
+        bands = table.get("additional_kg_rates") or []
+        if not bands:
+            raise ValueError(f"{direction}: aucune tranche de kg supplémentaire")
+        for band in bands:
+            if float(band["from_kg"]) > float(band["to_kg"]):
+                raise ValueError(f"{direction}: tranche {band['from_kg']}-{band['to_kg']} invalide")
+            if len(band["rates"]) != max_zone:
+                raise ValueError(f"{direction}: la tranche {band['from_kg']}-{band['to_kg']} doit avoir {max_zone} tarifs")
+
+        zones = table.get("zones") or {}
+        if not zones:
+            raise ValueError(f"{direction}: aucune zone pays")
+        invalid = [country for country, zone in zones.items() if not isinstance(zone, int) or not 1 <= zone <= max_zone]
+        if invalid:
+            raise ValueError(f"{direction}: zones invalides pour {', '.join(invalid[:5])}")
+
+
+def load_compiled_arrays(version: str, sha256: str, direction: str, fields: Tuple[str, ...]) -> Optional[Dict[str, np.ndarray]]:
+    """
+    Charge les tableaux compilés depuis le cache binaire (mappés en mémoire, lecture seule).
+
+    Returns:
+        {champ: tableau} ou None si le cache est absent
+    """
+    directory = _cache_directory(version, sha256)
+    try:
+        return {
+            field: np.load(directory / f"{direction}.{field}.npy", mmap_mode="r", allow_pickle=False)
+            for field in fields
+        }
+    except (OSError, ValueError):
+        return None
+
+
+def save_compiled_arrays(version: str, sha256: str, arrays: Dict[str, Dict[str, np.ndarray]]) -> None:
+    """
+    Écrit le cache binaire d'une version ({direction: {champ: tableau}}).
+
+    Le répertoire est préparé à côté puis renommé: un worker concurrent voit
+    soit l'ancien état, soit le cache complet. Un échec d'écriture (disque en
+    lecture seule...) n'est pas bloquant.
+    """
+    directory = _cache_directory(version, sha256)
+    if directory.exists():
+        return
+
+    tmp_directory = None
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        tmp_directory = Path(tempfile.mkdtemp(dir=CACHE_DIR, prefix=f".{directory.name}."))
+        for direction, fields in arrays.items():
+            for field, array in fields.items():
+                np.save(tmp_directory / f"{direction}.{field}.npy", np.ascontiguousarray(array), allow_pickle=False)
+        os.replace(tmp_directory, directory)
+        tmp_directory = None
+    except OSError as e:
+        logger.warning(f"Cache tarifaire non écrit pour {version}: {e}")
+    finally:
+        if tmp_directory is not None:
+            shutil.rmtree(tmp_directory, ignore_errors=True)
+
+
+def _cache_directory(version: str, sha256: str) -> Path:
+    return CACHE_DIR / f"{check_version_name(version)}-{sha256[:16]}"
+
+
+def _atomic_write(path: Path, content: bytes) -> None:
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        with os.fdopen(fd, "wb") as tmp_file:
+            tmp_file.write(content)
+            tmp_file.flush()
+            os.fsync(tmp_file.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
@@ -0,0 +1,215 @@
+"""
+Cache des fichiers importés déjà analysés (prévisualisation puis import).
+
+- la clé (jeton) est l'empreinte SHA-256 du contenu: renvoyer un fichier
+  identique ne le réanalyse pas
+- les résultats sont gardés en mémoire (LRU borné) et écrits sur disque
+  (JSON, taille totale bornée): un jeton reste valable après un redémarrage
+  ou si l'import arrive sur un autre worker que la prévisualisation
+- chaque analyseur a son espace de noms ("devis", "hardware"): les deux
+  routeurs n'extraient pas les mêmes champs
+"""
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+import copy
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+
+from .tariff_store import _atomic_write
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_CACHE_DIR = Path(os.getenv("UPLOAD_CACHE_DIR", Path(tempfile.gettempdir()) / "oddnet-upload-cache"))
+UPLOAD_CACHE_MAX_ENTRIES = int(os.getenv("UPLOAD_CACHE_MAX_ENTRIES", "64"))
+UPLOAD_CACHE_MAX_DISK_BYTES = int(os.getenv("UPLOAD_CACHE_MAX_DISK_BYTES", str(200 * 1024 * 1024)))
+UPLOAD_CACHE_TTL = float(os.getenv("UPLOAD_CACHE_TTL", str(24 * 3600)))
+
+_TOKEN_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+
+def upload_token(content: bytes) -> str:
+    """
+    Jeton d'un fichier importé: empreinte SHA-256 de son contenu.
+    """
+    return hashlib.sha256(content).hexdigest()
+
+
+def _json_default(value: Any) -> Any:
+    # Scalaires numpy/pandas éventuellement présents dans les lignes extraites
+    if hasattr(value, "item"):
+        return value.item()
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return str(value)
+
+
+class ParsedUploadCache:
+    """
+    Résultats d'analyse indexés par (espace de noms, jeton).
+
+    Une entrée: {"token", "extension", "filename", "parsed"}.
+    """
+
+    def __init__(
+        self,
+        directory: Path = UPLOAD_CACHE_DIR,
+        max_entries: int = UPLOAD_CACHE_MAX_ENTRIES,
+        max_disk_bytes: int = UPLOAD_CACHE_MAX_DISK_BYTES,
+        ttl_seconds: float = UPLOAD_CACHE_TTL
+    ):
+        self.directory = Path(directory)
+        self.max_entries = max_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Tuple[str, str], tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, namespace: str, token: str) -> Path:
+        return self.directory / namespace / f"{token}.json"
+
+    def get(self, namespace: str, token: str) -> Optional[Dict[str, Any]]:
+        """
+        Retourne une copie de l'entrée, ou None (jeton inconnu, invalide ou expiré).
+        """
+        if not _TOKEN_PATTERN.match(token or ""):
+            return None
+        key = (namespace, token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, stored_at = entry
+                if time.time() - stored_at <= self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return copy.deepcopy(value)
+                del self._entries[key]
+
+        value, stored_at = self._read_disk(namespace, token)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self._remember(key, value, stored_at)
+            self.hits += 1
+        return copy.deepcopy(value)
+
+    def put(self, namespace: str, token: str, extension: str, filename: str, parsed: Dict[str, Any]) -> Dict[str, Any]:
+        entry = {"token": token, "extension": extension, "filename": filename, "parsed": parsed}
+        try:
+            content = json.dumps(entry, default=_json_default).encode("utf-8")
+        except (TypeError, ValueError) as e:
+            logger.warning(f"Résultat d'analyse non mis en cache ({filename}): {e}")
+            return entry
+        # Copie issue du JSON: la même forme que lors d'une relecture sur disque
+        entry = json.loads(content)
+        with self._lock:
+            self._remember((namespace, token), entry, time.time())
+        self._write_disk(namespace, token, content)
+        return copy.deepcopy(entry)
+
+    def get_or_parse(
+        self,
+        namespace: str,
+        content: bytes,
+        extension: str,
+        filename: str,
+        parse: Callable[[bytes, str], Dict[str, Any]]
+    ) -> Tuple[Dict[str, Any], bool]:
+        """
+        Analyse un fichier, sauf si un fichier identique l'a déjà été.
+
+        Args:
+            namespace: Espace de noms de l'analyseur
+            content: Contenu du fichier
+            extension: Extension ('.xlsx', '.xls', '.pdf')
+            filename: Nom d'origine (informatif)
+            parse: Fonction d'analyse (contenu, extension) -> résultat
+
+        Returns:
+            (entrée du cache, True si le résultat vient du cache)
+        """
+        token = upload_token(content)
+        entry = self.get(namespace, token)
+        if entry is not None:
+            return entry, True
+        return self.put(namespace, token, extension, filename, parse(content, extension)), False
+
+    def _remember(self, key: Tuple[str, str], value: Dict[str, Any], stored_at: float) -> None:
+        self._entries[key] = (value, stored_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    # ----- disque -----
+
+    def _read_disk(self, namespace: str, token: str) -> Tuple[Optional[Dict[str, Any]], float]:
+        path = self._path(namespace, token)
+        try:
+            stored_at = path.stat().st_mtime
+            if time.time() - stored_at > self.ttl_seconds:
+                path.unlink(missing_ok=True)
+                return None, 0.0
+            return json.loads(path.read_bytes()), stored_at
+        except FileNotFoundError:
+            return None, 0.0
+        except (OSError, ValueError) as e:
+            logger.warning(f"Entrée du cache d'import illisible {path.name}: {e}")
+            return None, 0.0
+
+    def _write_disk(self, namespace: str, token: str, content: bytes) -> None:
+        if len(content) > self.max_disk_bytes:
+            return
+        path = self._path(namespace, token)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            _atomic_write(path, content)
+            self._trim_disk()
+        except OSError as e:
+            # Le cache disque est une optimisation: l'import reste possible avec le fichier
+            logger.warning(f"Impossible d'écrire le cache d'import {path}: {e}")
+
+    def _trim_disk(self) -> None:
+        """
+        Supprime les entrées expirées puis les plus anciennes au-delà du budget disque.
+        """
+        files = []
+        now = time.time()
+        for path in self.directory.glob("*/*.json"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            if now - stat.st_mtime > self.ttl_seconds:
+                path.unlink(missing_ok=True)
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_disk_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "memory_entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+parsed_upload_cache = ParsedUploadCache()
@@ -0,0 +1,181 @@
+"""
+Fichiers envoyés aux endpoints d'import, lus par blocs et bornés en taille.
+
+- chaque routeur déclare la taille maximale des fichiers de ses endpoints
+  d'import (register_upload_limit, variable UPLOAD_MAX_BYTES_<NOM>); une
+  requête dont le Content-Length dépasse la limite est refusée (413) avant la
+  lecture du corps (middleware de main.py)
+- spool_upload lit le fichier par blocs de UPLOAD_CHUNK_BYTES: en mémoire
+  jusqu'à UPLOAD_SPOOL_BYTES, puis dans un fichier temporaire nommé; la lecture
+  s'arrête (UploadTooLarge) dès que la limite est dépassée, et l'empreinte du
+  cache d'import est calculée au passage
+- la source obtenue (contenu ou chemin) est passée telle quelle à toutes les
+  étapes d'analyse (processus d'import, PyPDF2, tabula, openpyxl): le fichier
+  n'est plus recopié en mémoire ni dans d'autres fichiers temporaires
+"""
+from typing import Dict, Optional, Union
+import hashlib
+import io
+import logging
+import os
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(25 * 1024 * 1024)))
+UPLOAD_SPOOL_BYTES = int(os.getenv("UPLOAD_SPOOL_BYTES", str(1024 * 1024)))
+UPLOAD_CHUNK_BYTES = int(os.getenv("UPLOAD_CHUNK_BYTES", str(1024 * 1024)))
+UPLOAD_TMP_DIR = os.getenv("UPLOAD_TMP_DIR") or None
+# Marge pour les en-têtes et séparateurs multipart autour du fichier
+UPLOAD_FORM_OVERHEAD = 64 * 1024
+
+# Fichier à analyser: contenu (petits fichiers) ou chemin du fichier temporaire
+FileSource = Union[bytes, str]
+
+# Chemin d'un endpoint d'import (sans "/" final) -> taille maximale des fichiers envoyés
+UPLOAD_LIMITS: Dict[str, int] = {}
+
+
+class UploadTooLarge(ValueError):
+    """Fichier plus gros que la limite de l'endpoint."""
+
+    def __init__(self, max_bytes: int):
+        size = f"{max_bytes / 1024 / 1024:.0f} Mo" if max_bytes >= 1024 * 1024 else f"{max_bytes} octets"
+        super().__init__(f"Fichier trop volumineux (maximum {size})")
+        self.max_bytes = max_bytes
+
+
+def register_upload_limit(name: str, *paths: str, default: int = UPLOAD_MAX_BYTES) -> int:
+    """
+    Déclare la taille maximale des fichiers envoyés aux endpoints paths.
+
+    Args:
+        name: Nom de la limite (variable d'environnement UPLOAD_MAX_BYTES_<NAME>)
+        paths: Chemins complets des endpoints ("/devis/preview-file/")
+        default: Limite sans variable d'environnement
+
+    Returns:
+        La limite en octets
+    """
+    max_bytes = int(os.getenv(f"UPLOAD_MAX_BYTES_{name.upper()}", str(default)))
+    for path in paths:
+        UPLOAD_LIMITS[path.rstrip("/")] = max_bytes
+    return max_bytes
+
+
+def exceeds_upload_limit(path: str, content_length: Optional[str]) -> Optional[int]:
+    """
+    Limite dépassée par une requête d'après son Content-Length (None si la
+    requête est acceptée, si sa taille n'est pas annoncée ou si l'endpoint n'a
+    pas de limite).
+    """
+    max_bytes = UPLOAD_LIMITS.get(path.rstrip("/"))
+    if max_bytes is None or not content_length or not content_length.isdigit():
+        return None
+    return max_bytes if int(content_length) > max_bytes + UPLOAD_FORM_OVERHEAD else None
+
+
+def source_stream(source: FileSource):
+    """Source lisible par openpyxl, pandas, PyPDF2: chemin tel quel, contenu dans un BytesIO."""
+    return io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else source
+
+
+class SpooledUpload:
+    """
+    Fichier envoyé: en mémoire jusqu'à spool_bytes, puis dans un fichier
+    temporaire nommé (supprimé par close()).
+    """
+
+    def __init__(self, filename: str, spool_bytes: int = UPLOAD_SPOOL_BYTES):
+        self.filename = filename
+        self.spool_bytes = spool_bytes
+        self.size = 0
+        self.path: Optional[str] = None
+        self._buffer = io.BytesIO()
+        self._file = None
+        self._hash = hashlib.sha256()
+
+    def write(self, chunk: bytes) -> None:
+        self._hash.update(chunk)
+        self.size += len(chunk)
+        if self._file is None and self.size > self.spool_bytes:
+            # Passage sur disque: le début du fichier quitte la mémoire
+            self._file = tempfile.NamedTemporaryFile(
+                prefix="upload-", suffix=os.path.splitext(self.filename or "")[1], dir=UPLOAD_TMP_DIR, delete=False
+            )
+            self.path = self._file.name
+            self._file.write(self._buffer.getbuffer())
+            self._buffer = io.BytesIO()
+        if self._file is not None:
+            self._file.write(chunk)
+        else:
+            self._buffer.write(chunk)
+
+    def finish(self) -> None:
+        if self._file is not None:
+            self._file.close()
+
+    @property
+    def token(self) -> str:
+        """Empreinte SHA-256 du contenu (jeton du cache d'import, voir upload_cache)."""
+        return self._hash.hexdigest()
+
+    @property
+    def source(self) -> FileSource:
+        """Contenu (fichier resté en mémoire) ou chemin du fichier temporaire."""
+        return self.path if self.path is not None else self._buffer.getvalue()
+
+    def close(self) -> None:
+        """Supprime le fichier temporaire (à appeler quand l'analyse est terminée)."""
+        if self._file is not None:
+            self._file.close()
+        if self.path is not None:
+            try:
+                os.unlink(self.path)
+            except OSError:
+                pass
+            self.path = None
+        self._buffer = io.BytesIO()
+
+    def __enter__(self) -> "SpooledUpload":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+async def spool_upload(file, max_bytes: int, chunk_bytes: int = UPLOAD_CHUNK_BYTES) -> SpooledUpload:
+    """
+    Lit un fichier envoyé (UploadFile) par blocs.
+
+    Args:
+        file: Fichier envoyé
+        max_bytes: Taille maximale
+        chunk_bytes: Taille des blocs lus
+
+    Raises:
+        UploadTooLarge: dès que max_bytes est dépassé (rien n'est gardé)
+    """
+    upload = SpooledUpload(file.filename)
+    try:
+        while True:
+            chunk = await file.read(chunk_bytes)
+            if not chunk:
+                break
+            if upload.size + len(chunk) > max_bytes:
+                raise UploadTooLarge(max_bytes)
+            upload.write(chunk)
+        upload.finish()
+    except BaseException:
+        upload.close()
+        raise
+    logger.info(f"Fichier {file.filename} reçu: {upload.size} octets{' (sur disque)' if upload.path else ''}")
+    return upload
+
+
+def body_excerpt(body: bytes, max_bytes: int) -> str:
+    """Début d'un corps de requête, décodé sans erreur, avec sa taille s'il est coupé."""
+    excerpt = body[:max_bytes].decode("utf-8", errors="replace")
+    if len(body) > max_bytes:
+        excerpt += f"... ({len(body)} octets)"
+    return excerpt
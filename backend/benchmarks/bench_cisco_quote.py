@@ -0,0 +1,155 @@
+"""
+Benchmark + non-régression: descriptions des articles d'un devis Cisco PDF.
+
+- non-régression: sur un corpus de devis générés (PN répétés, PN contenus
+  dans d'autres PN, lignes vides, tirets finaux...) et de textes aléatoires,
+  la description de chaque PN donnée par l'index des lignes (utils/quote_text)
+  est celle de l'ancienne recherche re.search sur tout le texte, y compris
+  pour des PN plus longs que MAX_INDEXED_PN et des lignes terminées par de
+  très longs mots (références, empreintes)
+- durée: ancienne recherche (un re.search par article, tout le texte relu)
+  comparée à l'index, pour des devis de 500 à 3 000 articles (~3 lignes par
+  article), puis durée totale du parser "Price Quotation" (utils/quote_extraction);
+  construction de l'index pour un texte dont les lignes finissent par des mots
+  de 10 000 caractères
+
+Usage (depuis le dossier backend):
+    python -m benchmarks.bench_cisco_quote
+"""
+import logging
+import random
+import re
+import time
+
+from app.utils.quote_extraction import QUOTE_PARSERS, QuoteDocument
+from app.utils.quote_text import MAX_INDEXED_PN, DescriptionIndex
+
+PARSER = QUOTE_PARSERS["cisco_price_quotation"]
+
+SIZES = (500, 1500, 3000)
+CORPUS = 300
+LONG_TOKEN = 10_000
+
+FAMILIES = ["C9300", "C9200L", "C9500", "ISR4331", "AIR-AP2802I", "CON-SNT", "SFP-10G", "GLC-TE", "STACK-T1"]
+
+
+def legacy_description(text: str, pn: str) -> str:
+    match = re.search(f"{re.escape(pn)}[^A-Z0-9\n]*\n([^\n]+)", text)
+    return match.group(1).strip() if match else pn
+
+
+def random_pn(rng: random.Random) -> str:
+    pn = f"{rng.choice(FAMILIES)}-{rng.randint(8, 48)}{rng.choice(['P', 'T', 'S', 'U'])}"
+    if rng.random() < 0.3:
+        pn += rng.choice(["-E", "-A", "-M", "/K9", "-"])
+    return pn
+
+
+def build_quote(items: int, rng: random.Random, tricky: bool = False) -> str:
+    lines = [
+        "Cisco Systems - Estimate",
+        f"Quote ID : {rng.randint(10_000_000, 99_999_999)}",
+        "Quote Name : Extension campus",
+        "End Customer :",
+        "ODDNET SARL",
+    ]
+    pns = [random_pn(rng) for _ in range(max(1, items // 3 if tricky else items))]
+    for number in range(items):
+        pn = rng.choice(pns) if tricky else pns[number]
+        qty = rng.randint(1, 40)
+        price = rng.randint(100, 90_000) / 10
+        lines.append(f"{number + 1}.0 {pn} SOUTHCOM {price:,.2f} {qty} {price * qty:,.2f}")
+        if tricky and rng.random() < 0.2:
+            # PN contenu dans un autre mot, ou suivi de texte en minuscules
+            lines.append(rng.choice([f"X{pn}", f"{pn} - voir note", f"{pn}--", f"ref {pn} lot 2"]))
+        lines.append(pn if not tricky or rng.random() < 0.8 else f"  {pn}  ")
+        if tricky and rng.random() < 0.1:
+            lines.append("")
+        lines.append(f"Catalyst {rng.randint(1000, 9999)} module, {rng.choice(['licence', 'support 36 mois', 'PoE+'])}")
+    return "\n".join(lines)
+
+
+def random_text(rng: random.Random) -> str:
+    words = ["C9300", "C9300-24", "9300", "-", "/", "--", "X", "ab", "A1", "", " ", "K9/", "C9300-24T/"]
+    return "\n".join(
+        " ".join(rng.choice(words) for _ in range(rng.randint(0, 5)))
+        for _ in range(rng.randint(1, 30))
+    )
+
+
+def long_token_text(rng: random.Random, lines: int, length: int) -> str:
+    # Lignes terminées par un long mot de PN, chacune suivie de sa description
+    alphabet = "ABCDEF0123456789-/"
+    return "\n".join(
+        f"Ref {''.join(rng.choice(alphabet) for _ in range(length))}\nligne {number}"
+        for number in range(lines)
+    )
+
+
+def check_regression() -> int:
+    rng = random.Random(7)
+    checked = 0
+    for sample in range(CORPUS):
+        text = build_quote(rng.randint(1, 60), rng, tricky=sample % 2 == 0)
+        index = DescriptionIndex(text)
+        for pn in set(re.findall(r"[A-Z0-9\-/]+", text)):
+            assert index.description(pn, default=pn) == legacy_description(text, pn), pn
+            checked += 1
+        document = QuoteDocument.from_text(text)
+        for item in PARSER.parse(document)["items"]:
+            assert item["description"] == legacy_description(document.text(), item["pn"])
+
+        text = random_text(rng)
+        index = DescriptionIndex(text)
+        for pn in ["-", "/", "C9300", "9300", "C9300-", "24", "24T/", "K9", "X", "A1-"]:
+            assert index.description(pn, default=pn) == legacy_description(text, pn), (pn, text)
+            checked += 1
+
+    # PN autour de MAX_INDEXED_PN, suffixes (ou non) de longs mots
+    text = long_token_text(rng, 20, 3 * MAX_INDEXED_PN)
+    tokens = re.findall(r"^Ref (\S+)$", text, re.MULTILINE)
+    for token in tokens:
+        for length in (1, MAX_INDEXED_PN - 1, MAX_INDEXED_PN, MAX_INDEXED_PN + 1, 2 * MAX_INDEXED_PN, len(token)):
+            for pn in (token[-length:], token[-length - 1:-1], token[:length]):
+                assert DescriptionIndex(text).description(pn, default=pn) == legacy_description(text, pn), pn
+                checked += 1
+    return checked
+
+
+def main():
+    logging.disable(logging.INFO)
+    print(f"Non-régression: {check_regression()} PN vérifiés")
+
+    rng = random.Random(42)
+    print(f"{'articles':>9} {'lignes':>7} | {'re.search':>10} | {'index':>8} | {'parse complet':>13}")
+    for items in SIZES:
+        text = build_quote(items, rng)
+        pns = re.findall(r"^\d+\.\d+ ([A-Z0-9\-/]+)", text, re.MULTILINE)
+
+        started = time.perf_counter()
+        legacy = [legacy_description(text, pn) for pn in pns]
+        legacy_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        index = DescriptionIndex(text)
+        indexed = [index.description(pn, default=pn) for pn in pns]
+        index_seconds = time.perf_counter() - started
+        assert indexed == legacy
+
+        started = time.perf_counter()
+        PARSER.parse(QuoteDocument.from_text(text))
+        parse_seconds = time.perf_counter() - started
+
+        print(
+            f"{items:>9} {text.count(chr(10)) + 1:>7} | {legacy_seconds:>9.3f}s | "
+            f"{index_seconds:>7.3f}s | {parse_seconds:>12.3f}s"
+        )
+
+    text = long_token_text(rng, 20, LONG_TOKEN)
+    started = time.perf_counter()
+    DescriptionIndex(text)
+    print(f"Index, 20 lignes finies par un mot de {LONG_TOKEN} caractères: {time.perf_counter() - started:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Benchmark: extraction des lignes d'une liste de prix Excel de 50 000 lignes,
+parcours ligne par ligne (df.iloc[i], pd.isna par cellule, ancienne
+implémentation) comparé à l'extraction par colonnes (utils/excel_extraction).
+
+Le DataFrame est construit en mémoire: seule l'extraction est mesurée, pas la
+lecture du fichier.
+
+Usage (depuis le dossier backend):
+    python -m benchmarks.bench_excel_extraction
+"""
+import time
+
+import numpy as np
+import pandas as pd
+
+from app.routers.hardware_import import COLUMN_PATTERNS, extract_items_from_dataframe, find_column_mapping
+
+ROWS = 50_000
+
+
+def build_price_list(rows: int = ROWS) -> pd.DataFrame:
+    rng = np.random.default_rng(42)
+    pns = np.array([f"C9300-{i:05d}-A" for i in range(rows)], dtype=object)
+    pns[rng.random(rows) < 0.02] = np.nan
+    quantities = rng.integers(0, 20, rows).astype(object)
+    quantities[rng.random(rows) < 0.01] = "n/a"
+    return pd.DataFrame({
+        "Line": np.arange(1, rows + 1),
+        "Part Number": pns,
+        "Description": [f"Catalyst 9300 48-port, option {i % 97}" for i in range(rows)],
+        "Qty": quantities,
+        "Unit Price": rng.random(rows) * 5000,
+    })
+
+
+def legacy_find_column_mapping(df):
+    column_mapping = {}
+    for i in range(min(20, len(df))):
+        row = df.iloc[i]
+        matches = 0
+        temp_mapping = {}
+        for key, keywords in COLUMN_PATTERNS.items():
+            for col_name in df.columns:
+                cell_value = str(row.get(col_name, "")).lower()
+                if any(keyword in cell_value for keyword in keywords):
+                    temp_mapping[key] = col_name
+                    matches += 1
+                    break
+        if matches >= 3:
+            column_mapping = temp_mapping
+            break
+    if not column_mapping:
+        for key, keywords in COLUMN_PATTERNS.items():
+            for col_name in df.columns:
+                if any(keyword in str(col_name).lower() for keyword in keywords):
+                    column_mapping[key] = col_name
+                    break
+    return column_mapping
+
+
+def legacy_extract_items(df, column_mapping, start_row=0):
+    items = []
+    for i in range(start_row, len(df)):
+        row = df.iloc[i]
+        if not any(not pd.isna(row.get(col, "")) for col in column_mapping.values()):
+            continue
+        pn_value = row.get(column_mapping["pn"], "")
+        pn = str(pn_value).strip() if not pd.isna(pn_value) else ""
+        desc_value = row.get(column_mapping["description"], "")
+        description = str(desc_value).strip() if not pd.isna(desc_value) else ""
+        qty_value = row.get(column_mapping["qty"], 0)
+        try:
+            qty = int(float(qty_value)) if not pd.isna(qty_value) else 0
+        except (ValueError, TypeError):
+            qty = 0
+        cost_value = row.get(column_mapping["unit_cost"], 0)
+        try:
+            unit_cost = float(cost_value) if not pd.isna(cost_value) else 0
+        except (ValueError, TypeError):
+            unit_cost = 0
+        if pn and qty > 0:
+            items.append((pn, description or pn, qty, unit_cost))
+    return items
+
+
+def main():
+    df = build_price_list()
+    print(f"Liste de prix: {len(df)} lignes x {len(df.columns)} colonnes")
+
+    started = time.perf_counter()
+    legacy = legacy_extract_items(df, legacy_find_column_mapping(df))
+    legacy_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    items = extract_items_from_dataframe(df, find_column_mapping(df))
+    vectorized_seconds = time.perf_counter() - started
+
+    assert [(item["pn"], item["eq_reference"], item["qty"], item["unit_cost"]) for item in items] == legacy
+
+    print(f"{'ligne par ligne':>16}: {legacy_seconds:8.3f} s")
+    print(f"{'par colonnes':>16}: {vectorized_seconds:8.3f} s")
+    print(f"{'gain':>16}: x{legacy_seconds / vectorized_seconds:.0f} ({len(items)} articles extraits)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Benchmark: pic mémoire de l'analyse d'un fichier .xlsx, lecture complète
+(pd.read_excel puis parse_excel_generic, ancienne implémentation) comparée à
+la lecture en streaming par blocs (openpyxl read_only, process_file).
+
+Le pic est mesuré avec tracemalloc, hors liste des articles extraits (commune
+aux deux méthodes): il doit rester à peu près constant en streaming quand la
+taille du fichier augmente (seule la table des chaînes partagées du classeur,
+chargée par openpyxl, grandit avec le nombre de références distinctes).
+
+Non-régression: pour des feuilles mises en page comme un devis (bloc de titre,
+ligne vide, tableau décalé, lignes vides dans le tableau), les blocs lus en
+streaming sont identiques (valeurs et types) au DataFrame de pd.read_excel, et
+donnent les mêmes articles.
+
+Usage (depuis le dossier backend):
+    python -m benchmarks.bench_excel_streaming
+"""
+import io
+import logging
+import time
+import tracemalloc
+
+import openpyxl
+import pandas as pd
+
+from app.routers.hardware_import import find_column_mapping, first_data_row
+from app.utils.excel_extraction import extract_item_frame, iter_excel_sheets
+
+SIZES = (20_000, 80_000)
+
+
+def build_workbook(rows: int) -> bytes:
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet("Quote")
+    sheet.append(["Quote ID: 4471234"])
+    sheet.append(["Line", "Part Number", "Description", "Qty", "Unit Price"])
+    for i in range(rows):
+        sheet.append([i + 1, f"C9300-{i:06d}-A", f"Catalyst 9300 48-port, option {i % 97}", i % 20, 12.5 * (i % 400)])
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+def build_layout(first_row: int, first_column: int, blank_rows: bool) -> bytes:
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.cell(1, 1, "Quote Number: Q-123456")
+    sheet.cell(2, 1, "Client: ODDNET SARL")
+    header = ["Part Number", "Description", "Qty", "Unit Price", "Eq Reference"]
+    for column, name in enumerate(header):
+        sheet.cell(first_row, first_column + column, name)
+    row = first_row
+    for i in range(30):
+        row += 2 if blank_rows and i % 7 == 3 else 1
+        values = [f"C9300-{i:03d}", f"Catalyst option {i}", i % 5 + 1, 0 if i % 4 == 0 else 12.5 * i, i if i % 3 else None]
+        for column, value in enumerate(values):
+            sheet.cell(row, first_column + column, value)
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+def check_layouts() -> int:
+    checked = 0
+    for first_row in (1, 4):
+        for first_column in (1, 2):
+            for blank_rows in (False, True):
+                content = build_layout(first_row, first_column, blank_rows)
+                reference = pd.read_excel(io.BytesIO(content))
+                for sheet in iter_excel_sheets(content):
+                    frame = pd.concat([chunk for _, chunk in sheet.chunks()])
+                    pd.testing.assert_frame_equal(frame, reference)
+                assert count_streaming(content) == count_full(content) == 30, (first_row, first_column, blank_rows)
+                checked += 1
+    return checked
+
+
+def count_full(content: bytes) -> int:
+    df = pd.read_excel(io.BytesIO(content))
+    mapping = find_column_mapping(df)
+    return len(extract_item_frame(df, mapping, first_data_row(df, mapping)))
+
+
+def count_streaming(content: bytes) -> int:
+    count = 0
+    for sheet in iter_excel_sheets(content):
+        mapping = find_column_mapping(sheet.head)
+        start_row = first_data_row(sheet.head, mapping)
+        for offset, chunk in sheet.chunks():
+            count += len(extract_item_frame(chunk, mapping, start_row if offset == 0 else 0))
+    return count
+
+
+def measure(function, content: bytes):
+    tracemalloc.start()
+    started = time.perf_counter()
+    count = function(content)
+    seconds = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return count, seconds, peak / 1024 / 1024
+
+
+def main():
+    logging.disable(logging.INFO)
+    print(f"Non-régression: {check_layouts()} mises en page vérifiées")
+    print(f"{'lignes':>8} {'fichier':>9} | {'complet':>18} | {'streaming':>18}")
+    for rows in SIZES:
+        content = build_workbook(rows)
+        full_count, full_seconds, full_peak = measure(count_full, content)
+        stream_count, stream_seconds, stream_peak = measure(count_streaming, content)
+        assert full_count == stream_count
+        print(
+            f"{rows:>8} {len(content) / 1024 / 1024:>7.1f}Mo | "
+            f"{full_peak:>7.1f}Mo {full_seconds:>7.2f}s | "
+            f"{stream_peak:>7.1f}Mo {stream_seconds:>7.2f}s"
+        )
+
+
+if __name__ == "__main__":
+    main()
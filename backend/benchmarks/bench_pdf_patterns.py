@@ -0,0 +1,113 @@
+"""
+Benchmark: détection du fournisseur, en-tête et totaux de GenericPDFExtractor
+sur un corpus de devis de plusieurs pages. Appels re.search un par motif et
+par champ sur tout le texte (ancienne implémentation) comparés aux motifs
+précompilés, cherchés à partir de leurs mots-clés (FieldScanner).
+
+Le texte des devis est généré (pas de lecture PDF): seule l'analyse du texte
+est mesurée.
+
+Usage (depuis le dossier backend):
+    python -m benchmarks.bench_pdf_patterns
+"""
+import logging
+import random
+import re
+import time
+
+from app.utils.quote_patterns import GenericPDFExtractor
+
+QUOTES = 200
+PAGES = 8
+LINES_PER_PAGE = 60
+
+VENDORS = ["Juniper Networks", "Fortinet", "Huawei Technologies", "Lenovo", "Dell EMC"]
+
+
+def build_quote(rng: random.Random) -> str:
+    vendor = rng.choice(VENDORS)
+    lines = [
+        f"{vendor} - Proposition commerciale",
+        f"Quote Number: Q-{rng.randint(100000, 999999)}",
+        f"Date: {rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/2024",
+        f"Valid until: {rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/2025",
+        "Bill To: ODDnet Casablanca",
+        "Contact: Service achats",
+        "Email: achats@oddnet.ma",
+        "Phone: +212 522 00 00 00",
+    ]
+    for page in range(PAGES):
+        lines.append(f"Page {page + 1} / {PAGES}")
+        for line in range(LINES_PER_PAGE):
+            qty = rng.randint(1, 40)
+            price = rng.randint(10, 9000) + 0.5
+            lines.append(
+                f"{page * LINES_PER_PAGE + line + 1}  SKU-{rng.randint(10000, 99999)}  "
+                f"Module optique et licence de support {rng.randint(1, 36)} mois  {qty}  {price:,.2f}  {qty * price:,.2f}"
+            )
+    lines += ["Subtotal: 1 254 300,50", "TVA 20% 250 860,10", "Transport 1 200,00", "Total: 1 506 360,60"]
+    return "\n".join(lines)
+
+
+def legacy_detect_supplier(extractor: GenericPDFExtractor, text: str) -> str:
+    text_lower = text.lower()
+    for supplier, patterns in extractor.supplier_patterns.items():
+        for pattern in patterns:
+            if re.search(pattern, text_lower):
+                return supplier
+    return "generic"
+
+
+def legacy_header_info(extractor: GenericPDFExtractor, text: str) -> dict:
+    info = {}
+    for key, patterns in extractor.common_patterns.items():
+        for pattern in patterns:
+            match = re.search(pattern, text, re.IGNORECASE | re.MULTILINE)
+            if match:
+                info[key] = match.group(1).strip()
+                break
+    return info
+
+
+def legacy_totals(extractor: GenericPDFExtractor, text: str) -> dict:
+    totals = {}
+    for key, patterns in extractor.total_patterns.items():
+        match = re.search(patterns[0], text, re.IGNORECASE)
+        if match:
+            try:
+                totals[key] = float(match.group(1).strip().replace(' ', '').replace(',', '.'))
+            except ValueError:
+                pass
+    return totals
+
+
+def main():
+    logging.disable(logging.INFO)
+    rng = random.Random(42)
+    corpus = [build_quote(rng) for _ in range(QUOTES)]
+    extractor = GenericPDFExtractor()
+    print(f"Corpus: {QUOTES} devis, {sum(len(text) for text in corpus) / 1024 / 1024:.1f} Mo de texte")
+
+    started = time.perf_counter()
+    legacy = [
+        (legacy_detect_supplier(extractor, text), legacy_header_info(extractor, text), legacy_totals(extractor, text))
+        for text in corpus
+    ]
+    legacy_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    scanned = [
+        (extractor.detect_supplier(text), extractor.extract_header_info(text), extractor.extract_totals(text))
+        for text in corpus
+    ]
+    scanned_seconds = time.perf_counter() - started
+
+    assert scanned == legacy
+
+    print(f"{'re.search':>12}: {legacy_seconds:8.3f} s")
+    print(f"{'précompilé':>12}: {scanned_seconds:8.3f} s")
+    print(f"{'gain':>12}: x{legacy_seconds / scanned_seconds:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Benchmark: latence de l'extraction des tableaux d'un devis PDF, une JVM lancée
+par méthode essayée (tabula.read_pdf en sous-processus, ancienne
+implémentation) comparée au processus d'extraction persistant
+(utils/pdf_tables, JVM gardée chaude avec jpype).
+
+Le PDF est généré avec reportlab. Deux cas: un tableau (la première méthode
+le trouve) et une page sans tableau (les quatre méthodes sont essayées).
+
+Nécessite Java (et jpype1 pour garder la JVM chaude).
+
+Usage (depuis le dossier backend):
+    python -m benchmarks.bench_pdf_tables
+"""
+import io
+import os
+import statistics
+import tempfile
+import time
+
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Table
+
+from app.utils.pdf_tables import TABLE_EXTRACTION_METHODS, TableExtractionPool, java_available, jpype_available
+
+ROUNDS = 5
+
+
+def build_pdf(rows: int = 40, with_table: bool = True) -> bytes:
+    buffer = io.BytesIO()
+    document = SimpleDocTemplate(buffer, pagesize=A4)
+    if with_table:
+        data = [["Line", "Part Number", "Description", "Qty", "Unit Price"]]
+        data += [[str(i + 1), f"C9300-{i:04d}-A", f"Catalyst 9300 option {i}", str(1 + i % 5), f"{125.5 * (i % 9):.2f}"] for i in range(rows)]
+        story = [Table(data)]
+    else:
+        story = [Paragraph("Devis sans tableau", getSampleStyleSheet()["Normal"])]
+    document.build(story)
+    return buffer.getvalue()
+
+
+def legacy_extract(pdf_path: str):
+    import tabula
+
+    for method in TABLE_EXTRACTION_METHODS:
+        try:
+            tables = tabula.read_pdf(pdf_path, force_subprocess=True, **method)
+        except Exception:
+            continue
+        if tables and not all(table.empty for table in tables):
+            return [table for table in tables if not table.empty]
+    return []
+
+
+def timed(function, pdf_path: str):
+    durations, tables = [], []
+    for _ in range(ROUNDS):
+        started = time.perf_counter()
+        tables = function(pdf_path)
+        durations.append(time.perf_counter() - started)
+    return durations, len(tables)
+
+
+def main():
+    if not java_available():
+        print("Java introuvable: benchmark impossible")
+        return
+    if not jpype_available():
+        print("jpype absent: les processus d'extraction lanceront aussi une JVM par méthode")
+
+    pool = TableExtractionPool(max_workers=1)
+    try:
+        print(f"{'PDF':>12} | {'JVM par méthode':>22} | {'processus persistant':>34}")
+        for label, with_table in (("tableau", True), ("sans tableau", False)):
+            with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as temp_file:
+                temp_file.write(build_pdf(with_table=with_table))
+                pdf_path = temp_file.name
+            try:
+                legacy, legacy_tables = timed(legacy_extract, pdf_path)
+                pooled, pooled_tables = timed(pool.extract, pdf_path)
+                assert legacy_tables == pooled_tables
+                print(
+                    f"{label:>12} | médiane {statistics.median(legacy):6.2f}s | "
+                    f"1er appel {pooled[0]:6.2f}s, médiane {statistics.median(pooled[1:]):6.2f}s"
+                )
+            finally:
+                os.unlink(pdf_path)
+    finally:
+        pool.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Benchmark: extraction du texte d'un devis PDF de 200 pages.
+
+- ancienne implémentation: PyPDF2 page par page, text += ... (un seul processus)
+- utils/pdf_text en série, puis réparti entre PDF_TEXT_WORKERS processus
+- lecture de la première page seulement (iter_pdf_pages), pour les
+  traitements qui n'ont besoin que de l'en-tête
+- chaque backend installé (PyPDF2, PyMuPDF)
+
+Le PDF est généré avec reportlab. Le premier appel parallèle inclut le
+démarrage des processus; il est mesuré à part.
+
+Usage (depuis le dossier backend):
+    python -m benchmarks.bench_pdf_text
+"""
+import io
+import time
+
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+from app.utils import pdf_text
+
+PAGES = 200
+LINES_PER_PAGE = 60
+
+
+def build_pdf(pages: int = PAGES) -> bytes:
+    buffer = io.BytesIO()
+    document = canvas.Canvas(buffer, pagesize=A4)
+    for page in range(pages):
+        document.drawString(40, 810, f"Price Quotation - Cisco - page {page + 1}")
+        for line in range(LINES_PER_PAGE):
+            number = page * LINES_PER_PAGE + line + 1
+            document.drawString(
+                40, 790 - line * 12,
+                f"{number}.0 C9300-{number:05d}-E SOUTHCOM 1,250.00 {line % 9 + 1} {1250 * (line % 9 + 1):,.2f}"
+            )
+        document.showPage()
+    document.save()
+    return buffer.getvalue()
+
+
+def legacy_extract(content: bytes) -> str:
+    import PyPDF2
+    pdf_reader = PyPDF2.PdfReader(io.BytesIO(content))
+    text = ""
+    for page in pdf_reader.pages:
+        text += page.extract_text() + "\n\n"
+    return text
+
+
+def timed(function):
+    started = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - started
+
+
+def main():
+    content = build_pdf()
+    # Au moins deux processus, pour passer par la lecture répartie même sur une machine à un cœur
+    pdf_text.PDF_TEXT_WORKERS = max(2, pdf_text.PDF_TEXT_WORKERS)
+    print(f"PDF: {PAGES} pages, {len(content) / 1024:.0f} Ko, {pdf_text.PDF_TEXT_WORKERS} processus")
+
+    legacy, legacy_seconds = timed(lambda: legacy_extract(content))
+    print(f"{'PyPDF2 text +=':>28}: {legacy_seconds:7.3f} s")
+
+    for name, backend in pdf_text.PDF_TEXT_BACKENDS.items():
+        try:
+            backend.page_count(content)
+        except ImportError:
+            print(f"{name:>28}: non installé")
+            continue
+
+        pdf_text.PDF_TEXT_PARALLEL_MIN_PAGES = PAGES + 1
+        serial, serial_seconds = timed(lambda: pdf_text.extract_pdf_text(content, backend=name))
+        pdf_text.PDF_TEXT_PARALLEL_MIN_PAGES = 1
+        _, cold_seconds = timed(lambda: pdf_text.extract_pdf_text(content, backend=name))
+        parallel, parallel_seconds = timed(lambda: pdf_text.extract_pdf_text(content, backend=name))
+        first_page, first_seconds = timed(lambda: next(pdf_text.iter_pdf_pages(content, backend=name)))
+        if name == "pypdf2":
+            assert serial == parallel == legacy
+        assert "page 1" in first_page
+
+        print(f"{name + ' série':>28}: {serial_seconds:7.3f} s")
+        print(f"{name + ' parallèle (1er appel)':>28}: {cold_seconds:7.3f} s")
+        print(f"{name + ' parallèle':>28}: {parallel_seconds:7.3f} s")
+        print(f"{name + ' première page':>28}: {first_seconds:7.3f} s")
+
+    pdf_text.shutdown()
+
+
+if __name__ == "__main__":
+    main()
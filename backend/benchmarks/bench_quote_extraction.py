@@ -0,0 +1,106 @@
+"""
+Benchmark: moteur d'extraction des devis PDF (utils/quote_extraction).
+
+- détection du format, lecture du PDF comprise: texte complet extrait puis
+  motifs des fournisseurs cherchés sur tout le texte (anciennes
+  implémentations), comparés à la lecture de la première page seulement
+  (QuoteDocument.first_page)
+- la première page lue pour la détection est reprise par l'extraction
+  complète: les pages sont les mêmes qu'avec une lecture directe
+- extraction complète (extract_quote) d'un devis Cisco "Price Quotation",
+  d'un devis Cisco SAPO45 et d'un devis HP: lecture du PDF (une seule fois)
+  et analyse du texte
+
+Les PDF sont générés avec reportlab. Les tableaux (tabula) ne sont pas
+mesurés: aucun de ces devis n'en a besoin.
+
+Usage (depuis le dossier backend):
+    python -m benchmarks.bench_quote_extraction
+"""
+import io
+import logging
+import time
+
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+from app.utils.pdf_text import extract_pdf_text
+from app.utils.quote_extraction import QuoteDocument, detect_quote_parser, extract_quote
+from app.utils.quote_patterns import GenericPDFExtractor
+
+PAGES = 60
+LINES_PER_PAGE = 20
+ROUNDS = 5
+
+
+def build_pdf(header, line) -> bytes:
+    buffer = io.BytesIO()
+    document = canvas.Canvas(buffer, pagesize=A4)
+    number = 0
+    for page in range(PAGES):
+        rows = list(header) if page == 0 else []
+        while len(rows) < LINES_PER_PAGE * 3:
+            number += 1
+            rows.extend(line(number))
+        for position, row in enumerate(rows):
+            document.drawString(30, 810 - position * 12, row)
+        document.showPage()
+    document.save()
+    return buffer.getvalue()
+
+
+QUOTES = {
+    "cisco_price_quotation": build_pdf(
+        ["Cisco Systems - Price Quotation", "Quote ID : 4512345", "Quote Name : Campus", "End Customer :", "ODDNET SARL"],
+        lambda n: [f"{n}.0 C9300-{n:05d}-E SOUTHCOM 1,250.00 {n % 9 + 1} 2,500.00", f"C9300-{n:05d}-E", "Catalyst 9300 module"]
+    ),
+    "cisco": build_pdf(
+        ["CISCO - Quotation", "Quote ID : 998877", "Deal ID : 5544"],
+        lambda n: [f"#{n:02d} C9300X-{n}Y-A Catalyst 9300X uplink Switch {n % 9 + 1} $ 16,526.00 33,052.00"]
+    ),
+    "hp": build_pdf(
+        ["Hewlett Packard Enterprise", "Quote Number: Q-123456", "Date: 12/03/2024"],
+        lambda n: [f"{n} J97{n:05d}A Aruba switch module {n % 9 + 1} 1,200.00 2,400.00"]
+    ),
+}
+
+
+def legacy_detect(text: str) -> str:
+    # Anciennes détections, chacune sur tout le texte
+    if "Price Quotation" in text and "Cisco" in text:
+        return "cisco_price_quotation"
+    return GenericPDFExtractor().detect_supplier(text)
+
+
+def timed(function, rounds: int = 1):
+    started = time.perf_counter()
+    for _ in range(rounds):
+        result = function()
+    return result, (time.perf_counter() - started) / rounds
+
+
+def main():
+    logging.disable(logging.INFO)
+    print(f"{PAGES} pages par devis")
+    print(f"{'devis':>22} | {'détection texte':>15} | {'1re page':>9} | {'lecture PDF':>11} | {'analyse':>8} | articles")
+    for name, content in QUOTES.items():
+        document = QuoteDocument(content)
+        _, read_seconds = timed(lambda: document.pages)
+
+        # Détection sur un document neuf à chaque fois: lecture du PDF comprise
+        _, legacy_seconds = timed(lambda: legacy_detect(extract_pdf_text(content)), ROUNDS)
+        detected = QuoteDocument(content)
+        parser, detect_seconds = timed(lambda: detect_quote_parser(QuoteDocument(content)), ROUNDS)
+        assert parser.vendor == name or parser.vendor == "generic"
+        detect_quote_parser(detected)
+        assert detected.pages == document.pages
+
+        quote, parse_seconds = timed(lambda: extract_quote(QuoteDocument(pages=document.pages)))
+        print(
+            f"{name:>22} | {legacy_seconds * 1e3:>12.1f} ms | {detect_seconds * 1e3:>6.1f} ms | "
+            f"{read_seconds:>9.3f} s | {parse_seconds:>6.3f} s | {len(quote['items'])}"
+        )
+
+
+if __name__ == "__main__":
+    main()
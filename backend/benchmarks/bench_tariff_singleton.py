@@ -0,0 +1,41 @@
+"""
+Microbenchmark: coût par requête d'un DHLPdfCalculator construit à chaque appel
+comparé au calculateur partagé (get_dhl_calculator).
+
+Usage (depuis le dossier backend):
+    python -m benchmarks.bench_tariff_singleton
+"""
+import timeit
+
+from app.dhl_pdf_calculator import DHLPdfCalculator, get_dhl_calculator
+
+ITERATIONS = 2000
+
+
+def per_request_instance():
+    calculator = DHLPdfCalculator()
+    return calculator.calculate_shipping_cost(12.5, "France", "export")
+
+
+def shared_instance():
+    calculator = get_dhl_calculator()
+    return calculator.calculate_shipping_cost(12.5, "France", "export")
+
+
+def main():
+    get_dhl_calculator()  # Construction unique, comme au démarrage de l'API
+
+    assert per_request_instance() == shared_instance()
+
+    results = {}
+    for name, func in (("par requête", per_request_instance), ("partagé", shared_instance)):
+        best = min(timeit.repeat(func, number=ITERATIONS, repeat=5))
+        results[name] = best / ITERATIONS * 1e6
+        print(f"{name:>12}: {results[name]:9.1f} µs/requête")
+
+    saving = results["par requête"] - results["partagé"]
+    print(f"{'gain':>12}: {saving:9.1f} µs/requête (x{results['par requête'] / results['partagé']:.1f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Benchmark: mémoire occupée par la réception d'un fichier importé.
+
+- ancienne lecture: await file.read() (tout le fichier en mémoire), puis une
+  copie envoyée au processus d'analyse
+- utils/uploads: spool_upload lit par blocs de UPLOAD_CHUNK_BYTES; au-delà de
+  UPLOAD_SPOOL_BYTES le fichier est écrit sur disque et seul son chemin est
+  transmis
+- un fichier plus gros que la limite est refusé après max_bytes lus
+
+Le pic mémoire est mesuré avec tracemalloc (allocations Python), pour des
+fichiers de 1 à 20 Mo reçus comme par Starlette (UploadFile).
+
+Usage (depuis le dossier backend):
+    python -m benchmarks.bench_uploads
+"""
+import asyncio
+import logging
+import os
+import pickle
+import tempfile
+import time
+import tracemalloc
+
+from starlette.datastructures import UploadFile
+
+from app.utils.uploads import UploadTooLarge, spool_upload
+
+SIZES_MB = (1, 5, 20)
+MAX_BYTES = 10 * 1024 * 1024
+
+
+def make_upload(size: int) -> UploadFile:
+    # Fichier déjà reçu par Starlette (SpooledTemporaryFile passé sur disque)
+    file = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+    block = os.urandom(1024 * 1024)
+    for _ in range(size // len(block)):
+        file.write(block)
+    file.seek(0)
+    return UploadFile(file, filename="devis.pdf")
+
+
+async def legacy(upload: UploadFile) -> int:
+    contents = await upload.read()
+    # Copie envoyée au processus d'analyse
+    return len(pickle.dumps(contents))
+
+
+async def spooled(upload: UploadFile, max_bytes: int) -> int:
+    with await spool_upload(upload, max_bytes) as spooled_upload:
+        return len(pickle.dumps(spooled_upload.source))
+
+
+def measure(run, size: int):
+    upload = make_upload(size)
+    tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        asyncio.run(run(upload))
+        result = "ok"
+    except UploadTooLarge:
+        result = "413"
+    seconds = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    upload.file.close()
+    return peak, seconds, result
+
+
+def main():
+    logging.disable(logging.INFO)
+    print(f"{'taille':>7} | {'read() pic':>11} {'durée':>7} | {'spool pic':>10} {'durée':>7} {'résultat':>9}")
+    for size_mb in SIZES_MB:
+        size = size_mb * 1024 * 1024
+        legacy_peak, legacy_seconds, _ = measure(legacy, size)
+        spool_peak, spool_seconds, result = measure(lambda upload: spooled(upload, MAX_BYTES), size)
+        print(
+            f"{size_mb:>5}Mo | {legacy_peak / 1024 / 1024:>9.1f}Mo {legacy_seconds:>6.3f}s | "
+            f"{spool_peak / 1024 / 1024:>8.1f}Mo {spool_seconds:>6.3f}s {result:>9}"
+        )
+
+
+if __name__ == "__main__":
+    main()
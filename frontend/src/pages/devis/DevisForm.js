@@ -908,6 +908,7 @@ function DevisForm() {
           discount: Number.parseFloat(formData.discount) || 0,
           total_amount: Number.parseFloat(formData.total_amount) || 0,
           items: formData.items.map((item) => ({
+            id: item.id,
             product_id: item.product_id,
             hardware_id: item.hardware_id,
             source_type: item.source_type,
@@ -108,7 +108,12 @@ function DevisImportForm() {
     setMessage("")
 
     const formData = new FormData()
-    formData.append("file", file)
+    // Fichier déjà analysé par l'aperçu: envoyer son jeton plutôt que le fichier
+    if (previewData?.upload_token) {
+      formData.append("upload_token", previewData.upload_token)
+    } else {
+      formData.append("file", file)
+    }
     formData.append("client_id", selectedClient)
 
     try {
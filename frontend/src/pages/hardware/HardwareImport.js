@@ -103,7 +103,12 @@ function HardwareImport() {
     setMessage("")
 
     const formData = new FormData()
-    formData.append("file", file)
+    // Fichier déjà analysé par l'aperçu: envoyer son jeton plutôt que le fichier
+    if (previewData?.upload_token) {
+      formData.append("upload_token", previewData.upload_token)
+    } else {
+      formData.append("file", file)
+    }
 
     try {
       console.log("Envoi du fichier pour importation:", file.name, file.type, file.size)